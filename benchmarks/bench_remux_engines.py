@@ -0,0 +1,116 @@
+"""
+Benchmark: ffmpeg vs. mkvmerge Remux auf denselben Fixtures.
+
+Beide Engines bekommen denselben engine-neutralen Plan (behaltene Spuren, Sprache, Default-Flag),
+gemessen werden Laufzeit, Durchsatz und Ausgabegröße.
+
+    python benchmarks/bench_remux_engines.py film1.mkv film2.mkv --runs 3
+    python benchmarks/bench_remux_engines.py --generate 600 --workdir /mnt/nvme/bench
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import language_fixer as lf  # noqa: E402
+
+
+def build_benchmark_plan(media_info):
+    """Behält Audio/Untertitel aus KEEP_*_LANGS und setzt die Default-Sprachen – wie ein typischer Cleanup-Remux."""
+    streams = media_info.get('streams', [])
+    plan = {'tracks': [], 'attachments': [], 'stream_types': {s['index']: s.get('codec_type') for s in streams}}
+    default_done = {'audio': False, 'subtitle': False}
+    for s in streams:
+        ct = s.get('codec_type')
+        lang = lf.normalize_lang_code(s.get('tags', {}).get('language', 'und'))
+        if ct == 'attachment':
+            plan['attachments'].append(s['index'])
+        elif ct in ('audio', 'subtitle'):
+            keep_langs = lf.KEEP_AUDIO_LANGS if ct == 'audio' else lf.KEEP_SUBTITLE_LANGS
+            if lang not in keep_langs: continue
+            default_lang = lf.DEFAULT_AUDIO_LANG if ct == 'audio' else lf.DEFAULT_SUBTITLE_LANG
+            is_default = lang == default_lang and not default_done[ct]
+            default_done[ct] = default_done[ct] or is_default
+            plan['tracks'].append({'index': s['index'], 'type': ct, 'lang': lang, 'default': is_default, 'title': None})
+    return plan
+
+
+def generate_fixture(workdir, seconds):
+    """Erzeugt eine synthetische MKV mit 1 Video-, 3 Audio- und 2 Untertitelspuren."""
+    srt = os.path.join(workdir, 'fixture.srt')
+    with open(srt, 'w', encoding='utf-8') as f:
+        for i in range(max(1, seconds // 5)):
+            f.write(f"{i + 1}\n00:{i * 5 // 60:02d}:{i * 5 % 60:02d},000 --> 00:{i * 5 // 60:02d}:{i * 5 % 60:02d},900\nLine {i}\n\n")
+    out = os.path.join(workdir, f'fixture_{seconds}s.mkv')
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+           '-f', 'lavfi', '-i', 'testsrc2=size=1920x1080:rate=24',
+           '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+           '-f', 'lavfi', '-i', 'sine=frequency=660:sample_rate=48000',
+           '-f', 'lavfi', '-i', 'sine=frequency=880:sample_rate=48000',
+           '-i', srt, '-i', srt, '-t', str(seconds),
+           '-map', '0', '-map', '1', '-map', '2', '-map', '3', '-map', '4', '-map', '5',
+           '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', '8M', '-c:a', 'ac3', '-c:s', 'srt',
+           '-metadata:s:a:0', 'language=jpn', '-metadata:s:a:1', 'language=eng', '-metadata:s:a:2', 'language=fre',
+           '-metadata:s:s:0', 'language=ger', '-metadata:s:s:1', 'language=spa', out]
+    print(f"Erzeuge Fixture ({seconds}s): {out}")
+    subprocess.run(cmd, check=True)
+    return out
+
+
+def run_engine(engine, src, plan, workdir, runs):
+    timings = []; out_size = 0
+    dst = os.path.join(workdir, f"bench_{engine.name}_{os.path.basename(src)}.mkv")
+    for _ in range(runs):
+        cmd = engine.build_command(src, dst, plan)
+        start = time.perf_counter()
+        r = subprocess.run(cmd, capture_output=True, text=True, errors='ignore')
+        elapsed = time.perf_counter() - start
+        if r.returncode not in engine.ok_returncodes:
+            raise RuntimeError(f"{engine.name} fehlgeschlagen (Code {r.returncode}): {(r.stderr or r.stdout).strip()}")
+        timings.append(elapsed)
+        out_size = os.path.getsize(dst)
+        os.remove(dst)
+    return statistics.median(timings), out_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='MKV-Fixtures')
+    parser.add_argument('--runs', type=int, default=3, help='Wiederholungen pro Engine (Median wird berichtet)')
+    parser.add_argument('--generate', type=int, metavar='SECONDS', help='Synthetische Fixture dieser Länge erzeugen')
+    parser.add_argument('--workdir', help='Ausgabeverzeichnis (Default: temporär); für realistische Werte auf dem Ziel-Volume')
+    parser.add_argument('--json', help='Ergebnisse zusätzlich als JSON speichern')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='langfixer_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    files = list(args.files)
+    if args.generate: files.append(generate_fixture(workdir, args.generate))
+    if not files: parser.error("Keine Fixtures angegeben (Dateien oder --generate).")
+
+    engines = [e for e in lf.REMUX_ENGINES.values() if e.is_available()]
+    results = []
+    print(f"{'Datei':<40} {'Engine':<9} {'Zeit':>8} {'MB/s':>8} {'Ausgabe':>12} {'Δ Quelle':>10}")
+    for src in files:
+        media_info = lf.get_media_info(src)
+        if not media_info: print(f"ffprobe fehlgeschlagen: {src}"); continue
+        plan = build_benchmark_plan(media_info)
+        src_size = os.path.getsize(src)
+        for engine in engines:
+            elapsed, out_size = run_engine(engine, src, plan, workdir, args.runs)
+            mbps = src_size / (1024 * 1024) / elapsed if elapsed > 0 else 0
+            results.append({'file': src, 'engine': engine.name, 'seconds': round(elapsed, 3), 'mb_per_s': round(mbps, 1),
+                            'source_bytes': src_size, 'output_bytes': out_size})
+            print(f"{os.path.basename(src)[:40]:<40} {engine.name:<9} {elapsed:>7.2f}s {mbps:>8.1f} "
+                  f"{lf.format_bytes(out_size):>12} {(out_size - src_size) / max(1, src_size) * 100:>+9.2f}%")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
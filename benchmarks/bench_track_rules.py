@@ -0,0 +1,118 @@
+"""
+Benchmark: Spur-Entscheidungen pro Sekunde über aufgezeichnete ffprobe-Daten.
+
+Misst die kompilierten Regeln (TrackRules: Keep/Remove, Kommentar-Erkennung, Titel) pro Spur, den kompletten
+Planer (build_file_plan ohne Whisper) pro Datei und als Vergleich die frühere Entscheidungslogik mit
+if-Ketten, Schlüsselwort-Schleife und Regex pro Sprachcode.
+
+    python benchmarks/bench_track_rules.py
+    python benchmarks/bench_track_rules.py --rules /config/language-fixer-rules.json --seconds 5
+    python language_fixer.py probe --json film.mkv > film.json && python benchmarks/bench_track_rules.py film.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'recorded_streams.json')
+
+
+def load_recordings(paths):
+    """Liest die Fixture ({"files": [...]}) oder einzelne `probe --json`-Ausgaben; liefert [(pfad, media_info)]."""
+    recordings = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f: data = json.load(f)
+        if 'files' in data: recordings.extend((entry['path'], entry) for entry in data['files'])
+        else: recordings.append((data.get('path') or os.path.splitext(path)[0] + '.mkv', data))
+    return recordings
+
+
+def legacy_decide(lf, stream):
+    """Entscheidungslogik vor den kompilierten Regeln (Referenz für den Vergleich)."""
+    ct = stream.get('codec_type')
+    code = stream.get('tags', {}).get('language', 'und')
+    lang = re.sub(r'[\s\'"]', '', str(code)).lower() if code else 'und'
+    lang = lf.LANG_CODE_MAP.get(lang, lang)
+    title = stream.get('tags', {}).get('title', '').lower()
+    disp = stream.get('disposition', {})
+    is_comm = lf.KEEP_COMMENTARY and bool((title and any(k in title for k in lf.COMMENTARY_KEYWORDS)) or disp.get('comment', 0) == 1
+                                          or disp.get('hearing_impaired', 0) == 1 or disp.get('visual_impaired', 0) == 1)
+    if ct == 'audio': remove = lf.REMOVE_AUDIO and not is_comm and lang not in lf.KEEP_AUDIO_LANGS
+    elif ct == 'subtitle': remove = lf.REMOVE_SUBTITLES and lang not in lf.KEEP_SUBTITLE_LANGS
+    elif ct == 'attachment':
+        mimetype = stream.get('tags', {}).get('mimetype', '').lower()
+        is_font = mimetype.startswith('font/') or mimetype.endswith('/truetype') or mimetype.endswith('/opentype')
+        remove = lf.REMOVE_FONTS if is_font else lf.REMOVE_ATTACHMENTS
+    else: remove = False
+    title_out = None
+    if ct == 'audio' and lf.RENAME_AUDIO_TRACKS and not is_comm:
+        c = stream.get('codec_name', '').upper(); p = stream.get('profile', ''); ch = stream.get('channels', 0)
+        if c == 'TRUEHD': c = 'Dolby Atmos' if p and 'atmos' in p.lower() else 'Dolby TrueHD'
+        elif c == 'DTS' and p == 'MA': c = 'DTS-HD MA'
+        elif c == 'EAC3': c = 'Dolby Digital+'
+        elif c == 'AC3': c = 'Dolby Digital'
+        ls = '7.1' if ch >= 8 else '5.1' if ch >= 6 else '2.0' if ch == 2 else '1.0' if ch == 1 else f"{ch}.0" if ch > 0 else None
+        ln_map = {'eng': 'English', 'deu': 'German', 'jpn': 'Japanese'}
+        title_out = f"{c} {ls} ({ln_map.get(lang, lang.upper())})"
+    return remove, is_comm, title_out
+
+
+def compiled_decide(lf, rules, stream):
+    ct = stream.get('codec_type')
+    lang = lf.normalize_lang_code(stream.get('tags', {}).get('language', 'und'))
+    is_comm = lf.is_commentary(stream, rules)
+    mimetype = stream.get('tags', {}).get('mimetype', '').lower() if ct == 'attachment' else ''
+    remove = rules.removes(ct, lang, is_comm, mimetype)
+    title_out = lf.format_audio_title(stream, lang, rules, is_comm) if ct == 'audio' else None
+    return remove, is_comm, title_out
+
+
+def measure(fn, units_per_call, seconds):
+    """Ruft fn so oft auf, bis `seconds` vergangen sind; liefert Einheiten pro Sekunde."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn(); calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds: return calls * units_per_call / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recordings', nargs='*', default=[DEFAULT_FIXTURE], help="Fixture oder `probe --json`-Ausgaben")
+    parser.add_argument('--rules', help="RULES_FILE für den Lauf (Standard: aus der Umgebung)")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Messdauer pro Variante")
+    args = parser.parse_args()
+
+    if args.rules: os.environ['RULES_FILE'] = args.rules
+    os.environ['WHISPER_API_URL'] = ''  # Planer-Messung ohne Netzwerk
+    import language_fixer as lf  # noqa: E402  (erst nach RULES_FILE/WHISPER_API_URL importieren)
+    if lf.RULES_ERROR: sys.exit(f"RULES_FILE ungültig: {lf.RULES_ERROR}")
+
+    recordings = load_recordings(args.recordings)
+    tracks = [(lf.rules_for_path(path), s) for path, info in recordings for s in info.get('streams', [])]
+    print(f"{len(recordings)} Dateien, {len(tracks)} Spuren, {len(lf.TRACK_RULES_BY_ROOT)} Root-Regel(n)")
+
+    def run_legacy():
+        for _, s in tracks: legacy_decide(lf, s)
+
+    def run_compiled():
+        for rules, s in tracks: compiled_decide(lf, rules, s)
+
+    def run_planner():
+        stats = lf.ScanStats()
+        for path, info in recordings: lf.build_file_plan(path, info, stats)
+
+    results = [("Alte Entscheidungslogik", measure(run_legacy, len(tracks), args.seconds), "Spuren/s"),
+               ("Kompilierte Regeln", measure(run_compiled, len(tracks), args.seconds), "Spuren/s"),
+               ("build_file_plan komplett", measure(run_planner, len(tracks), args.seconds), "Spuren/s")]
+    baseline = results[0][1]
+    for name, rate, unit in results:
+        print(f"  {name:<26} {rate:>12,.0f} {unit}  ({rate / baseline:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
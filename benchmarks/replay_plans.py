@@ -0,0 +1,200 @@
+"""
+Replay: aufgezeichnete ffprobe-Ausgaben durch den Planer schicken – ohne Mediendateien und ohne Subprozesse.
+
+`record` ruft get_media_info für echte Dateien auf und schreibt die Ausgaben als Korpus (gleiches Format wie
+fixtures/recorded_streams.json). `replay` plant jede Datei des Korpus mit build_file_plan, leitet daraus die
+Aktion ab (Remux-Befehl, gefilterte mkvpropedit-Aktionen oder MP4-Änderungen) und misst Pläne pro Sekunde.
+ffmpeg/ffprobe/mkvpropedit werden dabei blockiert; die Spracherkennung liefert, was im Korpus unter
+"detected" ({"<stream-index>": ["deu", "deu", "eng"]}) steht, sonst nichts. Mit --save wird das Ergebnis
+gespeichert, mit --baseline gegen einen früheren Stand verglichen (Exit-Code 1 bei geänderten Plänen,
+2 wenn der Durchsatz um mehr als --max-slowdown Prozent fällt).
+
+    python benchmarks/replay_plans.py record /media/tv/Show /media/movies -o corpus.json
+    python benchmarks/replay_plans.py replay corpus.json --save plans-main.json
+    python benchmarks/replay_plans.py replay corpus.json --baseline plans-main.json --max-slowdown 20
+    python benchmarks/replay_plans.py diff plans-main.json plans-branch.json
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bench_track_rules import DEFAULT_FIXTURE, load_recordings, measure  # noqa: E402
+
+MEDIA_EXTENSIONS = ('.mkv', '.mp4')
+
+
+class SubprocessInReplay(RuntimeError):
+    """Der Planer hat im Replay einen externen Prozess gestartet – das darf er nicht."""
+
+
+def block_subprocesses(lf):
+    """Ersetzt die Subprozess-Aufrufe durch einen Fehler und meldet mkvmerge als verfügbar (wie im Image)."""
+    def blocked(cmd, *args, **kwargs):
+        raise SubprocessInReplay(f"Subprozess im Replay: {cmd[0] if isinstance(cmd, (list, tuple)) else cmd}")
+    lf.subprocess.run = lf.subprocess.Popen = lf.subprocess.check_output = blocked
+    lf.RemuxEngine.is_available = lambda self: True
+
+
+class RecordedDetector:
+    """Spracherkennung aus dem Korpus: liefert pro Probe den aufgezeichneten Code oder None (übersprungen)."""
+    name = 'replay'
+
+    def __init__(self):
+        self.detected = {}
+
+    def detect_tracks(self, file_path, stream_indices, starts):
+        results = {}
+        for idx in stream_indices:
+            codes = self.detected.get(file_path, {}).get(str(idx), [])
+            results[idx] = [codes[i] if i < len(codes) else None for i in range(len(starts))]
+        return results
+
+    def warm(self):
+        pass
+
+
+def plan_snapshot(lf, path, info):
+    """Plant eine Datei und reduziert das Ergebnis auf das, was process_file ausführen würde (JSON-vergleichbar)."""
+    plan, removed, _ = lf.build_file_plan(path, info, lf.ScanStats())
+    if plan['inplace_mp4'] and not plan['needs_remux']:
+        edits = lf.mp4_metadata_edits(plan)
+        action, command = ('mp4-inplace' if edits else 'none'), edits
+    elif plan['needs_remux']:
+        engine = lf.select_remux_engine(path, int(info.get('format', {}).get('size') or 0))
+        action, command = f"remux:{engine.name}", engine.build_command('IN', 'OUT', plan)
+    else:
+        command = lf.effective_mkvprop_actions(plan) if lf.plan_needs_changes(plan) else []
+        action = 'mkvpropedit' if command else 'none'
+    snapshot = {'action': action, 'command': command, 'removed': removed,
+                'default_audio': plan['default_audio_index'], 'default_subtitle': plan['default_subtitle_index'],
+                'tracks': plan['tracks'], 'attachments': plan['attachments'], 'log': plan['dry_run_log']}
+    return json.loads(json.dumps(snapshot))  # int-Schlüssel -> str, wie nach dem Laden einer gespeicherten Datei
+
+
+def diff_snapshots(old, new):
+    """Vergleicht zwei {"plans": {...}}-Stände; liefert die Anzahl geänderter Dateien und gibt die Unterschiede aus."""
+    old_plans, new_plans = old['plans'], new['plans']
+    changed = 0
+    for path in sorted(set(old_plans) | set(new_plans)):
+        a, b = old_plans.get(path), new_plans.get(path)
+        if a == b: continue
+        changed += 1
+        print(f"\n{path}")
+        if a is None or b is None:
+            print(f"  {'nur im neuen Stand' if a is None else 'fehlt im neuen Stand'}")
+            continue
+        for key in sorted(set(a) | set(b)):
+            if a.get(key) == b.get(key): continue
+            print(f"  - {key}: {json.dumps(a.get(key), ensure_ascii=False)}")
+            print(f"  + {key}: {json.dumps(b.get(key), ensure_ascii=False)}")
+    print(f"\n{changed} von {len(set(old_plans) | set(new_plans))} Plänen geändert "
+          f"({old.get('version', '?')} -> {new.get('version', '?')}).")
+    return changed
+
+
+def cmd_record(args):
+    import language_fixer as lf
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(root, f) for root, _, names in os.walk(path) for f in sorted(names)
+                         if f.lower().endswith(MEDIA_EXTENSIONS))
+        elif os.path.isfile(path): files.append(path)
+        else: print(f"Pfad nicht gefunden: {path}", file=sys.stderr)
+    if args.limit: files = files[:args.limit]
+
+    corpus = {'description': "Aufgezeichnete get_media_info-Ausgaben für replay_plans.py", 'files': []}
+    if args.append and os.path.exists(args.output):
+        with open(args.output, encoding='utf-8') as f: corpus = json.load(f)
+    known = {entry['path'] for entry in corpus['files']}
+    files = [os.path.abspath(f) for f in files if os.path.abspath(f) not in known]
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        infos = list(pool.map(lf.get_media_info, files))
+    recorded = [dict(info, path=path) for path, info in zip(files, infos) if info]
+    corpus['files'].extend(recorded)
+    with open(args.output, 'w', encoding='utf-8') as f: json.dump(corpus, f, ensure_ascii=False, indent=1)
+    print(f"{len(recorded)} von {len(files)} Dateien aufgezeichnet -> {args.output} ({len(corpus['files'])} gesamt)")
+
+
+def cmd_replay(args):
+    if args.rules: os.environ['RULES_FILE'] = args.rules
+    os.environ['WHISPER_API_URL'] = ''  # Replay ohne Netzwerk
+    import language_fixer as lf
+    if lf.RULES_ERROR: sys.exit(f"RULES_FILE ungültig: {lf.RULES_ERROR}")
+    block_subprocesses(lf)
+    detector = RecordedDetector()
+    lf.language_detector = lambda: detector
+
+    recordings = load_recordings(args.corpus)
+    for path, info in recordings:
+        if info.get('detected'): detector.detected[path] = info['detected']
+    tracks = sum(len(info.get('streams', [])) for _, info in recordings)
+
+    plans = {path: plan_snapshot(lf, path, info) for path, info in recordings}
+
+    def run_planner():
+        for path, info in recordings: plan_snapshot(lf, path, info)
+
+    rate = measure(run_planner, len(recordings), args.seconds)
+    actions = {}
+    for snapshot in plans.values(): actions[snapshot['action']] = actions.get(snapshot['action'], 0) + 1
+    print(f"{len(recordings)} Dateien, {tracks} Spuren: {rate:,.0f} Pläne/s ({rate * tracks / max(len(recordings), 1):,.0f} Spuren/s)")
+    print("  " + ", ".join(f"{name}: {count}" for name, count in sorted(actions.items())))
+
+    result = {'version': lf.__version__, 'config_hash': lf.config_fingerprint()[0], 'plans_per_s': round(rate, 1), 'plans': plans}
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f: json.dump(result, f, ensure_ascii=False, indent=1)
+        print(f"Pläne gespeichert: {args.save}")
+    if not args.baseline: return 0
+
+    with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+    if baseline.get('config_hash') != result['config_hash']:
+        print("Hinweis: Baseline wurde mit anderer Konfiguration erstellt – Unterschiede können daher kommen.")
+    changed = diff_snapshots(baseline, result)
+    ratio = rate / baseline['plans_per_s'] if baseline.get('plans_per_s') else None
+    if ratio: print(f"Durchsatz: {ratio:.2f}x gegenüber Baseline ({baseline['plans_per_s']:,.0f} Pläne/s)")
+    if changed: return 1
+    if ratio and args.max_slowdown is not None and ratio < 1 - args.max_slowdown / 100: return 2
+    return 0
+
+
+def cmd_diff(args):
+    with open(args.old, encoding='utf-8') as f: old = json.load(f)
+    with open(args.new, encoding='utf-8') as f: new = json.load(f)
+    return 1 if diff_snapshots(old, new) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('record', help="get_media_info für Dateien/Ordner in einen Korpus schreiben")
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--output', '-o', required=True)
+    p.add_argument('--append', action='store_true', help="An bestehenden Korpus anhängen (bekannte Pfade überspringen)")
+    p.add_argument('--jobs', type=int, default=4, help="Parallele ffprobe-Aufrufe")
+    p.add_argument('--limit', type=int, help="Höchstens so viele Dateien aufzeichnen")
+
+    p = sub.add_parser('replay', help="Korpus planen, Pläne/s messen, optional speichern/vergleichen")
+    p.add_argument('corpus', nargs='*', default=[DEFAULT_FIXTURE], help="Korpus, Fixture oder `probe --json`-Ausgaben")
+    p.add_argument('--rules', help="RULES_FILE für den Lauf (Standard: aus der Umgebung)")
+    p.add_argument('--seconds', type=float, default=2.0, help="Messdauer")
+    p.add_argument('--save', help="Pläne und Durchsatz als JSON speichern")
+    p.add_argument('--baseline', help="Gespeicherte Pläne eines früheren Stands zum Vergleich")
+    p.add_argument('--max-slowdown', type=float, help="Exit 2, wenn der Durchsatz um mehr als so viele Prozent fällt")
+
+    p = sub.add_parser('diff', help="Zwei gespeicherte Pläne vergleichen")
+    p.add_argument('old')
+    p.add_argument('new')
+
+    args = parser.parse_args()
+    sys.exit({'record': cmd_record, 'replay': cmd_replay, 'diff': cmd_diff}[args.command](args) or 0)
+
+
+if __name__ == '__main__':
+    main()
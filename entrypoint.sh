@@ -63,6 +63,46 @@ ENV_VARS=(
 [ -n "$MKVPROPEDIT_TIMEOUT" ] && ENV_VARS+=("MKVPROPEDIT_TIMEOUT=$MKVPROPEDIT_TIMEOUT")
 [ -n "$FFMPEG_SAMPLE_TIMEOUT" ] && ENV_VARS+=("FFMPEG_SAMPLE_TIMEOUT=$FFMPEG_SAMPLE_TIMEOUT")
 [ -n "$BATCH_COMMIT_SIZE" ] && ENV_VARS+=("BATCH_COMMIT_SIZE=$BATCH_COMMIT_SIZE")
+[ -n "$MAX_PARALLEL_FILES" ] && ENV_VARS+=("MAX_PARALLEL_FILES=$MAX_PARALLEL_FILES")
+[ -n "$PROBE_CONCURRENCY" ] && ENV_VARS+=("PROBE_CONCURRENCY=$PROBE_CONCURRENCY")
+[ -n "$DETECT_CONCURRENCY" ] && ENV_VARS+=("DETECT_CONCURRENCY=$DETECT_CONCURRENCY")
+[ -n "$REMUX_CONCURRENCY" ] && ENV_VARS+=("REMUX_CONCURRENCY=$REMUX_CONCURRENCY")
+[ -n "$EDIT_CONCURRENCY" ] && ENV_VARS+=("EDIT_CONCURRENCY=$EDIT_CONCURRENCY")
+[ -n "$REMUX_MAX_MBPS" ] && ENV_VARS+=("REMUX_MAX_MBPS=$REMUX_MAX_MBPS")
+[ -n "$REMUX_IONICE" ] && ENV_VARS+=("REMUX_IONICE=$REMUX_IONICE")
+[ -n "$IO_DEVICE_GROUPS" ] && ENV_VARS+=("IO_DEVICE_GROUPS=$IO_DEVICE_GROUPS")
+[ -n "$REMUX_SCRATCH_DIR" ] && ENV_VARS+=("REMUX_SCRATCH_DIR=$REMUX_SCRATCH_DIR")
+[ -n "$REMUX_MIN_FREE_MB" ] && ENV_VARS+=("REMUX_MIN_FREE_MB=$REMUX_MIN_FREE_MB")
+[ -n "$REMUX_ENGINE" ] && ENV_VARS+=("REMUX_ENGINE=$REMUX_ENGINE")
+[ -n "$REMUX_MKVMERGE_MIN_MB" ] && ENV_VARS+=("REMUX_MKVMERGE_MIN_MB=$REMUX_MKVMERGE_MIN_MB")
+[ -n "$REMUX_STALL_SECONDS" ] && ENV_VARS+=("REMUX_STALL_SECONDS=$REMUX_STALL_SECONDS")
+[ -n "$REMUX_MIN_MBPS" ] && ENV_VARS+=("REMUX_MIN_MBPS=$REMUX_MIN_MBPS")
+[ -n "$REMUX_PROGRESS_LOG_SECONDS" ] && ENV_VARS+=("REMUX_PROGRESS_LOG_SECONDS=$REMUX_PROGRESS_LOG_SECONDS")
+[ -n "$SCAN_MODE" ] && ENV_VARS+=("SCAN_MODE=$SCAN_MODE")
+[ -n "$FULL_SCAN_INTERVAL_HOURS" ] && ENV_VARS+=("FULL_SCAN_INTERVAL_HOURS=$FULL_SCAN_INTERVAL_HOURS")
+[ -n "$ARR_PREFILTER" ] && ENV_VARS+=("ARR_PREFILTER=$ARR_PREFILTER")
+[ -n "$SCAN_ORDER" ] && ENV_VARS+=("SCAN_ORDER=$SCAN_ORDER")
+[ -n "$PRIORITY_RECENT_HOURS" ] && ENV_VARS+=("PRIORITY_RECENT_HOURS=$PRIORITY_RECENT_HOURS")
+[ -n "$MAX_RUN_SECONDS" ] && ENV_VARS+=("MAX_RUN_SECONDS=$MAX_RUN_SECONDS")
+[ -n "$RUN_WINDOW" ] && ENV_VARS+=("RUN_WINDOW=$RUN_WINDOW")
+[ -n "$RETRY_BACKOFF_BASE_SECONDS" ] && ENV_VARS+=("RETRY_BACKOFF_BASE_SECONDS=$RETRY_BACKOFF_BASE_SECONDS")
+[ -n "$RETRY_BACKOFF_MAX_SECONDS" ] && ENV_VARS+=("RETRY_BACKOFF_MAX_SECONDS=$RETRY_BACKOFF_MAX_SECONDS")
+[ -n "$STARTUP_DELAY_SECONDS" ] && ENV_VARS+=("STARTUP_DELAY_SECONDS=$STARTUP_DELAY_SECONDS")
+[ -n "$UPDATE_CHECK" ] && ENV_VARS+=("UPDATE_CHECK=$UPDATE_CHECK")
+[ -n "$CONFIG_FILE" ] && ENV_VARS+=("CONFIG_FILE=$CONFIG_FILE")
+[ -n "$LOG_FORMAT" ] && ENV_VARS+=("LOG_FORMAT=$LOG_FORMAT")
+[ -n "$LOG_RATE_LIMIT" ] && ENV_VARS+=("LOG_RATE_LIMIT=$LOG_RATE_LIMIT")
+[ -n "$LOG_RATE_WINDOW_SECONDS" ] && ENV_VARS+=("LOG_RATE_WINDOW_SECONDS=$LOG_RATE_WINDOW_SECONDS")
+[ -n "$RULES_FILE" ] && ENV_VARS+=("RULES_FILE=$RULES_FILE")
+[ -n "$LANGUAGE_DETECTOR" ] && ENV_VARS+=("LANGUAGE_DETECTOR=$LANGUAGE_DETECTOR")
+[ -n "$LOCAL_WHISPER_MODEL" ] && ENV_VARS+=("LOCAL_WHISPER_MODEL=$LOCAL_WHISPER_MODEL")
+[ -n "$LOCAL_WHISPER_COMPUTE_TYPE" ] && ENV_VARS+=("LOCAL_WHISPER_COMPUTE_TYPE=$LOCAL_WHISPER_COMPUTE_TYPE")
+[ -n "$LOCAL_WHISPER_WORKERS" ] && ENV_VARS+=("LOCAL_WHISPER_WORKERS=$LOCAL_WHISPER_WORKERS")
+[ -n "$LOCAL_WHISPER_THREADS" ] && ENV_VARS+=("LOCAL_WHISPER_THREADS=$LOCAL_WHISPER_THREADS")
+[ -n "$LOCAL_WHISPER_MODEL_DIR" ] && ENV_VARS+=("LOCAL_WHISPER_MODEL_DIR=$LOCAL_WHISPER_MODEL_DIR")
+[ -n "$RUN_HISTORY_DAYS" ] && ENV_VARS+=("RUN_HISTORY_DAYS=$RUN_HISTORY_DAYS")
+[ -n "$MP4_INPLACE_EDIT" ] && ENV_VARS+=("MP4_INPLACE_EDIT=$MP4_INPLACE_EDIT")
+[ -n "$MAX_TRANSIENT_FAILURES" ] && ENV_VARS+=("MAX_TRANSIENT_FAILURES=$MAX_TRANSIENT_FAILURES")
 
 # Execute with all environment variables
 exec sudo -u#"$PUID" -g#"$PGID" "${ENV_VARS[@]}" python3 /app/language_fixer.py "$@"
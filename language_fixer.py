@@ -1,16 +1,38 @@
 # language_fixer.py
 import os
+import errno
 import subprocess
 import json
+import csv
+import hashlib
 import tempfile
+import shutil
+import struct
 import sys
 import time
-import requests
+import importlib
+import importlib.util
+import multiprocessing
 import sqlite3
 import re
+import fnmatch
+import functools
 import logging
+import logging.handlers
+import queue
+import atexit
+import copy
+import argparse
+import asyncio
+import threading
+import signal
 from collections import Counter, defaultdict
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta, timezone
+
+PROCESS_START = time.monotonic()  # Für die Messung "Zeit bis zur ersten Datei"
 
 # --- VERSION INFORMATION ---
 __version__ = "1.0.13"
@@ -18,25 +40,154 @@ __app_name__ = "Language-Fixer"
 
 # --- EARLY DEFINITIONS ---
 LOG_LEVEL_FROM_ENV = os.getenv("LOG_LEVEL", "info").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()  # text oder json (JSON-Lines mit Datei-Kontext)
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "0"))  # Max. INFO/DEBUG-Meldungen pro Aufrufstelle und Fenster, 0 = aus
+LOG_RATE_WINDOW_SECONDS = float(os.getenv("LOG_RATE_WINDOW_SECONDS", "10"))
+LOG_QUEUE_SIZE = 10000  # Danach werden INFO/DEBUG verworfen statt den Scan zu blockieren
+
+class LazyImport:
+    """Importiert ein optionales Modul erst beim ersten Attributzugriff (spart Startzeit ohne Arr/Whisper)."""
+    def __init__(self, name):
+        self._name = name; self._module = None
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+requests = LazyImport("requests")
+
+# Kontext der gerade bearbeiteten Datei pro Worker-Thread (file, stage), wird an jeden Log-Record gehängt
+LOG_CONTEXT = threading.local()
+
+@contextmanager
+def log_context(**fields):
+    """Setzt Felder des Log-Kontexts für die Dauer des Blocks (verschachtelbar)."""
+    previous = {k: getattr(LOG_CONTEXT, k, None) for k in fields}
+    for k, v in fields.items(): setattr(LOG_CONTEXT, k, v)
+    try:
+        yield
+    finally:
+        for k, v in previous.items(): setattr(LOG_CONTEXT, k, v)
+
+class ContextFilter(logging.Filter):
+    """Hängt Datei und Pipeline-Stufe des aufrufenden Threads an den Record."""
+    def filter(self, record):
+        record.file = getattr(LOG_CONTEXT, 'file', None)
+        record.stage = getattr(LOG_CONTEXT, 'stage', None)
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    Begrenzt INFO/DEBUG pro Aufrufstelle auf LOG_RATE_LIMIT Meldungen je LOG_RATE_WINDOW_SECONDS.
+    Unterdrückte Meldungen werden an der ersten Meldung des nächsten Fensters mitgezählt (spätestens beim Beenden
+    des Loggings). WARNING+, Pläne, Berichte und die Ergebniszeile pro Datei (mit `action`) werden nie begrenzt.
+    """
+    exempt_functions = {'log_planned_actions', 'log_scan_report', 'record_run', 'cmd_probe', 'cmd_plan'}
+
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit = limit; self.window = window
+        self.sites = {}  # (pathname, lineno) -> [fensterstart, anzahl, unterdrückt]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.limit <= 0: return True
+        if record.funcName in self.exempt_functions or getattr(record, 'action', None): return True
+        key = (record.pathname, record.lineno); now = time.monotonic()
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                self.sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.getMessage()} (+{suppressed} gleichartige Meldungen unterdrückt)"; record.args = None
+                    record.suppressed = suppressed
+                return True
+            if site[1] < self.limit:
+                site[1] += 1; return True
+            site[2] += 1
+            return False
+
+    def flush(self):
+        """Meldet alle noch offenen Unterdrückt-Zähler, damit sie nicht verloren gehen, wenn die Stelle nicht mehr loggt."""
+        with self.lock:
+            pending = [(key, site[2]) for key, site in self.sites.items() if site[2]]
+            self.sites.clear()
+        for (pathname, lineno), suppressed in pending:
+            logging.info(f"(+{suppressed} Meldungen von {os.path.basename(pathname)}:{lineno} unterdrückt)", extra={'suppressed': suppressed})
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Record inkl. Datei-Kontext und optionaler Felder (action, duration_ms, progress, suppressed)."""
+    def format(self, record):
+        entry = {'ts': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+                 'level': record.levelname, 'msg': record.getMessage(), 'thread': record.threadName}
+        for field in ('file', 'stage', 'action', 'duration_ms', 'progress', 'suppressed'):
+            value = getattr(record, field, None)
+            if value is not None: entry[field] = value
+        if record.exc_text: entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, der bei voller Queue INFO/DEBUG verwirft statt den Aufrufer zu blockieren."""
+    dropped = 0
+    def prepare(self, record):
+        # Wie QueueHandler.prepare, aber Tracebacks bleiben getrennt (exc_text), damit JSON sie als eigenes Feld ausgibt
+        record = copy.copy(record)
+        record.message = record.getMessage(); record.msg = record.message; record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info); record.exc_info = None
+        return record
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING: self.queue.put(record)
+            else: DroppingQueueHandler.dropped += 1
+
+_LOG_LISTENER = None
+_RATE_LIMIT_FILTER = None
+
+def stop_log_listener():
+    """Meldet offene Unterdrückt-Zähler und schreibt die Queue leer."""
+    if _RATE_LIMIT_FILTER: _RATE_LIMIT_FILTER.flush()
+    if _LOG_LISTENER: _LOG_LISTENER.stop()
 
 def setup_logging():
-    """Konfiguriert das globale Logging."""
+    """
+    Konfiguriert das globale Logging. Aufrufer schreiben nur in eine Queue; Formatierung und Ausgabe
+    nach stdout übernimmt ein Hintergrund-Thread (QueueListener), so dass ein volles Docker-Log den Scan nicht bremst.
+    """
+    global _LOG_LISTENER, _RATE_LIMIT_FILTER
     log_level = getattr(logging, LOG_LEVEL_FROM_ENV, logging.INFO)
     logger = logging.getLogger()
     logger.setLevel(log_level)
+    stop_log_listener()
     if logger.hasHandlers():
         logger.handlers.clear()
     stream_handler = logging.StreamHandler(sys.stdout)
     stream_handler.setLevel(log_level)
-    formatter = logging.Formatter(
-        '[%(asctime)s] [%(levelname)-8s] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '[%(asctime)s] [%(levelname)-8s] - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _RATE_LIMIT_FILTER = RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_WINDOW_SECONDS)
+    queue_handler.addFilter(_RATE_LIMIT_FILTER)
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+    _LOG_LISTENER = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _LOG_LISTENER.start()
     logging.getLogger("requests").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+@atexit.register
+def flush_logging():
+    """Schreibt beim Beenden alle noch in der Queue wartenden Meldungen."""
+    stop_log_listener()
+
 # Helper function for parsing boolean env vars
 def parse_bool(env_var_name, default=False):
     """Parses a boolean environment variable ('true', '1', 't'). Case-insensitive."""
@@ -49,35 +200,29 @@ def parse_bool(env_var_name, default=False):
 
 # --- (1) CONFIGURATION ---
 DB_PATH = os.getenv("DB_PATH", "/config/langfixer.db")
-WHISPER_API_URL = os.getenv("WHISPER_API_URL")
-WHISPER_TIMEOUT = int(os.getenv("WHISPER_TIMEOUT", "300"))
-RUN_INTERVAL_SECONDS = int(os.getenv("RUN_INTERVAL_SECONDS", "43200"))
-DRY_RUN = parse_bool("DRY_RUN", True)  # Default TRUE for safety!
-MAX_FAILURES = int(os.getenv("MAX_FAILURES", "3"))
-SONARR_URL = os.getenv("SONARR_URL")
-RADARR_URL = os.getenv("RADARR_URL")
-SONARR_API_KEY = os.getenv("SONARR_API_KEY")
-RADARR_API_KEY = os.getenv("RADARR_API_KEY")
-SONARR_PATHS_RAW = os.getenv("SONARR_PATHS", "/media/tv")
-RADARR_PATHS_RAW = os.getenv("RADARR_PATHS", "/media/movies")
-RUN_CLEANUP = parse_bool("RUN_CLEANUP", True)
-
-# Smart defaults: If DRY_RUN=false, then unset remove flags default to false (safe)
-# If DRY_RUN=true (default), then unset remove flags default to true (for testing)
-remove_default = DRY_RUN  # true in dry-run mode, false in production mode
-REMOVE_AUDIO = parse_bool("REMOVE_AUDIO", remove_default)
-REMOVE_SUBTITLES = parse_bool("REMOVE_SUBTITLES", remove_default)
-REMOVE_ATTACHMENTS = parse_bool("REMOVE_ATTACHMENTS", remove_default)
-RENAME_AUDIO_TRACKS = parse_bool("RENAME_AUDIO_TRACKS", True)  # Always safe
-REMOVE_FONTS = parse_bool("REMOVE_FONTS", False)  # Conservative default
-KEEP_COMMENTARY = parse_bool("KEEP_COMMENTARY", True)
-LOG_STATS_ON_COMPLETION = parse_bool("LOG_STATS_ON_COMPLETION", True)
-BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", "10"))
-
-# Process Subprocess Timeouts from Env Vars
-FFMPEG_TIMEOUT = int(os.getenv("FFMPEG_TIMEOUT", "1800")) # Default 30 minutes
-MKVPROPEDIT_TIMEOUT = int(os.getenv("MKVPROPEDIT_TIMEOUT", "300")) # Default 5 minutes
-FFMPEG_SAMPLE_TIMEOUT = int(os.getenv("FFMPEG_SAMPLE_TIMEOUT", "60")) # Default 1 minute
+# Optionale Datei mit KEY=VALUE-Zeilen; überschreibt die Container-Umgebung und wird bei SIGHUP neu gelesen
+CONFIG_FILE = os.getenv("CONFIG_FILE", "/config/language-fixer.env")
+_BASE_ENV = dict(os.environ)
+_CONFIG_FILE_KEYS = set()
+CLI_OVERRIDES = {}  # --set/--dry-run/--apply haben Vorrang vor CONFIG_FILE
+
+def apply_config_file():
+    """Übernimmt die Werte aus CONFIG_FILE nach os.environ; entfernte Schlüssel fallen auf die Container-Umgebung zurück."""
+    for key in _CONFIG_FILE_KEYS:
+        if key in _BASE_ENV: os.environ[key] = _BASE_ENV[key]
+        else: os.environ.pop(key, None)
+    _CONFIG_FILE_KEYS.clear()
+    if not CONFIG_FILE or not os.path.isfile(CONFIG_FILE): return
+    with open(CONFIG_FILE, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line: continue
+            key, value = line.split('=', 1)
+            key = key.strip()
+            if key.startswith('export '): key = key[len('export '):].strip()
+            if key in ('DB_PATH', 'CONFIG_FILE', 'LOG_LEVEL') or key in CLI_OVERRIDES: continue  # Nur beim Start über die Umgebung
+            os.environ[key] = value.strip().strip('"').strip("'")
+            _CONFIG_FILE_KEYS.add(key)
 
 # --- Sprachcode-Definitionen ---
 LANG_CODE_MAP = {
@@ -92,9 +237,21 @@ LANG_CODE_MAP = {
     'ind': 'ind', 'ms': 'may', 'may': 'may', 'msa': 'may', 'fil': 'fil', 'ca': 'cat', 'cat': 'cat', 'gl': 'glg',
     'glg': 'glg', 'und': 'und'
 }
+# Sprachnamen, wie ältere Sonarr/Radarr-Versionen sie in mediaInfo liefern ("English / Japanese")
+LANGUAGE_NAME_MAP = {
+    'english': 'eng', 'german': 'deu', 'japanese': 'jpn', 'french': 'fre', 'spanish': 'spa', 'italian': 'ita',
+    'czech': 'cze', 'danish': 'dan', 'greek': 'gre', 'finnish': 'fin', 'hungarian': 'hun', 'korean': 'kor',
+    'dutch': 'dut', 'norwegian': 'nor', 'norwegian bokmal': 'nor', 'polish': 'pol', 'portuguese': 'por',
+    'romanian': 'rum', 'russian': 'rus', 'swedish': 'swe', 'thai': 'tha', 'turkish': 'tur', 'ukrainian': 'ukr',
+    'vietnamese': 'vie', 'chinese': 'chi', 'arabic': 'ara', 'hebrew': 'heb', 'croatian': 'hrv', 'indonesian': 'ind',
+    'malay': 'may', 'filipino': 'fil', 'catalan': 'cat', 'galician': 'glg', 'unknown': 'und', 'undetermined': 'und'
+}
+_LANG_CODE_STRIP = re.compile(r'[\s\'"]')
+
+@functools.lru_cache(maxsize=4096)
 def normalize_lang_code(code):
     if not code: return 'und'
-    code = re.sub(r'[\s\'"]', '', str(code)).lower()
+    code = _LANG_CODE_STRIP.sub('', str(code)).lower()
     return LANG_CODE_MAP.get(code, code)
 
 def parse_env_list(env_var_name, default_value=""):
@@ -115,15 +272,313 @@ def parse_env_single(env_var_name, default_value=""):
     logging.debug(f"Parsed value for {env_var_name}: '{result}'")
     return result
 
-KEEP_AUDIO_LANGS = parse_env_list("KEEP_AUDIO_LANGS", "jpn,deu,eng,und")
-KEEP_SUBTITLE_LANGS = parse_env_list("KEEP_SUBTITLE_LANGS", "jpn,deu,eng")
-DEFAULT_AUDIO_LANG = parse_env_single("DEFAULT_AUDIO_LANG", "jpn")
-DEFAULT_SUBTITLE_LANG = parse_env_single("DEFAULT_SUBTITLE_LANG", "deu")
-
+def parse_device_groups(raw):
+    """Parst IO_DEVICE_GROUPS ("pfad=gruppe,...") in eine nach Pfadlänge sortierte Liste."""
+    groups = []
+    for entry in raw.split(','):
+        if '=' not in entry: continue
+        path, name = entry.split('=', 1)
+        path = path.strip().rstrip('/\\'); name = name.strip()
+        if path and name: groups.append((path, name))
+    return sorted(groups, key=lambda g: len(g[0]), reverse=True)
+
+def parse_run_window(raw):
+    """Parst RUN_WINDOW ("01:00-06:30") in (start_minute, end_minute); None wenn leer oder ungültig."""
+    m = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*', raw or '')
+    if not m: return None
+    h1, m1, h2, m2 = map(int, m.groups())
+    if h1 > 23 or h2 > 24 or m1 > 59 or m2 > 59: return None
+    start, end = h1 * 60 + m1, h2 * 60 + m2
+    return None if start == end else (start, end % 1440)
+
+# --- Spur-Regeln: RULES_FILE + Umgebung, einmal pro Start/Reload in Lookup-Tabellen übersetzt ---
 COMMENTARY_KEYWORDS = ['commentary', 'kommentar', 'director', 'regisseur', 'creator', 'audio description']
+AUDIO_LANGUAGE_NAMES = {'eng': 'English', 'deu': 'German', 'jpn': 'Japanese'}  # Sonst wird der Code groß geschrieben
+# Anzeigename je Codec: Profil-Muster (fnmatch auf das kleingeschriebene ffprobe-Profil) -> Name, erstes Muster gewinnt
+CODEC_TITLES = {
+    'truehd': {'*atmos*': 'Dolby Atmos', '*': 'Dolby TrueHD'},
+    'dts': {'ma': 'DTS-HD MA'},
+    'eac3': {'*': 'Dolby Digital+'},
+    'ac3': {'*': 'Dolby Digital'},
+}
+RULE_KEYS = {'keep_audio', 'keep_subtitles', 'default_audio', 'default_subtitle', 'remove_audio', 'remove_subtitles',
+             'remove_attachments', 'remove_fonts', 'keep_commentary', 'rename_audio', 'commentary_keywords',
+             'language_names', 'codec_titles'}
+
+class RulesError(ValueError):
+    """Ungültige RULES_FILE; die Meldung landet in validate_config."""
+
+def channel_layout_label(channels):
+    if channels >= 8: return '7.1'
+    if channels >= 6: return '5.1'
+    if channels == 2: return '2.0'
+    if channels == 1: return '1.0'
+    return f"{channels}.0" if channels > 0 else None
+
+def is_font_mimetype(mimetype):
+    return mimetype.startswith('font/') or mimetype.endswith('/truetype') or mimetype.endswith('/opentype')
+
+class TrackRules:
+    """
+    Kompilierte Keep/Remove/Default-Regeln für einen Scan-Root: Sprachlisten als Sets, Kommentar-Schlüsselwörter
+    als ein einziger Regex, Codec-Titel als Tabelle mit Cache je (Codec, Profil, Kanäle).
+    """
+    def __init__(self, rules):
+        unknown = set(rules) - RULE_KEYS
+        if unknown: raise RulesError(f"Unbekannte Regel(n): {', '.join(sorted(unknown))}")
+        self.keep_audio = self._langs(rules, 'keep_audio')
+        self.keep_subtitles = self._langs(rules, 'keep_subtitles')
+        for key in ('default_audio', 'default_subtitle'):
+            if not isinstance(rules[key] or '', str): raise RulesError(f"'{key}' muss ein Sprachcode (Text) sein")
+            setattr(self, key, normalize_lang_code(rules[key]) if rules[key] else '')
+        for key in ('remove_audio', 'remove_subtitles', 'remove_attachments', 'remove_fonts', 'keep_commentary', 'rename_audio'):
+            if not isinstance(rules[key], bool): raise RulesError(f"'{key}' muss true oder false sein")
+            setattr(self, key, rules[key])
+        keywords = [k.lower() for k in self._strings(rules, 'commentary_keywords') if k]
+        self.commentary_search = re.compile('|'.join(map(re.escape, keywords)), re.IGNORECASE).search if keywords else None
+        if not isinstance(rules['language_names'], dict) or not all(isinstance(n, str) for n in rules['language_names'].values()):
+            raise RulesError("'language_names' muss ein Objekt {Code: Name} sein")
+        self.language_names = dict(rules['language_names'])
+        self.codec_titles = {}
+        for codec, patterns in rules['codec_titles'].items():
+            if not isinstance(patterns, dict) or not all(isinstance(t, str) for t in patterns.values()):
+                raise RulesError(f"codec_titles.{codec} muss ein Objekt {{Profil-Muster: Name}} sein")
+            self.codec_titles[codec.lower()] = [(re.compile(fnmatch.translate(p.lower())).match, t) for p, t in patterns.items()]
+        # Tabellen für den Entscheidungs-Durchlauf: None = Spurtyp wird nie nach Sprache entfernt
+        self.keep_langs = {'audio': self.keep_audio if self.remove_audio else None,
+                           'subtitle': self.keep_subtitles if self.remove_subtitles else None}
+        self.default_langs = {'audio': self.default_audio, 'subtitle': self.default_subtitle}
+        self._title_cache = {}
+
+    @staticmethod
+    def _langs(rules, key):
+        value = rules[key]
+        if isinstance(value, str): value = value.split(',')
+        if not isinstance(value, (list, tuple, set)) or not all(isinstance(v, str) for v in value):
+            raise RulesError(f"'{key}' muss eine Liste von Sprachcodes sein")
+        return set(filter(None, (normalize_lang_code(v) for v in value)))
+
+    @staticmethod
+    def _strings(rules, key):
+        value = rules[key]
+        if not isinstance(value, (list, tuple)) or not all(isinstance(v, str) for v in value):
+            raise RulesError(f"'{key}' muss eine Liste von Texten sein")
+        return value
+
+    def removes(self, codec_type, lang, is_comm=False, mimetype=''):
+        """True, wenn die Spur nach den Regeln entfernt werden soll (ohne RUN_CLEANUP)."""
+        if codec_type == 'attachment':
+            return self.remove_fonts if is_font_mimetype(mimetype) else self.remove_attachments
+        keep = self.keep_langs.get(codec_type)
+        return keep is not None and lang not in keep and not (is_comm and codec_type == 'audio')
+
+    def codec_label(self, codec, profile, channels):
+        """"Dolby Digital 5.1" usw.; über (Codec, Profil, Kanäle) gecacht."""
+        key = (codec, profile, channels)
+        label = self._title_cache.get(key)
+        if label is None:
+            name = codec.upper()
+            profile_l = (profile or '').lower()
+            for match, title in self.codec_titles.get(codec.lower(), ()):
+                if match(profile_l): name = title; break
+            layout = channel_layout_label(channels)
+            label = f"{name} {layout}" if name and layout else name
+            self._title_cache[key] = label
+        return label
+
+    def language_name(self, lang):
+        return self.language_names.get(lang) or lang.upper()
+
+def load_rules_file(path):
+    """Liest RULES_FILE (JSON); fehlt die Datei, gilt nur die Umgebung."""
+    if not path or not os.path.isfile(path): return {}
+    try:
+        with open(path, encoding='utf-8') as f: data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RulesError(f"RULES_FILE '{path}' nicht lesbar: {e}")
+    if not isinstance(data, dict): raise RulesError(f"RULES_FILE '{path}' muss ein JSON-Objekt sein")
+    return data
+
+def compile_track_rules(env_rules, file_rules):
+    """
+    Baut die Basis-Regeln (Umgebung, überschrieben von RULES_FILE) und je Eintrag unter "roots" eigene Regeln.
+    language_names und codec_titles werden ergänzt statt ersetzt; eigene Profil-Muster stehen vor den eingebauten.
+    Gibt (Basis, [(root, Regeln)] längster Pfad zuerst) zurück.
+    """
+    def merge(base, override):
+        merged = dict(base)
+        for key, value in override.items():
+            if key == 'language_names':
+                if not isinstance(value, dict): raise RulesError("'language_names' muss ein Objekt {Code: Name} sein")
+                merged[key] = {**base[key], **{normalize_lang_code(k): v for k, v in value.items()}}
+            elif key == 'codec_titles':
+                if not isinstance(value, dict): raise RulesError("'codec_titles' muss ein Objekt sein")
+                titles = dict(base[key])
+                for codec, patterns in value.items():
+                    if not isinstance(patterns, dict): raise RulesError(f"codec_titles.{codec} muss ein Objekt {{Profil-Muster: Name}} sein")
+                    combined = dict(patterns)
+                    for pattern, title in titles.get(codec.lower(), {}).items(): combined.setdefault(pattern, title)
+                    titles[codec.lower()] = combined
+                merged[key] = titles
+            else:
+                merged[key] = value
+        return merged
+
+    file_rules = dict(file_rules)
+    roots = file_rules.pop('roots', {}) or {}
+    if not isinstance(roots, dict): raise RulesError("'roots' muss ein Objekt {Pfad: Regeln} sein")
+    base_raw = merge(env_rules, file_rules)
+    base = TrackRules(base_raw)
+    per_root = []
+    for root, override in roots.items():
+        if not isinstance(override, dict): raise RulesError(f"roots.{root} muss ein Objekt sein")
+        per_root.append((root.rstrip('/\\'), TrackRules(merge(base_raw, override))))
+    return base, sorted(per_root, key=lambda r: len(r[0]), reverse=True)
+
+def rules_for_path(path):
+    """Regeln des längsten passenden Roots aus RULES_FILE, sonst die Basis-Regeln."""
+    for root, rules in TRACK_RULES_BY_ROOT:
+        if path == root or path.startswith(root + os.sep): return rules
+    return TRACK_RULES
+
+def load_config(read_file=True):
+    """
+    Liest die komplette Konfiguration aus der Umgebung (mit read_file vorher aus CONFIG_FILE ergänzt) in die Modul-Globals.
+    Wird beim Start und bei SIGHUP aufgerufen; DB_PATH und LOG_LEVEL gelten nur beim Start.
+    """
+    global WHISPER_API_URL, WHISPER_TIMEOUT, RUN_INTERVAL_SECONDS, DRY_RUN, MAX_FAILURES, MAX_TRANSIENT_FAILURES, STARTUP_DELAY_SECONDS
+    global UPDATE_CHECK, RETRY_BACKOFF_BASE_SECONDS, RETRY_BACKOFF_MAX_SECONDS, SONARR_URL, RADARR_URL, SONARR_API_KEY
+    global RADARR_API_KEY, SONARR_PATHS_RAW, RADARR_PATHS_RAW, RUN_CLEANUP, SCAN_MODE, FULL_SCAN_INTERVAL_HOURS
+    global SCAN_ORDER, PRIORITY_RECENT_HOURS, MAX_RUN_SECONDS, RUN_WINDOW_RAW, ARR_PREFILTER, MP4_INPLACE_EDIT, REMOVE_AUDIO
+    global REMOVE_SUBTITLES, REMOVE_ATTACHMENTS, RENAME_AUDIO_TRACKS, REMOVE_FONTS, KEEP_COMMENTARY
+    global LOG_STATS_ON_COMPLETION, BATCH_COMMIT_SIZE, RUN_HISTORY_DAYS, FFMPEG_TIMEOUT, MKVPROPEDIT_TIMEOUT, FFMPEG_SAMPLE_TIMEOUT
+    global REMUX_STALL_SECONDS, REMUX_MIN_MBPS, REMUX_PROGRESS_LOG_SECONDS, MAX_PARALLEL_FILES, PROBE_CONCURRENCY
+    global DETECT_CONCURRENCY, REMUX_CONCURRENCY, EDIT_CONCURRENCY, REMUX_MAX_MBPS, REMUX_IONICE, IO_DEVICE_GROUPS_RAW
+    global REMUX_SCRATCH_DIR, REMUX_MIN_FREE_MB, REMUX_ENGINE, REMUX_MKVMERGE_MIN_MB, KEEP_AUDIO_LANGS
+    global KEEP_SUBTITLE_LANGS, DEFAULT_AUDIO_LANG, DEFAULT_SUBTITLE_LANG, IO_DEVICE_GROUPS, RUN_WINDOW, SCAN_PATHS
+    global RULES_FILE, TRACK_RULES, TRACK_RULES_BY_ROOT, RULES_ERROR, LANGUAGE_DETECTOR, DETECTOR_BACKEND, LOCAL_WHISPER_MODEL
+    global LOCAL_WHISPER_COMPUTE_TYPE, LOCAL_WHISPER_WORKERS, LOCAL_WHISPER_THREADS, LOCAL_WHISPER_MODEL_DIR
+    if read_file: apply_config_file()
+    WHISPER_API_URL = os.getenv("WHISPER_API_URL")
+    WHISPER_TIMEOUT = int(os.getenv("WHISPER_TIMEOUT", "300"))
+    # Spracherkennung für 'und'-Audio: api (WHISPER_API_URL), local (faster-whisper im Prozess-Pool), off
+    # oder auto (api wenn WHISPER_API_URL gesetzt, sonst local wenn faster-whisper installiert ist)
+    LANGUAGE_DETECTOR = os.getenv("LANGUAGE_DETECTOR", "auto").strip().lower()
+    LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "tiny").strip()  # tiny/base/small... oder Pfad zu einem CTranslate2-Modell
+    LOCAL_WHISPER_COMPUTE_TYPE = os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8").strip()  # Quantisierung auf der CPU
+    LOCAL_WHISPER_WORKERS = int(os.getenv("LOCAL_WHISPER_WORKERS", "1"))  # Prozesse mit je einem geladenen Modell
+    LOCAL_WHISPER_THREADS = int(os.getenv("LOCAL_WHISPER_THREADS", "4"))  # CPU-Threads pro Prozess
+    LOCAL_WHISPER_MODEL_DIR = os.getenv("LOCAL_WHISPER_MODEL_DIR", "/config/models").strip()  # Download-/Cache-Verzeichnis
+    if LANGUAGE_DETECTOR == 'auto':
+        DETECTOR_BACKEND = 'api' if WHISPER_API_URL else ('local' if importlib.util.find_spec('faster_whisper') else None)
+    else:
+        DETECTOR_BACKEND = LANGUAGE_DETECTOR if LANGUAGE_DETECTOR in ('api', 'local') else None
+    RUN_INTERVAL_SECONDS = int(os.getenv("RUN_INTERVAL_SECONDS", "43200"))
+    DRY_RUN = parse_bool("DRY_RUN", True)  # Default TRUE for safety!
+    MAX_FAILURES = int(os.getenv("MAX_FAILURES", "3"))
+    STARTUP_DELAY_SECONDS = int(os.getenv("STARTUP_DELAY_SECONDS", "30"))  # Countdown nach der Konfigurationsübersicht, 0 = sofort starten
+    UPDATE_CHECK = os.getenv("UPDATE_CHECK", "background").strip().lower()  # background, sync oder off
+    # Wiederholungen nach Fehlern mit exponentiellem Backoff: dauerhafte Fehler (defekte Datei, Tool lehnt ab) höchstens
+    # MAX_FAILURES mal, vorübergehende (I/O, Timeouts, Netzwerk) höchstens MAX_TRANSIENT_FAILURES mal bei unveränderter Datei
+    MAX_TRANSIENT_FAILURES = int(os.getenv("MAX_TRANSIENT_FAILURES", "10"))
+    RETRY_BACKOFF_BASE_SECONDS = int(os.getenv("RETRY_BACKOFF_BASE_SECONDS", "3600"))
+    RETRY_BACKOFF_MAX_SECONDS = int(os.getenv("RETRY_BACKOFF_MAX_SECONDS", "604800"))
+    SONARR_URL = os.getenv("SONARR_URL")
+    RADARR_URL = os.getenv("RADARR_URL")
+    SONARR_API_KEY = os.getenv("SONARR_API_KEY")
+    RADARR_API_KEY = os.getenv("RADARR_API_KEY")
+    SONARR_PATHS_RAW = os.getenv("SONARR_PATHS", "/media/tv")
+    RADARR_PATHS_RAW = os.getenv("RADARR_PATHS", "/media/movies")
+    RUN_CLEANUP = parse_bool("RUN_CLEANUP", True)
+    # Scan-Modus: full (jeder Lauf durchsucht alle Ordner) oder incremental (nur neue Importe laut Sonarr/Radarr-History,
+    # vollständiger Abgleich nur alle FULL_SCAN_INTERVAL_HOURS)
+    SCAN_MODE = os.getenv("SCAN_MODE", "full").strip().lower()
+    FULL_SCAN_INTERVAL_HOURS = float(os.getenv("FULL_SCAN_INTERVAL_HOURS", "168"))
+    # Reihenfolge & Zeitbudget: priority (neue Importe, reine Metadaten-Fixes und kleine Dateien zuerst) oder path (alphabetisch)
+    SCAN_ORDER = os.getenv("SCAN_ORDER", "priority").strip().lower()
+    PRIORITY_RECENT_HOURS = float(os.getenv("PRIORITY_RECENT_HOURS", "72"))  # Dateien jünger als das gelten als neue Importe
+    MAX_RUN_SECONDS = int(os.getenv("MAX_RUN_SECONDS", "0"))  # 0 = unbegrenzt; danach werden keine neuen Dateien mehr begonnen
+    RUN_WINDOW_RAW = os.getenv("RUN_WINDOW", "")  # Wartungsfenster "HH:MM-HH:MM" (Ortszeit, darf über Mitternacht gehen)
+    MP4_INPLACE_EDIT = parse_bool("MP4_INPLACE_EDIT", False)  # MP4-Metadaten direkt in den Atomen ändern statt nach MKV zu konvertieren
+    ARR_PREFILTER = parse_bool("ARR_PREFILTER", False)  # Sprach-Regeln vorab gegen die mediaInfo von Sonarr/Radarr prüfen
+
+    # Smart defaults: If DRY_RUN=false, then unset remove flags default to false (safe)
+    # If DRY_RUN=true (default), then unset remove flags default to true (for testing)
+    remove_default = DRY_RUN  # true in dry-run mode, false in production mode
+    REMOVE_AUDIO = parse_bool("REMOVE_AUDIO", remove_default)
+    REMOVE_SUBTITLES = parse_bool("REMOVE_SUBTITLES", remove_default)
+    REMOVE_ATTACHMENTS = parse_bool("REMOVE_ATTACHMENTS", remove_default)
+    RENAME_AUDIO_TRACKS = parse_bool("RENAME_AUDIO_TRACKS", True)  # Always safe
+    REMOVE_FONTS = parse_bool("REMOVE_FONTS", False)  # Conservative default
+    KEEP_COMMENTARY = parse_bool("KEEP_COMMENTARY", True)
+    LOG_STATS_ON_COMPLETION = parse_bool("LOG_STATS_ON_COMPLETION", True)
+    BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", "10"))
+    RUN_HISTORY_DAYS = int(os.getenv("RUN_HISTORY_DAYS", "90"))  # Datei-Zeilen der Lauf-Historie (Läufe selbst bleiben), 0 = unbegrenzt
+
+    # Process Subprocess Timeouts from Env Vars
+    FFMPEG_TIMEOUT = int(os.getenv("FFMPEG_TIMEOUT", "1800")) # Default 30 minutes (Mindest-Budget für Remuxe, wächst mit Größe/Durchsatz)
+    MKVPROPEDIT_TIMEOUT = int(os.getenv("MKVPROPEDIT_TIMEOUT", "300")) # Default 5 minutes
+    FFMPEG_SAMPLE_TIMEOUT = int(os.getenv("FFMPEG_SAMPLE_TIMEOUT", "60")) # Default 1 minute
+    REMUX_STALL_SECONDS = int(os.getenv("REMUX_STALL_SECONDS", "120")) # Abbruch, wenn so lange kein Fortschritt
+    REMUX_MIN_MBPS = float(os.getenv("REMUX_MIN_MBPS", "10")) # Erwarteter Mindestdurchsatz für das größenabhängige Timeout
+    REMUX_PROGRESS_LOG_SECONDS = int(os.getenv("REMUX_PROGRESS_LOG_SECONDS", "30"))
+
+    # Pipeline: Anzahl parallel bearbeiteter Dateien und Limits pro Ressource
+    MAX_PARALLEL_FILES = int(os.getenv("MAX_PARALLEL_FILES", "4"))
+    PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "8"))    # ffprobe + Audio-Samples (CPU, billig)
+    DETECT_CONCURRENCY = int(os.getenv("DETECT_CONCURRENCY", "4"))  # Whisper API Calls (Remote-GPU)
+    REMUX_CONCURRENCY = int(os.getenv("REMUX_CONCURRENCY", "1"))    # ffmpeg Remux pro Gerät (schweres Disk-I/O)
+    EDIT_CONCURRENCY = int(os.getenv("EDIT_CONCURRENCY", "2"))      # mkvpropedit (leichtes I/O)
+
+    # I/O-Scheduling pro Gerät: Remux-Bandbreite (MB/s pro Gerät, 0 = unbegrenzt) und I/O-Priorität der ffmpeg-Prozesse
+    REMUX_MAX_MBPS = float(os.getenv("REMUX_MAX_MBPS", "0"))
+    REMUX_IONICE = os.getenv("REMUX_IONICE", "best-effort").strip().lower()  # idle, best-effort, off
+    IO_DEVICE_GROUPS_RAW = os.getenv("IO_DEVICE_GROUPS", "")  # z.B. "/media/tv=nas,/media/movies=nas"
+
+    # Remux-Staging: Optionales schnelles lokales Verzeichnis für die Remux-Ausgabe und Mindest-Reserve an freiem Platz
+    REMUX_SCRATCH_DIR = os.getenv("REMUX_SCRATCH_DIR", "").strip()
+    REMUX_MIN_FREE_MB = int(os.getenv("REMUX_MIN_FREE_MB", "1024"))
+
+    # Remux-Engine: auto (mkvmerge für MKV ab REMUX_MKVMERGE_MIN_MB, sonst ffmpeg), ffmpeg oder mkvmerge
+    REMUX_ENGINE = os.getenv("REMUX_ENGINE", "auto").strip().lower()
+    REMUX_MKVMERGE_MIN_MB = int(os.getenv("REMUX_MKVMERGE_MIN_MB", "2048"))
+
+    KEEP_AUDIO_LANGS = parse_env_list("KEEP_AUDIO_LANGS", "jpn,deu,eng,und")
+    KEEP_SUBTITLE_LANGS = parse_env_list("KEEP_SUBTITLE_LANGS", "jpn,deu,eng")
+    DEFAULT_AUDIO_LANG = parse_env_single("DEFAULT_AUDIO_LANG", "jpn")
+    DEFAULT_SUBTITLE_LANG = parse_env_single("DEFAULT_SUBTITLE_LANG", "deu")
+
+    # Optionale JSON-Regeldatei (Keep/Remove/Default je Root, Codec-Titel); die Werte oben sind ihre Basis
+    RULES_FILE = os.getenv("RULES_FILE", "/config/language-fixer-rules.json").strip()
+    env_rules = {'keep_audio': KEEP_AUDIO_LANGS, 'keep_subtitles': KEEP_SUBTITLE_LANGS,
+                 'default_audio': DEFAULT_AUDIO_LANG, 'default_subtitle': DEFAULT_SUBTITLE_LANG,
+                 'remove_audio': REMOVE_AUDIO, 'remove_subtitles': REMOVE_SUBTITLES, 'remove_attachments': REMOVE_ATTACHMENTS,
+                 'remove_fonts': REMOVE_FONTS, 'keep_commentary': KEEP_COMMENTARY, 'rename_audio': RENAME_AUDIO_TRACKS,
+                 'commentary_keywords': COMMENTARY_KEYWORDS, 'language_names': AUDIO_LANGUAGE_NAMES, 'codec_titles': CODEC_TITLES}
+    RULES_ERROR = None
+    try:
+        TRACK_RULES, TRACK_RULES_BY_ROOT = compile_track_rules(env_rules, load_rules_file(RULES_FILE))
+    except RulesError as e:
+        RULES_ERROR = str(e)
+        TRACK_RULES, TRACK_RULES_BY_ROOT = compile_track_rules(env_rules, {})
+    # Die Globals spiegeln die effektiven Basis-Regeln (Übersicht, Validierung, Vorfilter ohne Root-Regel)
+    KEEP_AUDIO_LANGS, KEEP_SUBTITLE_LANGS = TRACK_RULES.keep_audio, TRACK_RULES.keep_subtitles
+    DEFAULT_AUDIO_LANG, DEFAULT_SUBTITLE_LANG = TRACK_RULES.default_audio, TRACK_RULES.default_subtitle
+    REMOVE_AUDIO, REMOVE_SUBTITLES = TRACK_RULES.remove_audio, TRACK_RULES.remove_subtitles
+    REMOVE_ATTACHMENTS, REMOVE_FONTS = TRACK_RULES.remove_attachments, TRACK_RULES.remove_fonts
+    KEEP_COMMENTARY, RENAME_AUDIO_TRACKS = TRACK_RULES.keep_commentary, TRACK_RULES.rename_audio
+
+    IO_DEVICE_GROUPS = parse_device_groups(IO_DEVICE_GROUPS_RAW)
+    RUN_WINDOW = parse_run_window(RUN_WINDOW_RAW)
+    SCAN_PATHS = {"sonarr": [p.strip() for p in SONARR_PATHS_RAW.split(',') if p.strip()],
+                  "radarr": [p.strip() for p in RADARR_PATHS_RAW.split(',') if p.strip()]}
+
+# Spawn-Worker der lokalen Spracherkennung importieren das Modul erneut, brauchen aber keine Konfiguration
+# (und sollen weder CONFIG_FILE/RULES_FILE neu lesen noch deren Warnungen wiederholen)
+if multiprocessing.current_process().name == 'MainProcess': load_config()
+
 MODIFIED_SONARR_PATHS = set()
 MODIFIED_RADARR_PATHS = set()
-SCAN_PATHS = {}
 
 def print_configuration_summary():
     """
@@ -140,7 +595,7 @@ def print_configuration_summary():
     # Version & Update Check
     print("� VERSION & UPDATES:")
     print(f"   Aktuelle Version: {__version__}")
-    print(f"   Update Check:     https://github.com/Randomname653/language-fixer/releases")
+    print(f"   Update Check:     {UPDATE_CHECK} (https://github.com/Randomname653/language-fixer/releases)")
     print(f"   Docker Image:     luckyone94/language-fixer:latest")
     print("   💡 Tipp: Verwende ':latest' Tag für automatische Updates!")
     print("   🔄 Update Befehl: docker compose pull && docker compose up -d")
@@ -155,8 +610,16 @@ def print_configuration_summary():
     print("📁 KERN-EINSTELLUNGEN:")
     print(f"   Database:         {DB_PATH}")
     print(f"   Log Level:        {LOG_LEVEL_FROM_ENV}")
+    print(f"   Log Format:       {LOG_FORMAT}" + (f" (max. {LOG_RATE_LIMIT} Meldungen/Stelle je {LOG_RATE_WINDOW_SECONDS:g}s)" if LOG_RATE_LIMIT > 0 else ""))
     print(f"   Scan Interval:    {RUN_INTERVAL_SECONDS}s ({RUN_INTERVAL_SECONDS//3600}h {(RUN_INTERVAL_SECONDS%3600)//60}m)")
-    print(f"   Max Failures:     {MAX_FAILURES}")
+    print(f"   Max Failures:     {MAX_FAILURES} (vorübergehend: {MAX_TRANSIENT_FAILURES})")
+    print(f"   Retry-Backoff:    {RETRY_BACKOFF_BASE_SECONDS}s → max. {RETRY_BACKOFF_MAX_SECONDS}s (dauerhafte Fehler: {RETRY_BACKOFF_MAX_SECONDS}s)")
+    print(f"   Scan-Modus:       {SCAN_MODE}" + (f" (vollständiger Abgleich alle {FULL_SCAN_INTERVAL_HOURS:g}h)" if SCAN_MODE == 'incremental' else ''))
+    print(f"   Reihenfolge:      {SCAN_ORDER}" + (f" (neue Importe < {PRIORITY_RECENT_HOURS:g}h zuerst)" if SCAN_ORDER == 'priority' else ''))
+    if MAX_RUN_SECONDS > 0 or RUN_WINDOW:
+        budget = [f"max. {MAX_RUN_SECONDS}s"] if MAX_RUN_SECONDS > 0 else []
+        if RUN_WINDOW: budget.append(f"Fenster {RUN_WINDOW_RAW.strip()}")
+        print(f"   Zeitbudget:       {', '.join(budget)}")
     print(f"   Batch Commits:    {BATCH_COMMIT_SIZE} Dateien")
     print()
     
@@ -174,6 +637,8 @@ def print_configuration_summary():
     print(f"   Remove Fonts:     {REMOVE_FONTS}")
     print(f"   Keep Commentary:  {KEEP_COMMENTARY}")
     print(f"   Cleanup:          {RUN_CLEANUP}")
+    print(f"   Arr-Vorfilter:    {ARR_PREFILTER}")
+    print(f"   MP4:              {'Metadaten in place ändern, Remux nur beim Entfernen' if MP4_INPLACE_EDIT else 'immer nach MKV konvertieren'}")
     print()
     
     # Language Settings
@@ -182,19 +647,42 @@ def print_configuration_summary():
     print(f"   Keep Subtitles:   {', '.join(sorted(KEEP_SUBTITLE_LANGS))}")
     print(f"   Default Audio:    {DEFAULT_AUDIO_LANG}")
     print(f"   Default Subtitle: {DEFAULT_SUBTITLE_LANG}")
+    if TRACK_RULES_BY_ROOT or os.path.isfile(RULES_FILE):
+        roots = f", eigene Regeln für {len(TRACK_RULES_BY_ROOT)} Pfad(e)" if TRACK_RULES_BY_ROOT else ''
+        print(f"   Regeldatei:       {RULES_FILE}{roots}")
     print()
     
     # Timeouts
     print("⏱️ TIMEOUT-EINSTELLUNGEN:")
-    print(f"   FFmpeg:           {FFMPEG_TIMEOUT}s ({FFMPEG_TIMEOUT//60}min)")
+    print(f"   Remux (min.):     {FFMPEG_TIMEOUT}s ({FFMPEG_TIMEOUT//60}min), adaptiv ab {REMUX_MIN_MBPS:g} MB/s")
+    print(f"   Remux-Stall:      {REMUX_STALL_SECONDS}s ohne Fortschritt")
     print(f"   mkvpropedit:      {MKVPROPEDIT_TIMEOUT}s ({MKVPROPEDIT_TIMEOUT//60}min)")
     print(f"   Sampling:         {FFMPEG_SAMPLE_TIMEOUT}s")
     print(f"   Whisper API:      {WHISPER_TIMEOUT}s ({WHISPER_TIMEOUT//60}min)")
     print()
     
+    # Pipeline
+    print("🧵 PIPELINE (max. gleichzeitig, Dateien pro Gerät):")
+    print(f"   Dateien:          {MAX_PARALLEL_FILES}")
+    print(f"   Probe/Samples:    {PROBE_CONCURRENCY}")
+    print(f"   Whisper:          {DETECT_CONCURRENCY}")
+    print(f"   Remux:            {REMUX_CONCURRENCY} pro Gerät")
+    print(f"   mkvpropedit:      {EDIT_CONCURRENCY}")
+    print(f"   Remux-Bandbreite: {f'{REMUX_MAX_MBPS:g} MB/s pro Gerät' if REMUX_MAX_MBPS > 0 else 'unbegrenzt'}")
+    print(f"   Remux I/O-Prio:   {REMUX_IONICE or 'off'}")
+    auto_engine = (' (nur ffmpeg wegen REMUX_MAX_MBPS)' if REMUX_MAX_MBPS > 0 else f" (mkvmerge für MKV ab {REMUX_MKVMERGE_MIN_MB} MB)")
+    print(f"   Remux-Engine:     {REMUX_ENGINE}" + (auto_engine if REMUX_ENGINE == 'auto' else ''))
+    print(f"   Remux-Scratch:    {REMUX_SCRATCH_DIR or 'neben dem Original'} (Reserve {REMUX_MIN_FREE_MB} MB)")
+    if IO_DEVICE_GROUPS:
+        print(f"   Geräte-Gruppen:   {', '.join(f'{p}={n}' for p, n in IO_DEVICE_GROUPS)}")
+    print()
+    
     # Integrations
     print("🔗 INTEGRATIONEN:")
-    print(f"   Whisper API:      {'✅ Aktiviert' if WHISPER_API_URL else '❌ Deaktiviert'}")
+    if DETECTOR_BACKEND == 'local':
+        print(f"   Spracherkennung:  ✅ Lokal (faster-whisper {LOCAL_WHISPER_MODEL}, {LOCAL_WHISPER_COMPUTE_TYPE}, {LOCAL_WHISPER_WORKERS}x{LOCAL_WHISPER_THREADS} Threads)")
+    else:
+        print(f"   Spracherkennung:  {'✅ Whisper API' if DETECTOR_BACKEND == 'api' else '❌ Deaktiviert'}")
     print(f"   Sonarr:           {'✅ Aktiviert' if SONARR_URL and SONARR_API_KEY else '❌ Deaktiviert'}")
     print(f"   Radarr:           {'✅ Aktiviert' if RADARR_URL and RADARR_API_KEY else '❌ Deaktiviert'}")
     print()
@@ -222,47 +710,286 @@ def print_configuration_summary():
         print("🔒" * 20)
     
     print("="*80)
-    print("⏳ Warte 30 Sekunden, damit Konfiguration gelesen werden kann...")
-    print("   (Drücke Ctrl+C zum Abbrechen)")
-    print("="*80)
-    
-    # 30 second countdown
-    for i in range(30, 0, -1):
-        print(f"\r⏳ Starte in {i:2d} Sekunden... {'🔒 DRY-RUN' if DRY_RUN else '⚠️ PRODUKTIV'}", end="", flush=True)
-        time.sleep(1)
-    
-    print(f"\n🚀 Starting Language-Fixer {'(DRY-RUN)' if DRY_RUN else '(PRODUKTIV)'}!")
+    if STARTUP_DELAY_SECONDS > 0:
+        print(f"⏳ Warte {STARTUP_DELAY_SECONDS} Sekunden, damit Konfiguration gelesen werden kann...")
+        print("   (Drücke Ctrl+C zum Abbrechen, STARTUP_DELAY_SECONDS=0 überspringt den Countdown)")
+        print("="*80)
+
+        for i in range(STARTUP_DELAY_SECONDS, 0, -1):
+            print(f"\r⏳ Starte in {i:2d} Sekunden... {'🔒 DRY-RUN' if DRY_RUN else '⚠️ PRODUKTIV'}", end="", flush=True)
+            time.sleep(1)
+        print()
+
+    print(f"🚀 Starting Language-Fixer {'(DRY-RUN)' if DRY_RUN else '(PRODUKTIV)'}!")
     print("="*80)
     print()
 class ScanStats:
     def __init__(self):
         self.start_time=datetime.now(); self.dirs_scanned=0; self.files_checked=0; self.files_skipped_db=0
         self.files_processed=0; self.files_failed=0; self.audio_tagged=0
-        self.lang_counts=defaultdict(int); self.files_remuxed_ffmpeg=0
-        self.files_edited_mkvprop=0; self.files_converted_mp4=0
+        self.lang_counts=defaultdict(int); self.files_remuxed_ffmpeg=0; self.files_remuxed_mkvmerge=0
+        self.files_edited_mkvprop=0; self.files_converted_mp4=0; self.files_edited_mp4=0; self.mp4_io_avoided=0
         self.audio_removed=0; self.subs_removed=0; self.attachments_removed=0
         self.audio_renamed=0; self.default_audio_set=0; self.default_sub_set=0
-        self.bytes_saved=0
+        self.bytes_saved=0; self.files_deferred_space=0
+        self.remux_bytes_written=0; self.remux_bytes_read=0; self.remux_seconds=0.0; self.remux_stalls=0
+        self.scratch_bytes_copied=0  # Vom REMUX_SCRATCH_DIR zurück aufs Ziel-Volume geschrieben
+        self.files_prefiltered=0; self.files_deferred_budget=0; self.files_skipped_backoff=0
+        self.db_rows_pruned=0; self.db_dirs_pruned=0
+        self.stage_seconds=defaultdict(float); self.stage_wait_seconds=defaultdict(float)  # Belegt bzw. auf Slot gewartet
+        self.file_results=[]  # (Pfad, action, duration_ms, bytes_read, bytes_written) für die Lauf-Historie
     def get_duration(self):
         duration = datetime.now()-self.start_time
         return str(duration).split('.')[0] # Remove microseconds for cleaner output
+    def merge(self, other):
+        """Addiert die Zähler eines anderen ScanStats (z.B. einer einzelnen Datei) auf diesen Lauf."""
+        for key, value in vars(other).items():
+            if key == 'start_time': continue
+            if isinstance(value, dict):
+                target = getattr(self, key)
+                for k, v in value.items(): target[k] += v
+            elif isinstance(value, list): getattr(self, key).extend(value)
+            else:
+                setattr(self, key, getattr(self, key) + value)
+
+
+# --- Pipeline-Stufen & Thread-sicherer DB-Zugriff ---
+# Jede teure Ressource bekommt ein eigenes Limit, damit z.B. 8 ffprobes und 4 Whisper-Calls
+# parallel laufen können, während nur ein Remux gleichzeitig das NAS belastet.
+def stage_concurrency(name):
+    """Aktuelles Limit der Stufe `name` (wird bei SIGHUP neu gelesen)."""
+    return {'probe': PROBE_CONCURRENCY, 'detect': DETECT_CONCURRENCY, 'remux': REMUX_CONCURRENCY, 'edit': EDIT_CONCURRENCY}[name]
+
+STAGE_LIMITS = {}
+_STAGE_LIMITS_LOCK = threading.Lock()
+DB_LOCK = threading.RLock()
+FILE_STATS = threading.local()  # ScanStats der Datei, die der aktuelle Worker-Thread bearbeitet (Stufen-Zeiten)
+
+@contextmanager
+def pipeline_stage(name, device=None):
+    """
+    Blockiert, bis in der Stufe `name` (probe, detect, remux, edit) ein Slot frei ist.
+    Mit `device` gilt das Limit pro Gerät, damit unabhängige Platten parallel remuxen können.
+    """
+    key = (name, device)
+    with _STAGE_LIMITS_LOCK:
+        sem = STAGE_LIMITS.get(key)
+        if sem is None:
+            sem = STAGE_LIMITS[key] = threading.BoundedSemaphore(max(1, stage_concurrency(name)))
+    waited = time.monotonic()
+    sem.acquire()
+    started = time.monotonic()
+    try:
+        with log_context(stage=name):
+            yield
+    finally:
+        sem.release()
+        stats = getattr(FILE_STATS, 'current', None)
+        if stats is not None:
+            stats.stage_wait_seconds[name] += started - waited
+            stats.stage_seconds[name] += time.monotonic() - started
+
+def seconds_until_window(now=None):
+    """Sekunden bis zum Beginn des Wartungsfensters (0 = Fenster ist offen bzw. keins konfiguriert)."""
+    if not RUN_WINDOW: return 0
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute + now.second / 60
+    start, end = RUN_WINDOW
+    inside = start <= minute < end if start < end else (minute >= start or minute < end)
+    return 0 if inside else int(((start - minute) % 1440) * 60)
+
+def compute_run_deadline():
+    """Monotoner Zeitpunkt, ab dem keine neuen Dateien mehr begonnen werden (None = unbegrenzt)."""
+    limits = []
+    if MAX_RUN_SECONDS > 0: limits.append(MAX_RUN_SECONDS)
+    if RUN_WINDOW:
+        now = datetime.now()
+        minute = now.hour * 60 + now.minute + now.second / 60
+        limits.append(((RUN_WINDOW[1] - minute) % 1440) * 60)
+    return time.monotonic() + min(limits) if limits else None
+
+def get_device_key(path):
+    """
+    Liefert den Scheduling-Schlüssel für das Gerät, auf dem `path` liegt.
+    Manuelle Gruppen (IO_DEVICE_GROUPS, z.B. mehrere NFS-Exports desselben Arrays) haben Vorrang vor st_dev.
+    """
+    for prefix, name in IO_DEVICE_GROUPS:
+        if path == prefix or path.startswith(prefix + os.sep): return f"group:{name}"
+    try: return f"dev:{os.stat(path).st_dev}"
+    except OSError: return "dev:unknown"
+
+def find_mount_point(path):
+    """Läuft im Verzeichnisbaum nach oben, bis der Mount-Punkt von `path` erreicht ist (nur für Logs)."""
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path: break
+        path = parent
+    return path
+
+def io_priority_prefix():
+    """Befehls-Präfix, das ffmpeg-Remuxe per ionice in eine niedrigere I/O-Klasse setzt (falls verfügbar)."""
+    if REMUX_IONICE in ('', 'off', 'none', 'false'): return []
+    if not shutil.which('ionice'): return []
+    if REMUX_IONICE == 'idle': return ['ionice', '-c', '3']
+    return ['ionice', '-c', '2', '-n', '7']
+
+def remux_readrate_args(size_bytes, duration_s):
+    """
+    Übersetzt REMUX_MAX_MBPS in ffmpegs -readrate (Vielfaches der Echtzeit-Geschwindigkeit).
+    Das Budget gilt pro Gerät und wird auf die REMUX_CONCURRENCY gleichzeitigen Remuxe verteilt.
+    """
+    if REMUX_MAX_MBPS <= 0 or size_bytes <= 0 or duration_s <= 0: return []
+    realtime_bps = size_bytes / duration_s
+    return ['-readrate', f"{remux_slot_bps() / realtime_bps:.3f}"]
+
+def remux_slot_bps():
+    """REMUX_MAX_MBPS-Anteil eines Remux-Slots in Bytes/s (0 = unbegrenzt)."""
+    if REMUX_MAX_MBPS <= 0: return 0
+    return REMUX_MAX_MBPS * 1024 * 1024 / max(1, REMUX_CONCURRENCY)
+
+SCRATCH_COPY_CHUNK = 8 * 1024 * 1024
+
+def copy_scratch_result(src, dst, stats):
+    """
+    Kopiert das Scratch-Ergebnis blockweise aufs Ziel-Volume und löscht es danach – mit demselben REMUX_MAX_MBPS-Anteil
+    wie der Remux und per ionice in derselben I/O-Klasse. Läuft in einem eigenen Thread, damit die ionice-Klasse
+    nicht am Worker-Thread hängen bleibt.
+    """
+    def copy():
+        prefix = io_priority_prefix()
+        if prefix: subprocess.run(prefix + ['-p', str(threading.get_native_id())], check=False, capture_output=True)
+        cap_bps = remux_slot_bps(); started = time.monotonic(); copied = 0
+        try:
+            with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+                while True:
+                    chunk = fin.read(SCRATCH_COPY_CHUNK)
+                    if not chunk: break
+                    if SHUTDOWN_REQUESTED.is_set(): raise RemuxAborted("Beenden angefordert (SIGTERM) beim Zurückkopieren")
+                    fout.write(chunk); copied += len(chunk)
+                    if cap_bps:
+                        ahead = copied / cap_bps - (time.monotonic() - started)
+                        if ahead > 0: time.sleep(ahead)
+        finally:
+            stats.scratch_bytes_copied += copied
+        os.remove(src)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='scratch-copy') as pool: pool.submit(copy).result()
+
+# --- Remux-Staging & Platz-Prüfung ---
+class RemuxDeferred(Exception):
+    """Remux wird zurückgestellt (z.B. zu wenig Platz). Kein Fehler – der nächste Lauf versucht es erneut."""
+
+_SCRATCH_RESERVED = 0
+_SCRATCH_LOCK = threading.Lock()
+
+def estimate_remux_output_size(size_bytes, streams, removed_indexes, duration_s):
+    """
+    Schätzt die Größe der Remux-Ausgabe: Originalgröße minus die entfernten Spuren, soweit deren Größe
+    bekannt ist (NUMBER_OF_BYTES/BPS-Tags von mkvmerge oder bit_rate), plus 1% Container-Overhead.
+    Spuren ohne Größenangabe werden konservativ nicht abgezogen.
+    """
+    removed = 0
+    for st in streams:
+        if st.get('index') not in removed_indexes: continue
+        tags = st.get('tags', {})
+        try:
+            nbytes = tags.get('NUMBER_OF_BYTES') or tags.get('NUMBER_OF_BYTES-eng')
+            if nbytes: removed += int(nbytes); continue
+            bps = st.get('bit_rate') or tags.get('BPS') or tags.get('BPS-eng')
+            if bps and duration_s > 0: removed += int(bps) * duration_s / 8
+        except (ValueError, TypeError):
+            pass
+    return int(max(0, size_bytes - removed) * 1.01)
+
+def get_free_bytes(path):
+    try: return shutil.disk_usage(path).free
+    except OSError as e:
+        logging.warning(f"Konnte freien Speicher nicht ermitteln für {path}: {e}")
+        return None
+
+def reserve_remux_staging(out_p, estimate):
+    """
+    Prüft vor dem Remux den Platz auf Ziel und (falls konfiguriert) REMUX_SCRATCH_DIR.
+
+    Gibt das Scratch-Verzeichnis zurück (Platz ist dann für diesen Remux reserviert und muss mit
+    release_remux_staging() freigegeben werden) oder None, wenn direkt neben dem Original geschrieben wird.
+    Reicht der Platz auf dem Ziel nicht, wird RemuxDeferred geworfen – der Scratch-Weg braucht ihn ebenfalls,
+    da beim Zurückverschieben Original und neue Datei kurz nebeneinander liegen.
+    """
+    global _SCRATCH_RESERVED
+    needed = estimate + REMUX_MIN_FREE_MB * 1024 * 1024
+    dest_free = get_free_bytes(os.path.dirname(out_p) or '.')
+    if dest_free is not None and dest_free < needed:
+        raise RemuxDeferred(f"zu wenig Platz am Ziel ({format_bytes(dest_free)} frei, {format_bytes(needed)} benötigt)")
+    if not REMUX_SCRATCH_DIR: return None
+    with _SCRATCH_LOCK:
+        scratch_free = get_free_bytes(REMUX_SCRATCH_DIR)
+        if scratch_free is None: return None
+        if scratch_free - _SCRATCH_RESERVED < needed:
+            logging.info(f"  -> Scratch-Verzeichnis zu voll ({format_bytes(scratch_free - _SCRATCH_RESERVED)} verfügbar), schreibe direkt ans Ziel.")
+            return None
+        _SCRATCH_RESERVED += estimate
+    return REMUX_SCRATCH_DIR
+
+def release_remux_staging(estimate):
+    global _SCRATCH_RESERVED
+    with _SCRATCH_LOCK: _SCRATCH_RESERVED = max(0, _SCRATCH_RESERVED - estimate)
+
+def cleanup_scratch_dir():
+    """Entfernt übrig gebliebene .remux_tmp_* Dateien aus REMUX_SCRATCH_DIR (z.B. nach einem Absturz)."""
+    if not REMUX_SCRATCH_DIR or not os.path.isdir(REMUX_SCRATCH_DIR): return
+    for name in os.listdir(REMUX_SCRATCH_DIR):
+        if '.remux_tmp_' not in name: continue
+        path = os.path.join(REMUX_SCRATCH_DIR, name)
+        try: os.remove(path); logging.info(f"🧹 Alte Scratch-Datei gelöscht: {path}")
+        except OSError as e: logging.warning(f"Konnte alte Scratch-Datei nicht löschen: {path} - {e}")
+
+class LockedCursor:
+    """Eigener Cursor pro Job (nie zwischen Threads teilen); alle Zugriffe auf die gemeinsame Verbindung laufen über DB_LOCK."""
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+    def execute(self, sql, params=()):
+        with DB_LOCK: self._cursor.execute(sql, params)
+        return self
+    def executemany(self, sql, seq):
+        with DB_LOCK: self._cursor.executemany(sql, seq)
+        return self
+    def fetchone(self):
+        with DB_LOCK: return self._cursor.fetchone()
+    def fetchall(self):
+        with DB_LOCK: return self._cursor.fetchall()
+
+def query_one(cursor, sql, params=()):
+    """execute + fetchone unter einem DB_LOCK, damit kein anderer Thread dazwischen auf demselben Cursor abfragt."""
+    with DB_LOCK:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
 
 
 # --- Configuration Validation ---
-def validate_config():
-    """Prüft die Konfiguration auf logische Konsistenz und fehlende Werte."""
+def validate_config(fatal=True):
+    """Prüft die Konfiguration auf logische Konsistenz und fehlende Werte. Mit fatal=False wird nur das Ergebnis zurückgegeben."""
     valid = True
     logging.info("⚙️ Prüfe Konfiguration...")
 
-    # Check if Whisper is needed but not configured
-    if not WHISPER_API_URL and ('und' not in KEEP_AUDIO_LANGS):
-        logging.error("❌ Konfigurationsfehler: 'und' Audiospuren sollen analysiert werden (nicht in KEEP_AUDIO_LANGS), aber WHISPER_API_URL ist nicht gesetzt!")
+    # Spracherkennung: Backend muss zu LANGUAGE_DETECTOR passen und verfügbar sein
+    if LANGUAGE_DETECTOR not in ('auto', 'api', 'local', 'off'):
+        logging.error(f"❌ Konfigurationsfehler: Unbekannter LANGUAGE_DETECTOR '{LANGUAGE_DETECTOR}' (erlaubt: auto, api, local, off).")
         valid = False
-    elif WHISPER_API_URL:
+    elif LANGUAGE_DETECTOR == 'api' and not WHISPER_API_URL:
+        logging.error("❌ Konfigurationsfehler: LANGUAGE_DETECTOR=api, aber WHISPER_API_URL ist nicht gesetzt!")
+        valid = False
+    elif LANGUAGE_DETECTOR == 'local' and not importlib.util.find_spec('faster_whisper'):
+        logging.error("❌ Konfigurationsfehler: LANGUAGE_DETECTOR=local, aber faster-whisper ist nicht installiert (Image mit --build-arg LOCAL_WHISPER=true bauen).")
+        valid = False
+    elif not DETECTOR_BACKEND and ('und' not in KEEP_AUDIO_LANGS):
+        logging.error("❌ Konfigurationsfehler: 'und' Audiospuren sollen analysiert werden (nicht in KEEP_AUDIO_LANGS), aber weder WHISPER_API_URL noch lokale Erkennung (faster-whisper) ist verfügbar!")
+        valid = False
+    elif DETECTOR_BACKEND:
         if 'und' in KEEP_AUDIO_LANGS:
-            logging.warning("⚠️ Whisper API URL ist gesetzt, aber 'und' ist in KEEP_AUDIO_LANGS. Whisper wird NICHT für 'und'-Spuren verwendet.")
+            logging.warning(f"⚠️ Spracherkennung ({DETECTOR_BACKEND}) ist aktiv, aber 'und' ist in KEEP_AUDIO_LANGS. Sie wird NICHT für 'und'-Spuren verwendet.")
         else:
-            logging.info("   Whisper wird für 'und'-Spuren verwendet.")
+            logging.info(f"   Spracherkennung ({DETECTOR_BACKEND}) wird für 'und'-Spuren verwendet.")
 
     if DEFAULT_AUDIO_LANG and DEFAULT_AUDIO_LANG not in KEEP_AUDIO_LANGS:
         logging.warning(f"⚠️ Konfigurationswarnung: DEFAULT_AUDIO_LANG ('{DEFAULT_AUDIO_LANG}') ist nicht in KEEP_AUDIO_LANGS ({KEEP_AUDIO_LANGS}). Default-Flag wird möglicherweise für eine Spur gesetzt, die entfernt wird.")
@@ -270,6 +997,9 @@ def validate_config():
     if DEFAULT_SUBTITLE_LANG and DEFAULT_SUBTITLE_LANG not in KEEP_SUBTITLE_LANGS:
         logging.warning(f"⚠️ Konfigurationswarnung: DEFAULT_SUBTITLE_LANG ('{DEFAULT_SUBTITLE_LANG}') ist nicht in KEEP_SUBTITLE_LANGS ({KEEP_SUBTITLE_LANGS}). Default-Flag wird möglicherweise für eine Spur gesetzt, die entfernt wird.")
 
+    if REMUX_ENGINE == 'mkvmerge' and REMUX_MAX_MBPS > 0:
+        logging.warning("⚠️ Konfigurationswarnung: REMUX_ENGINE=mkvmerge ignoriert REMUX_MAX_MBPS (mkvmerge lässt sich nicht drosseln). Für ein Bandbreiten-Limit REMUX_ENGINE=auto oder ffmpeg verwenden.")
+
     if SONARR_URL and SONARR_API_KEY and not SCAN_PATHS.get("sonarr"):
         logging.error("❌ Konfigurationsfehler: Sonarr ist konfiguriert (URL/API Key), aber keine gültigen SONARR_PATHS angegeben!")
         valid = False
@@ -277,65 +1007,264 @@ def validate_config():
         logging.error("❌ Konfigurationsfehler: Radarr ist konfiguriert (URL/API Key), aber keine gültigen RADARR_PATHS angegeben!")
         valid = False
 
+    if RULES_ERROR:
+        logging.error(f"❌ Konfigurationsfehler: {RULES_ERROR}")
+        valid = False
+    for root, _ in TRACK_RULES_BY_ROOT:
+        if not any(root == p or root.startswith(p.rstrip('/') + '/') for paths in SCAN_PATHS.values() for p in paths):
+            logging.warning(f"⚠️ RULES_FILE: Root '{root}' liegt unter keinem SONARR_PATHS/RADARR_PATHS-Pfad und greift nie.")
+
+    if RUN_WINDOW_RAW.strip() and not RUN_WINDOW:
+        logging.error(f"❌ Konfigurationsfehler: RUN_WINDOW '{RUN_WINDOW_RAW}' ist ungültig (erwartet z.B. '01:00-06:00').")
+        valid = False
+    if LOG_FORMAT not in ('text', 'json'):
+        logging.warning(f"⚠️ LOG_FORMAT '{LOG_FORMAT}' ist unbekannt (text oder json) – verwende text.")
+    if UPDATE_CHECK not in ('background', 'sync', 'off'):
+        logging.warning(f"⚠️ UPDATE_CHECK '{UPDATE_CHECK}' ist unbekannt (background, sync oder off) – verwende background.")
+    if SCAN_ORDER not in ('priority', 'path'):
+        logging.error(f"❌ Konfigurationsfehler: SCAN_ORDER '{SCAN_ORDER}' ist ungültig (priority oder path).")
+        valid = False
+
+    if ARR_PREFILTER and not ((SONARR_URL and SONARR_API_KEY) or (RADARR_URL and RADARR_API_KEY)):
+        logging.warning("⚠️ ARR_PREFILTER ist aktiv, aber weder Sonarr noch Radarr sind konfiguriert. Vorfilter bleibt wirkungslos.")
+    elif ARR_PREFILTER and all(arr_prefilter_blocker(r) for r in [TRACK_RULES] + [r for _, r in TRACK_RULES_BY_ROOT]):
+        logging.warning(f"⚠️ ARR_PREFILTER ist unter den aktuellen Regeln wirkungslos ({arr_prefilter_blocker(TRACK_RULES)} "
+                        "ist gesetzt, die Arr-mediaInfo kennt keine Spurtitel/Default-Flags/Anhänge) – es wird keine Datei vorgefiltert.")
+
     if not valid:
+        if not fatal: return False
         logging.critical("💥 Kritische Konfigurationsfehler gefunden. Skript wird beendet.")
         sys.exit(1)
     else:
         logging.info("   Konfiguration scheint gültig.")
+    return True
+
+# --- Signale: SIGHUP lädt die Konfiguration neu, SIGTERM/SIGINT beenden sauber ---
+RELOAD_REQUESTED = threading.Event()
+SHUTDOWN_REQUESTED = threading.Event()
+
+def handle_reload_signal(signum, frame):
+    RELOAD_REQUESTED.set()
+
+def handle_shutdown_signal(signum, frame):
+    SHUTDOWN_REQUESTED.set()
+    signal.signal(signum, signal.SIG_DFL)  # Ein zweites Signal beendet sofort
+
+def install_signal_handlers():
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
+    signal.signal(signal.SIGINT, handle_shutdown_signal)
+    if hasattr(signal, 'SIGHUP'): signal.signal(signal.SIGHUP, handle_reload_signal)
+
+def reload_config():
+    """
+    Liest Umgebung und CONFIG_FILE neu ein und prüft das Ergebnis mit validate_config().
+    Ist die neue Konfiguration ungültig, bleibt die bisherige aktiv. Aufruf nur zwischen zwei Dateien.
+    """
+    RELOAD_REQUESTED.clear()
+    logging.info(f"🔄 SIGHUP: Lade Konfiguration neu ({CONFIG_FILE if os.path.isfile(CONFIG_FILE) else 'nur Umgebung'})...")
+    previous_env = dict(os.environ); previous_keys = set(_CONFIG_FILE_KEYS)
+    try:
+        load_config()
+        valid = validate_config(fatal=False)
+    except (OSError, ValueError) as e:
+        logging.error(f"❌ Konfiguration konnte nicht gelesen werden: {e}")
+        valid = False
+    if not valid:
+        logging.error("❌ Neue Konfiguration ist ungültig – die bisherige bleibt aktiv.")
+        os.environ.clear(); os.environ.update(previous_env)
+        _CONFIG_FILE_KEYS.clear(); _CONFIG_FILE_KEYS.update(previous_keys)
+        load_config(read_file=False); return False
+    changed = sorted(k for k in set(previous_env) | set(os.environ) if previous_env.get(k) != os.environ.get(k))
+    with _STAGE_LIMITS_LOCK: STAGE_LIMITS.clear()  # Neue Stufen-Limits gelten ab der nächsten Datei
+    reset_language_detector()  # Lokaler Pool startet beim nächsten Bedarf mit Modell/Workern der neuen Konfiguration
+    logging.info(f"✅ Konfiguration neu geladen. Geändert: {', '.join(changed) if changed else 'nichts'}")
+    return True
+
+def interruptible_sleep(seconds):
+    """Schläft bis zu `seconds`, reagiert aber sofort auf SIGTERM und lädt bei SIGHUP zwischendurch neu."""
+    end = time.monotonic() + seconds
+    while not SHUTDOWN_REQUESTED.is_set():
+        remaining = end - time.monotonic()
+        if remaining <= 0: return
+        SHUTDOWN_REQUESTED.wait(min(remaining, 1))
+        if RELOAD_REQUESTED.is_set(): reload_config()
 
 
 # --- (2) DATENBANK ---
+# Pfade werden interniert: ein Eintrag pro Verzeichnis in `directories`, Dateien nur mit (dir_id, Name)
+PROCESSED_FILES_DDL = '''CREATE TABLE IF NOT EXISTS processed_files (dir_id INTEGER NOT NULL, name TEXT NOT NULL,
+                         mtime REAL NOT NULL, PRIMARY KEY (dir_id, name)) WITHOUT ROWID'''
+FAILED_FILES_DDL = '''CREATE TABLE IF NOT EXISTS failed_files (dir_id INTEGER NOT NULL, name TEXT NOT NULL, mtime REAL NOT NULL,
+                      fail_count INTEGER NOT NULL, last_failure REAL, error_class TEXT, next_eligible REAL,
+                      PRIMARY KEY (dir_id, name)) WITHOUT ROWID'''
+# Lauf-Historie: eine Zeile pro Lauf (Zeitreihe für Durchsatz/Regressionen) plus eine pro bearbeiteter Datei
+RUNS_DDL = '''CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started_at TEXT NOT NULL, ended_at TEXT NOT NULL,
+              duration_s REAL NOT NULL, kind TEXT NOT NULL, mode TEXT, dry_run INTEGER NOT NULL, version TEXT, config_hash TEXT,
+              files_checked INTEGER, files_skipped_db INTEGER, files_processed INTEGER, files_failed INTEGER,
+              files_remuxed INTEGER, files_edited INTEGER, files_deferred INTEGER, bytes_read INTEGER, bytes_written INTEGER,
+              bytes_saved INTEGER, remux_seconds REAL, details TEXT, config TEXT)'''
+RUN_FILES_DDL = '''CREATE TABLE IF NOT EXISTS run_files (run_id INTEGER NOT NULL, dir_id INTEGER NOT NULL, name TEXT NOT NULL,
+                   action TEXT NOT NULL, duration_ms INTEGER, bytes_read INTEGER, bytes_written INTEGER,
+                   PRIMARY KEY (run_id, dir_id, name)) WITHOUT ROWID'''
+DIR_IDS = {}  # Cache Verzeichnis -> directories.id; wird pro Lauf geleert (Rollbacks, Bereinigung)
+
 def init_db():
+    migrated = False
     try:
         with sqlite3.connect(DB_PATH) as conn:
             cursor = conn.cursor()
-            cursor.execute('''CREATE TABLE IF NOT EXISTS processed_files (filepath TEXT PRIMARY KEY, mtime REAL NOT NULL)''')
-            cursor.execute('''CREATE TABLE IF NOT EXISTS failed_files (filepath TEXT PRIMARY KEY, mtime REAL NOT NULL, fail_count INTEGER NOT NULL)''')
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Neue DBs sofort, bestehende nach dem VACUUM der Migration
+            cursor.execute('''CREATE TABLE IF NOT EXISTS directories (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE)''')
+            cursor.execute(PROCESSED_FILES_DDL)
+            cursor.execute(FAILED_FILES_DDL)
+            # Migration älterer Datenbanken: Backoff-Spalten nachrüsten, dann volle Pfade auf Verzeichnis + Name umstellen
+            cursor.execute("PRAGMA table_info(failed_files)")
+            existing = {r[1] for r in cursor.fetchall()}
+            for column, ctype in (('last_failure', 'REAL'), ('error_class', 'TEXT'), ('next_eligible', 'REAL')):
+                if column not in existing: cursor.execute(f"ALTER TABLE failed_files ADD COLUMN {column} {ctype}")
+            migrated = migrate_path_tables(cursor)
             cursor.execute('''CREATE TABLE IF NOT EXISTS cumulative_stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)''')
             cursor.execute('''CREATE TABLE IF NOT EXISTS cumulative_lang_stats (lang TEXT PRIMARY KEY, count INTEGER NOT NULL)''')
-            keys = [('files_processed', 0), ('files_failed', 0), ('audio_tagged', 0), ('files_remuxed_ffmpeg', 0),
+            cursor.execute('''CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)''')
+            cursor.execute(RUNS_DDL)
+            cursor.execute(RUN_FILES_DDL)
+            keys = [('files_processed', 0), ('files_failed', 0), ('audio_tagged', 0), ('files_remuxed_ffmpeg', 0), ('files_remuxed_mkvmerge', 0),
                     ('files_edited_mkvprop', 0), ('files_converted_mp4', 0), ('audio_removed', 0),
                     ('subs_removed', 0), ('attachments_removed', 0), ('audio_renamed', 0),
                     ('default_audio_set', 0), ('default_sub_set', 0), ('bytes_saved', 0)]
             cursor.executemany("INSERT OR IGNORE INTO cumulative_stats (key, value) VALUES (?, ?)", keys)
+            conn.commit()
+            if migrated:
+                size_before = os.path.getsize(DB_PATH)
+                conn.execute("VACUUM")
+                logging.info(f"🗄️ Datenbank migriert: {format_bytes(size_before)} -> {format_bytes(os.path.getsize(DB_PATH))}.")
     except sqlite3.Error as e:
         logging.error(f"❌ DB Init Fehler: {e}")
         sys.exit(1)
+    DIR_IDS.clear()
+
+def migrate_path_tables(cursor):
+    """Überführt processed_files/failed_files mit vollem Pfad pro Zeile in das Verzeichnis-Schema. True, wenn migriert wurde."""
+    cursor.execute("PRAGMA table_info(processed_files)")
+    if 'filepath' not in {r[1] for r in cursor.fetchall()}: return False
+    logging.info("🗄️ Migriere Datenbank auf Verzeichnis-Schema...")
+    cursor.execute("ALTER TABLE processed_files RENAME TO processed_files_legacy")
+    cursor.execute("ALTER TABLE failed_files RENAME TO failed_files_legacy")
+    cursor.execute(PROCESSED_FILES_DDL)
+    cursor.execute(FAILED_FILES_DDL)
+    dir_ids = {}
+    def split(filepath):
+        directory, name = os.path.split(filepath)
+        if directory not in dir_ids:
+            cursor.execute("INSERT OR IGNORE INTO directories (path) VALUES (?)", (directory,))
+            cursor.execute("SELECT id FROM directories WHERE path = ?", (directory,)); dir_ids[directory] = cursor.fetchone()[0]
+        return dir_ids[directory], name
+    cursor.execute("SELECT filepath, mtime FROM processed_files_legacy")
+    processed = [(*split(path), mtime) for path, mtime in cursor.fetchall()]
+    cursor.executemany("INSERT OR REPLACE INTO processed_files (dir_id, name, mtime) VALUES (?, ?, ?)", processed)
+    cursor.execute("SELECT filepath, mtime, fail_count, last_failure, error_class, next_eligible FROM failed_files_legacy")
+    failed = [(*split(r[0]), *r[1:]) for r in cursor.fetchall()]
+    cursor.executemany('''INSERT OR REPLACE INTO failed_files (dir_id, name, mtime, fail_count, last_failure, error_class, next_eligible)
+                          VALUES (?, ?, ?, ?, ?, ?, ?)''', failed)
+    cursor.execute("DROP TABLE processed_files_legacy")
+    cursor.execute("DROP TABLE failed_files_legacy")
+    logging.info(f"   {len(processed)} verarbeitete und {len(failed)} fehlgeschlagene Einträge in {len(dir_ids)} Verzeichnissen übernommen.")
+    return True
+
+def directory_id(cursor, directory, create=False):
+    """id des Verzeichnisses in `directories` (gecacht); legt es mit create=True an, sonst None wenn unbekannt."""
+    dir_id = DIR_IDS.get(directory)
+    if dir_id is not None: return dir_id
+    if create: cursor.execute("INSERT OR IGNORE INTO directories (path) VALUES (?)", (directory,))
+    r = query_one(cursor, "SELECT id FROM directories WHERE path = ?", (directory,))
+    if r: DIR_IDS[directory] = r[0]
+    return r[0] if r else None
+
+def file_key(cursor, filepath, create=False):
+    """(dir_id, name) eines Pfads; dir_id ist None, wenn das Verzeichnis (noch) nicht in der DB steht."""
+    directory, name = os.path.split(filepath)
+    return directory_id(cursor, directory, create), name
 
 def should_skip_file(cursor, filepath, mtime):
     try:
-        cursor.execute("SELECT mtime FROM processed_files WHERE filepath = ?", (filepath,))
-        r = cursor.fetchone()
+        key = file_key(cursor, filepath)
+        if key[0] is None: return False, ""
+        r = query_one(cursor, "SELECT mtime FROM processed_files WHERE dir_id = ? AND name = ?", key)
         if r and r[0] == mtime: return True, "Erfolg"
-        cursor.execute("SELECT mtime, fail_count FROM failed_files WHERE filepath = ?", (filepath,))
-        r = cursor.fetchone()
-        if r and r[0] == mtime and r[1] >= MAX_FAILURES: return True, "Max. Fehler"
+        r = query_one(cursor, "SELECT mtime, fail_count, error_class, next_eligible FROM failed_files WHERE dir_id = ? AND name = ?", key)
+        if r and r[0] == mtime:
+            # Alte Einträge ohne Klasse verhalten sich wie bisher (dauerhaft, mit MAX_FAILURES-Grenze)
+            if r[1] >= max_failures(r[2] or 'permanent'): return True, "Max. Fehler"
+            if r[3] and r[3] > time.time(): return True, "Backoff"
     except sqlite3.Error as e:
         logging.warning(f"DB Fehler (Skip Check) {os.path.basename(filepath)}: {e}")
     return False, ""
 
 def mark_file_as_processed(cursor, filepath, mtime):
     try:
-        cursor.execute("REPLACE INTO processed_files (filepath, mtime) VALUES (?, ?)", (filepath, mtime))
+        cursor.execute("REPLACE INTO processed_files (dir_id, name, mtime) VALUES (?, ?, ?)", (*file_key(cursor, filepath, create=True), mtime))
     except sqlite3.Error as e:
         logging.warning(f"DB Fehler (Mark Processed) {os.path.basename(filepath)}: {e}")
 
-def increment_failure_count(cursor, filepath, mtime):
+TRANSIENT_ERRNOS = {errno.EIO, errno.EAGAIN, errno.EBUSY, errno.ENOSPC, errno.ESTALE, errno.ETIMEDOUT,
+                    errno.ECONNRESET, errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH, errno.ENOENT}
+TRANSIENT_ERROR_HINTS = ('input/output error', 'stale file handle', 'no space left', 'connection', 'timed out',
+                         'resource temporarily unavailable', 'device or resource busy', 'broken pipe')
+
+def classify_failure(exc=None, filepath=None):
+    """
+    Ordnet einen Fehler als 'transient' (NAS-Aussetzer, Timeouts, Netzwerk – Wiederholung lohnt sich)
+    oder 'permanent' (Datei/Tool lehnt ab, keine Leserechte – erneuter teurer Versuch vermutlich sinnlos) ein.
+    """
+    if filepath:
+        try:
+            with open(filepath, 'rb'): pass
+        except OSError as open_e:
+            return 'permanent' if open_e.errno in (errno.EACCES, errno.EPERM) else 'transient'
+    if isinstance(exc, (subprocess.TimeoutExpired, TimeoutError, ConnectionError)): return 'transient'
+    loaded_requests = sys.modules.get('requests')  # Nicht extra importieren, nur um einen Fehler einzuordnen
+    if loaded_requests and isinstance(exc, loaded_requests.RequestException): return 'transient'
+    if isinstance(exc, OSError) and exc.errno in TRANSIENT_ERRNOS: return 'transient'
+    if isinstance(exc, subprocess.CalledProcessError):
+        output = f"{exc.stderr or ''} {exc.stdout or ''}".lower()
+        if any(hint in output for hint in TRANSIENT_ERROR_HINTS): return 'transient'
+    return 'permanent'
+
+def max_failures(error_class):
+    """Fehlversuche bei unveränderter Datei, nach denen nicht mehr wiederholt wird (ein hängender Remux zählt auch)."""
+    return MAX_TRANSIENT_FAILURES if error_class == 'transient' else MAX_FAILURES
+
+def retry_backoff_seconds(fail_count, error_class):
+    """
+    Wartezeit bis zum nächsten Versuch: transient exponentiell ab RETRY_BACKOFF_BASE_SECONDS bis RETRY_BACKOFF_MAX_SECONDS.
+    Dauerhafte Fehler warten gleich RETRY_BACKOFF_MAX_SECONDS – bei unveränderter Datei hilft ein baldiger teurer Versuch kaum.
+    """
+    if error_class != 'transient': return RETRY_BACKOFF_MAX_SECONDS
+    return min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_BASE_SECONDS * 2 ** max(0, fail_count - 1))
+
+def increment_failure_count(cursor, filepath, mtime, error_class='permanent'):
     try:
         # Ensure mtime is valid before DB operation
         if not isinstance(mtime, (int, float)):
             logging.error(f"Ungültiger mtime '{mtime}' für increment_failure_count bei {filepath}")
             return # Avoid DB error
-        cursor.execute("SELECT mtime, fail_count FROM failed_files WHERE filepath = ?", (filepath,))
-        r = cursor.fetchone()
+        key = file_key(cursor, filepath, create=True)
+        r = query_one(cursor, "SELECT mtime, fail_count FROM failed_files WHERE dir_id = ? AND name = ?", key)
         n = 1
         # Only increment if the mtime matches the failed entry, otherwise reset to 1
         if r and r[0] == mtime:
             n = r[1] + 1
         elif r and r[0] != mtime:
             logging.debug(f"Mtime hat sich geändert für fehlgeschlagene Datei {os.path.basename(filepath)}, setze Fehlerzähler zurück.")
-        cursor.execute("REPLACE INTO failed_files (filepath, mtime, fail_count) VALUES (?, ?, ?)", (filepath, mtime, n))
-        logging.info(f"  -> Fehler gezählt ({n}/{MAX_FAILURES}) für {os.path.basename(filepath)}.")
+        now = time.time(); next_eligible = now + retry_backoff_seconds(n, error_class)
+        cursor.execute("REPLACE INTO failed_files (dir_id, name, mtime, fail_count, last_failure, error_class, next_eligible) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (*key, mtime, n, now, error_class, next_eligible))
+        retry_at = datetime.fromtimestamp(next_eligible).strftime('%Y-%m-%d %H:%M')
+        label = "Vorübergehender Fehler" if error_class == 'transient' else "Fehler"
+        if n >= max_failures(error_class):
+            logging.info(f"  -> {label} gezählt ({n}/{max_failures(error_class)}) für {os.path.basename(filepath)}, keine weiteren Versuche bis zur nächsten Dateiänderung.")
+        else:
+            logging.info(f"  -> {label} gezählt ({n}/{max_failures(error_class)}) für {os.path.basename(filepath)}, nächster Versuch ab {retry_at}.")
     except sqlite3.Error as e:
         logging.warning(f"DB Fehler (Inc Failure) {os.path.basename(filepath)}: {e}")
 
@@ -343,16 +1272,71 @@ def increment_failure_count(cursor, filepath, mtime):
 def clear_failure_entry(cursor, filepath):
     try:
         logging.debug(f"Lösche Fehlereintrag (falls vorhanden) für {os.path.basename(filepath)}")
-        cursor.execute("DELETE FROM failed_files WHERE filepath = ?", (filepath,))
+        key = file_key(cursor, filepath)
+        if key[0] is not None: cursor.execute("DELETE FROM failed_files WHERE dir_id = ? AND name = ?", key)
     except sqlite3.Error as e:
         logging.warning(f"DB Fehler (Clear Failure) {os.path.basename(filepath)}: {e}")
 
+def forget_files(cursor, filepaths):
+    """Entfernt Erfolgs- und Fehlereinträge der angegebenen Dateien (process --force)."""
+    keys = [k for k in (file_key(cursor, p) for p in filepaths) if k[0] is not None]
+    for table in ('processed_files', 'failed_files'):
+        cursor.executemany(f"DELETE FROM {table} WHERE dir_id = ? AND name = ?", keys)
+
+def prune_stale_entries(cursor, walk, stats):
+    """
+    Gleicht die DB mit dem ab, was der Walk dieses Laufs gesehen hat: Einträge in vollständig gelesenen Ordnern, deren Datei
+    nicht mehr auftauchte, und Ordner, die es nicht mehr gibt, werden gesammelt gelöscht – ohne stat() pro Datei.
+    Alles außerhalb vollständig gelesener Teilbäume (Lesefehler, abgebrochener Walk) bleibt unangetastet.
+    """
+    try:
+        # In Ordnern, die dieser Lauf selbst verändert hat (z.B. MP4 -> MKV), stehen Dateien, die der Walk nie gesehen hat
+        modified = MODIFIED_SONARR_PATHS | MODIFIED_RADARR_PATHS
+        cursor.execute("SELECT id, path FROM directories")
+        gone, present = set(), {}
+        for dir_id, path in cursor.fetchall():
+            if not walk.covers(path) or path in modified: continue
+            if path in walk.seen: present[dir_id] = walk.seen[path]
+            else: gone.add(dir_id)
+        for table in ('processed_files', 'failed_files'):
+            cursor.execute(f"SELECT dir_id, name FROM {table}")
+            stale = [(d, n) for d, n in cursor.fetchall() if d in gone or (d in present and n not in present[d])]
+            stats.db_rows_pruned += len(stale)
+            if stale and not DRY_RUN: cursor.executemany(f"DELETE FROM {table} WHERE dir_id = ? AND name = ?", stale)
+        if DRY_RUN:
+            if stats.db_rows_pruned: logging.info(f"🧹 {stats.db_rows_pruned} veraltete DB-Einträge gefunden (Trockenlauf, nicht gelöscht).")
+            return
+        cursor.execute('''DELETE FROM directories WHERE id NOT IN (SELECT dir_id FROM processed_files)
+                          AND id NOT IN (SELECT dir_id FROM failed_files) AND id NOT IN (SELECT dir_id FROM run_files)''')
+        stats.db_dirs_pruned += max(0, cursor.rowcount)
+        if stats.db_rows_pruned or stats.db_dirs_pruned:
+            DIR_IDS.clear()
+            cursor.execute("PRAGMA incremental_vacuum").fetchall()  # Freie Seiten an das Dateisystem zurückgeben
+            logging.info(f"🧹 {stats.db_rows_pruned} veraltete DB-Einträge und {stats.db_dirs_pruned} Verzeichnisse entfernt.")
+    except sqlite3.Error as e:
+        logging.warning(f"DB Fehler (Bereinigung): {e}")
+
+# Sync-State: High-Water-Marks der Arr-History und Zeitpunkt des letzten vollständigen Scans
+def get_sync_state(cursor, key):
+    try:
+        r = query_one(cursor, "SELECT value FROM sync_state WHERE key = ?", (key,))
+        return r[0] if r else None
+    except sqlite3.Error as e:
+        logging.warning(f"DB Fehler (Sync State lesen) {key}: {e}")
+        return None
+
+def set_sync_state(cursor, key, value):
+    try:
+        cursor.execute("REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value)))
+    except sqlite3.Error as e:
+        logging.warning(f"DB Fehler (Sync State schreiben) {key}: {e}")
+
 def update_cumulative_stats(stats):
     try:
         with sqlite3.connect(DB_PATH) as conn:
             cursor = conn.cursor()
             upd = [(stats.files_processed, 'files_processed'), (stats.files_failed, 'files_failed'),
-                (stats.audio_tagged, 'audio_tagged'), (stats.files_remuxed_ffmpeg, 'files_remuxed_ffmpeg'),
+                (stats.audio_tagged, 'audio_tagged'), (stats.files_remuxed_ffmpeg, 'files_remuxed_ffmpeg'), (stats.files_remuxed_mkvmerge, 'files_remuxed_mkvmerge'),
                 (stats.files_edited_mkvprop, 'files_edited_mkvprop'), (stats.files_converted_mp4, 'files_converted_mp4'),
                 (stats.audio_removed, 'audio_removed'), (stats.subs_removed, 'subs_removed'),
                 (stats.attachments_removed, 'attachments_removed'), (stats.audio_renamed, 'audio_renamed'),
@@ -365,6 +1349,125 @@ def update_cumulative_stats(stats):
     except sqlite3.Error as e:
         logging.warning(f"DB Update Stats Fehler: {e}")
 
+# --- Lauf-Historie ---
+def config_fingerprint():
+    """Für Verhalten und Durchsatz relevante Einstellungen (ohne URLs/API-Keys, ohne DRY_RUN/Version) und ihr Kurz-Hash."""
+    rules_digest = None
+    if RULES_FILE and os.path.isfile(RULES_FILE):
+        try:
+            with open(RULES_FILE, 'rb') as f: rules_digest = hashlib.sha1(f.read()).hexdigest()[:12]
+        except OSError: pass
+    settings = {
+        'rules': {'keep_audio': sorted(KEEP_AUDIO_LANGS), 'keep_subtitles': sorted(KEEP_SUBTITLE_LANGS),
+                  'default_audio': DEFAULT_AUDIO_LANG, 'default_subtitle': DEFAULT_SUBTITLE_LANG,
+                  'remove': [REMOVE_AUDIO, REMOVE_SUBTITLES, REMOVE_ATTACHMENTS, REMOVE_FONTS],
+                  'keep_commentary': KEEP_COMMENTARY, 'rename_audio': RENAME_AUDIO_TRACKS, 'rules_file': rules_digest},
+        'scan': {'cleanup': RUN_CLEANUP, 'mode': SCAN_MODE, 'order': SCAN_ORDER, 'arr_prefilter': ARR_PREFILTER, 'mp4_inplace': MP4_INPLACE_EDIT,
+                 'batch_commit_size': BATCH_COMMIT_SIZE},
+        'concurrency': {'files': MAX_PARALLEL_FILES, 'probe': PROBE_CONCURRENCY, 'detect': DETECT_CONCURRENCY,
+                        'remux': REMUX_CONCURRENCY, 'edit': EDIT_CONCURRENCY},
+        'remux': {'engine': REMUX_ENGINE, 'mkvmerge_min_mb': REMUX_MKVMERGE_MIN_MB, 'max_mbps': REMUX_MAX_MBPS,
+                  'ionice': REMUX_IONICE, 'scratch': bool(REMUX_SCRATCH_DIR)},
+        'detector': {'backend': DETECTOR_BACKEND, 'local': [LOCAL_WHISPER_MODEL, LOCAL_WHISPER_COMPUTE_TYPE, LOCAL_WHISPER_WORKERS,
+                                                            LOCAL_WHISPER_THREADS] if DETECTOR_BACKEND == 'local' else None},
+    }
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return digest, settings
+
+def cache_counters():
+    """(Treffer, Fehlschläge) des Sprachcode-Caches seit Prozessstart; record_run() bildet die Differenz pro Lauf."""
+    info = normalize_lang_code.cache_info()
+    return info.hits, info.misses
+
+def _ratio(part, total):
+    return round(part / total, 4) if total > 0 else None
+
+def record_run(cursor, stats, kind, mode, caches_before, interrupted=False):
+    """
+    Schreibt den Lauf (Zeiten, Stufen-Dauern, Zähler, Bytes, Trefferquoten, Konfigurations-Hash) in `runs` und die
+    bearbeiteten Dateien in `run_files`; Datei-Zeilen älter als RUN_HISTORY_DAYS werden dabei entfernt.
+    """
+    ended = datetime.now()
+    duration = max(0.001, (ended - stats.start_time).total_seconds())
+    config_hash, settings = config_fingerprint()
+    lang_hits, lang_misses = (now - before for now, before in zip(cache_counters(), caches_before))
+    details = {
+        'stage_seconds': {k: round(v, 3) for k, v in stats.stage_seconds.items()},
+        'stage_wait_seconds': {k: round(v, 3) for k, v in stats.stage_wait_seconds.items()},
+        'hit_rates': {'db_skip': _ratio(stats.files_skipped_db, stats.files_checked),
+                      'arr_prefilter': _ratio(stats.files_prefiltered, stats.files_checked - stats.files_skipped_db),
+                      'lang_codes': _ratio(lang_hits, lang_hits + lang_misses)},
+        'counters': {k: v for k, v in vars(stats).items() if isinstance(v, (int, float)) and not isinstance(v, bool)},
+        'lang_counts': dict(stats.lang_counts), 'interrupted': interrupted,
+    }
+    iso = lambda dt: dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    try:
+        cursor.execute('''INSERT INTO runs (started_at, ended_at, duration_s, kind, mode, dry_run, version, config_hash,
+                          files_checked, files_skipped_db, files_processed, files_failed, files_remuxed, files_edited,
+                          files_deferred, bytes_read, bytes_written, bytes_saved, remux_seconds, details, config)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                       (iso(stats.start_time), iso(ended), round(duration, 3), kind, mode, int(DRY_RUN), __version__, config_hash,
+                        stats.files_checked, stats.files_skipped_db, stats.files_processed, stats.files_failed,
+                        stats.files_remuxed_ffmpeg + stats.files_remuxed_mkvmerge,  # MP4-Konvertierungen sind darin enthalten
+                        stats.files_edited_mkvprop + stats.files_edited_mp4, stats.files_deferred_space + stats.files_deferred_budget,
+                        stats.remux_bytes_read, stats.remux_bytes_written, int(stats.bytes_saved), round(stats.remux_seconds, 3),
+                        json.dumps(details, sort_keys=True), json.dumps(settings, sort_keys=True)))
+        run_id = cursor.lastrowid
+        rows = [(run_id, *file_key(cursor, path, create=True), action, duration_ms, read, written)
+                for path, action, duration_ms, read, written in stats.file_results]
+        cursor.executemany('''INSERT OR REPLACE INTO run_files (run_id, dir_id, name, action, duration_ms, bytes_read, bytes_written)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
+        if RUN_HISTORY_DAYS > 0:
+            cutoff = iso(ended - timedelta(days=RUN_HISTORY_DAYS))
+            cursor.execute("DELETE FROM run_files WHERE run_id IN (SELECT id FROM runs WHERE started_at < ?)", (cutoff,))
+        # Vergleich mit dem letzten gleichartigen Lauf, damit Einbrüche nach Updates direkt im Log auffallen
+        cursor.execute('''SELECT files_checked, duration_s, bytes_written, remux_seconds, version FROM runs
+                          WHERE kind = ? AND mode IS ? AND dry_run = ? AND id < ? ORDER BY id DESC LIMIT 1''',
+                       (kind, mode, int(DRY_RUN), run_id))
+        previous = cursor.fetchone()
+    except sqlite3.Error as e:
+        logging.warning(f"DB Fehler (Lauf-Historie): {e}"); return None
+    def rates(checked, seconds, written, remux_s):
+        mbps = f", Remux {written / (1024 * 1024) / remux_s:.1f} MB/s" if remux_s and written else ''
+        return f"{checked / seconds:.1f} Dateien/s{mbps}"
+    line = f"🗂️ Lauf #{run_id} gespeichert ({config_hash}): {rates(stats.files_checked, duration, stats.remux_bytes_written, stats.remux_seconds)}"
+    if previous: line += f" – vorheriger Lauf (v{previous[4]}): {rates(*previous[:4])}"
+    logging.info(line)
+    return run_id
+
+RUN_EXPORT_FIELDS = ('id', 'started_at', 'ended_at', 'duration_s', 'kind', 'mode', 'dry_run', 'version', 'config_hash',
+                     'files_checked', 'files_skipped_db', 'files_processed', 'files_failed', 'files_remuxed', 'files_edited',
+                     'files_deferred', 'bytes_read', 'bytes_written', 'bytes_saved', 'remux_seconds')
+FILE_EXPORT_FIELDS = ('run_id', 'started_at', 'path', 'action', 'duration_ms', 'bytes_read', 'bytes_written')
+PIPELINE_STAGES = ('probe', 'detect', 'remux', 'edit')
+
+def load_run_history(cursor, since=None):
+    """Läufe als flache Dicts (Spalten, Durchsatz, Stufen-Zeiten, Trefferquoten) für den Export, älteste zuerst."""
+    cursor.execute(f"SELECT {', '.join(RUN_EXPORT_FIELDS)}, details, config FROM runs WHERE started_at >= ? ORDER BY id",
+                   (since or '',))
+    runs = []
+    for row in cursor.fetchall():
+        run = dict(zip(RUN_EXPORT_FIELDS, row))
+        details = json.loads(row[-2] or '{}')
+        run['files_per_s'] = round(run['files_checked'] / run['duration_s'], 3) if run['duration_s'] else None
+        run['remux_mb_per_s'] = (round(run['bytes_written'] / (1024 * 1024) / run['remux_seconds'], 2)
+                                 if run['remux_seconds'] and run['bytes_written'] else None)
+        for stage in PIPELINE_STAGES:
+            run[f'{stage}_s'] = details.get('stage_seconds', {}).get(stage, 0.0)
+            run[f'{stage}_wait_s'] = details.get('stage_wait_seconds', {}).get(stage, 0.0)
+        for name, rate in details.get('hit_rates', {}).items(): run[f'{name}_hit_rate'] = rate
+        run['interrupted'] = details.get('interrupted', False)
+        run['details'] = details; run['config'] = json.loads(row[-1] or '{}')
+        runs.append(run)
+    return runs
+
+def load_file_history(cursor, since=None):
+    cursor.execute('''SELECT f.run_id, r.started_at, d.path, f.name, f.action, f.duration_ms, f.bytes_read, f.bytes_written
+                      FROM run_files f JOIN runs r ON r.id = f.run_id JOIN directories d ON d.id = f.dir_id
+                      WHERE r.started_at >= ? ORDER BY f.run_id, d.path, f.name''', (since or '',))
+    return [dict(zip(FILE_EXPORT_FIELDS, (run_id, started, os.path.join(directory, name), *rest)))
+            for run_id, started, directory, name, *rest in cursor.fetchall()]
+
 # --- VERSION CHECK ---
 def check_for_updates():
     """Prüft GitHub API auf neue Versionen."""
@@ -395,12 +1498,25 @@ def check_for_updates():
         logging.debug(f"Unerwarteter Version Check Fehler: {e}")
         return None
 
+def start_update_check():
+    """Führt den Update-Check je nach UPDATE_CHECK im Hintergrund, synchron oder gar nicht aus."""
+    if UPDATE_CHECK == 'off':
+        logging.debug("Update-Check deaktiviert (UPDATE_CHECK=off).")
+        return
+    def run():
+        newer_version = check_for_updates()
+        if newer_version:
+            logging.info(f"🔔 UPDATE VERFÜGBAR: v{newer_version} → Nutze 'docker compose pull && docker compose up -d' für Update")
+    if UPDATE_CHECK == 'sync': run()
+    else: threading.Thread(target=run, name="update-check", daemon=True).start()
+
 # --- (3) MEDIA-ANALYSE & HELPER ---
 def get_media_info(file_path):
     try:
         cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', file_path]
         logging.debug(f"Running ffprobe: {' '.join(cmd)}")
-        r = subprocess.run(cmd, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
+        with pipeline_stage('probe'):
+            r = subprocess.run(cmd, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
         return json.loads(r.stdout)
     except subprocess.CalledProcessError as e:
         stderr = e.stderr.strip() if e.stderr else "N/A"
@@ -420,7 +1536,8 @@ def detect_language_with_whisper(audio_sample_path):
             files = {'audio_file': (os.path.basename(audio_sample_path), f)}
             params = {'encode': 'true', 'task': 'transcribe', 'output': 'json'}
             logging.debug(f"Calling Whisper API: {WHISPER_API_URL} for {os.path.basename(audio_sample_path)}")
-            r = requests.post(WHISPER_API_URL, files=files, params=params, timeout=WHISPER_TIMEOUT)
+            with pipeline_stage('detect'):
+                r = requests.post(WHISPER_API_URL, files=files, params=params, timeout=WHISPER_TIMEOUT)
             r.raise_for_status()
             response_json = r.json()
             lang = response_json.get('language')
@@ -437,12 +1554,203 @@ def detect_language_with_whisper(audio_sample_path):
         logging.warning(f"  -> Unerwarteter Fehler bei Whisper Call: {e}")
     return None
 
-def is_commentary(stream):
-    if not KEEP_COMMENTARY: return False
-    title = stream.get('tags', {}).get('title', '').lower()
+# --- Spracherkennungs-Backends ---
+# detect_tracks() bekommt alle 'und'-Audiospuren einer Datei und die Probe-Startzeiten auf einmal und liefert pro Spur
+# und Probe den erkannten Code, '' wenn nichts erkannt wurde, oder None wenn die Probe nicht extrahiert werden konnte
+# (zählt nicht mit). Die Proben aller Spuren schneidet ein einziger ffmpeg-Lauf aus: Jedes Fenster ist ein eigener
+# Input mit -ss/-t, es werden also nur die Fenster gelesen – einmal für alle Spuren statt einmal pro Spur.
+SAMPLE_SECONDS = 30
+
+def sample_inputs(file_path, starts, windows):
+    args = []
+    for w in windows: args += ['-ss', str(starts[w]), '-t', str(SAMPLE_SECONDS), '-i', file_path]
+    return args
+
+def run_sample_extraction(cmd, windows, total, tracks, capture=False):
+    """Führt ffmpeg für die Proben der Fenster `windows` aus; liefert stdout (capture) bzw. True, None bei Fehlern (bereits geloggt)."""
+    label = f"Probe {windows[0] + 1}/{total}" if len(windows) == 1 else f"Proben 1-{total}"
+    if tracks > 1: label += f" ({tracks} Spuren)"
+    logging.debug(f"Running ffmpeg for language samples ({label}): {' '.join(cmd)}")
+    try:
+        with pipeline_stage('probe'):
+            r = subprocess.run(cmd, check=True, stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, timeout=FFMPEG_SAMPLE_TIMEOUT * len(windows))
+        return r.stdout if capture else True
+    except subprocess.TimeoutExpired:
+        logging.warning(f"  \t {label}: Timeout bei ffmpeg Extraktion.")
+    except subprocess.CalledProcessError as sub_e:
+        stderr_output = sub_e.stderr.decode('utf-8', errors='ignore').strip() if sub_e.stderr else "N/A"
+        logging.warning(f"  \t {label}: Fehler bei ffmpeg Extraktion. STDERR: {stderr_output}")
+    except Exception as e:
+        logging.warning(f"  \t {label}: Unerwarteter Fehler. {e}")
+    return None
+
+def extract_sample_windows(starts, extract):
+    """
+    Ruft `extract(fenster)` einmal für alle Fenster auf; scheitert der gemeinsame Lauf, wird pro Fenster wiederholt,
+    damit eine defekte Stelle nicht alle Proben kostet. Liefert [(fenster, ergebnis oder None)].
+    """
+    windows = list(range(len(starts)))
+    result = extract(windows)
+    if result is not None or len(windows) == 1: return [(windows, result)]
+    logging.debug("  \t Gemeinsame Extraktion fehlgeschlagen – wiederhole pro Probe.")
+    return [([w], extract([w])) for w in windows]
+
+class LanguageDetector:
+    name = None
+    def detect_tracks(self, file_path, stream_indices, starts):
+        raise NotImplementedError
+    def warm(self):
+        """Optional: Backend vorab starten, damit die erste 'und'-Spur nicht auf das Laden wartet."""
+
+class WhisperApiDetector(LanguageDetector):
+    """Whisper-Webservice: ffmpeg kodiert alle Proben in einem Lauf als MP3, jede geht einzeln an WHISPER_API_URL."""
+    name = 'api'
+    def detect_tracks(self, file_path, stream_indices, starts):
+        results = {idx: [None] * len(starts) for idx in stream_indices}
+        with tempfile.TemporaryDirectory(prefix='language-fixer-') as tmp_dir:
+            def sample_path(idx, w): return os.path.join(tmp_dir, f"{idx}_{w}.mp3")
+            def extract(windows):
+                cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error'] + sample_inputs(file_path, starts, windows)
+                for n, w in enumerate(windows):
+                    for idx in stream_indices:
+                        cmd += ['-map', f'{n}:{idx}', '-vn', '-c:a', 'libmp3lame', '-q:a', '5', sample_path(idx, w)]
+                return run_sample_extraction(cmd, windows, len(starts), len(stream_indices))
+            for windows, ok in extract_sample_windows(starts, extract):
+                if not ok: continue
+                for w in windows:
+                    for idx in stream_indices:
+                        tmp_p = sample_path(idx, w)
+                        if os.path.exists(tmp_p) and os.path.getsize(tmp_p) > 0:
+                            results[idx][w] = detect_language_with_whisper(tmp_p) or ''
+        return results
+
+# Worker-Seite des lokalen Backends (läuft in eigenen Prozessen; das Modell wird einmal pro Prozess geladen)
+_LOCAL_WHISPER_MODEL = None
+
+def _init_local_whisper(model, compute_type, threads, model_dir):
+    global _LOCAL_WHISPER_MODEL
+    from faster_whisper import WhisperModel
+    _LOCAL_WHISPER_MODEL = WhisperModel(model, device='cpu', compute_type=compute_type, cpu_threads=max(0, threads),
+                                        download_root=model_dir or None)
+
+def _local_whisper_ready():
+    return _LOCAL_WHISPER_MODEL is not None
+
+def _local_whisper_detect(pcm_samples):
+    """Erkennt die Sprache roher PCM-Proben (s16le, 16 kHz, mono); liefert [(code, wahrscheinlichkeit), ...]."""
+    import numpy as np
+    results = []
+    for pcm in pcm_samples:
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        _, info = _LOCAL_WHISPER_MODEL.transcribe(audio, beam_size=1, without_timestamps=True)  # Segmente werden nie abgerufen
+        results.append((info.language, info.language_probability))
+    return results
+
+class LocalWhisperDetector(LanguageDetector):
+    """
+    faster-whisper auf der CPU in einem dauerhaften Prozess-Pool: Jeder Worker hält das (quantisierte) Modell geladen,
+    die Proben aller 'und'-Spuren einer Datei gehen als rohes PCM direkt aus ffmpeg gesammelt in einem Aufruf
+    hinüber – ohne MP3, Temp-Dateien oder Netzwerk.
+    """
+    name = 'local'
+    def __init__(self):
+        self.settings = (LOCAL_WHISPER_MODEL, LOCAL_WHISPER_COMPUTE_TYPE, LOCAL_WHISPER_THREADS, LOCAL_WHISPER_MODEL_DIR)
+        self.workers = max(1, LOCAL_WHISPER_WORKERS)
+        self.broken = False
+        self._pool = None; self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.settings[3]: os.makedirs(self.settings[3], exist_ok=True)
+                # spawn statt fork: Der Hauptprozess hat Threads (Pipeline, Log-Listener)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_local_whisper, initargs=self.settings)
+                logging.info(f"🧠 Starte lokale Spracherkennung: {self.workers} Prozess(e), Modell {self.settings[0]} ({self.settings[1]}).")
+            return self._pool
+
+    def warm(self):
+        if self.broken: return
+        try:
+            for _ in range(self.workers): self.pool().submit(_local_whisper_ready)
+        except Exception as e: logging.warning(f"⚠️ Lokale Spracherkennung konnte nicht gestartet werden: {e}")
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool: self._pool.shutdown(wait=False, cancel_futures=True); self._pool = None
+
+    def detect_tracks(self, file_path, stream_indices, starts):
+        """
+        Ein ffmpeg-Lauf schreibt alle Proben (Fenster × Spur) hintereinander als PCM auf stdout: Jede Probe wird auf
+        genau SAMPLE_SECONDS aufgefüllt/gekürzt, damit sie sich am Byte-Offset wieder trennen lassen.
+        """
+        results = {idx: [None] * len(starts) for idx in stream_indices}
+        if self.broken: return results  # Modell nicht ladbar: Proben gar nicht erst dekodieren
+        sample_bytes = SAMPLE_SECONDS * 16000 * 2
+        pcm = {}  # (Spur, Fenster) -> PCM
+        def extract(windows):
+            chains = []
+            for n, _ in enumerate(windows):
+                for idx in stream_indices:
+                    chains.append(f"[{n}:{idx}]aformat=sample_fmts=s16:sample_rates=16000:channel_layouts=mono,"
+                                  f"apad=whole_dur={SAMPLE_SECONDS},atrim=duration={SAMPLE_SECONDS}[s{len(chains)}]")
+            graph = ';'.join(chains) + ';' + ''.join(f"[s{i}]" for i in range(len(chains))) + f"concat=n={len(chains)}:v=0:a=1[out]"
+            cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error'] + sample_inputs(file_path, starts, windows) + \
+                  ['-filter_complex', graph, '-map', '[out]', '-f', 's16le', '-']
+            return run_sample_extraction(cmd, windows, len(starts), len(stream_indices), capture=True)
+        for windows, out in extract_sample_windows(starts, extract):
+            if not out: continue
+            for n, key in enumerate((idx, w) for w in windows for idx in stream_indices):
+                chunk = out[n * sample_bytes:(n + 1) * sample_bytes]
+                if chunk.strip(b'\0'): pcm[key] = chunk  # Nur Stille: Spur hat in diesem Fenster keinen Ton
+        if not pcm: return results
+        keys = list(pcm)
+        try:
+            with pipeline_stage('detect'):
+                detected = self.pool().submit(_local_whisper_detect, [pcm[k] for k in keys]).result(timeout=WHISPER_TIMEOUT)
+        except BrokenProcessPool:
+            # Meist lässt sich das Modell nicht laden (offline ohne Cache, falscher Name) – nicht für jede Datei neu versuchen
+            logging.error("❌ Lokale Spracherkennung ausgefallen (Modell nicht ladbar?) – deaktiviert bis zum Neustart/SIGHUP.")
+            self.broken = True; self.shutdown()
+            return results
+        except Exception as e:
+            logging.warning(f"  -> Lokale Spracherkennung fehlgeschlagen: {e}")
+            return results
+        for (idx, w), (lang, prob) in zip(keys, detected):
+            logging.debug(f"  \t Lokal erkannt (Spur {idx}, Probe {w + 1}): '{lang}' (p={prob:.2f})")
+            results[idx][w] = lang or ''
+        return results
+
+WHISPER_API_DETECTOR = WhisperApiDetector()
+LOCAL_DETECTOR = None
+_DETECTOR_LOCK = threading.Lock()
+
+def language_detector():
+    """Aktives Backend laut LANGUAGE_DETECTOR/DETECTOR_BACKEND oder None (keine Erkennung)."""
+    global LOCAL_DETECTOR
+    if DETECTOR_BACKEND == 'api': return WHISPER_API_DETECTOR
+    if DETECTOR_BACKEND != 'local': return None
+    with _DETECTOR_LOCK:
+        if LOCAL_DETECTOR is None: LOCAL_DETECTOR = LocalWhisperDetector()
+        return LOCAL_DETECTOR
+
+def reset_language_detector():
+    """Beendet den lokalen Prozess-Pool (Programmende, SIGHUP); der nächste Aufruf startet ihn mit der aktuellen Konfiguration."""
+    global LOCAL_DETECTOR
+    with _DETECTOR_LOCK:
+        if LOCAL_DETECTOR: LOCAL_DETECTOR.shutdown(); LOCAL_DETECTOR = None
+
+atexit.register(reset_language_detector)
+
+def is_commentary(stream, rules=None):
+    rules = rules or TRACK_RULES
+    if not rules.keep_commentary: return False
+    tags = stream.get('tags', {})
+    title = tags.get('title', '')
     disposition = stream.get('disposition', {})
-    # Check title keywords
-    if title and any(k in title for k in COMMENTARY_KEYWORDS):
+    # Check title keywords (ein kombinierter Regex statt einer Schleife über COMMENTARY_KEYWORDS)
+    if title and rules.commentary_search and rules.commentary_search(title):
         return True
     # Check disposition flags
     if disposition.get('comment', 0) == 1 or disposition.get('hearing_impaired', 0) == 1 or disposition.get('visual_impaired', 0) == 1:
@@ -450,47 +1758,24 @@ def is_commentary(stream):
         return True
     return False
 
-def format_audio_title(stream, final_lang_tag):
+def format_audio_title(stream, final_lang_tag, rules=None, is_comm=None):
+    rules = rules or TRACK_RULES
     parts=[]
     orig_t=stream.get('tags',{}).get('title')
-    is_comm = is_commentary(stream)
+    if is_comm is None: is_comm = is_commentary(stream, rules)
 
     if is_comm and orig_t:
         parts.append(orig_t)
-    elif RENAME_AUDIO_TRACKS:
+    elif rules.rename_audio:
         try:
-            c = stream.get('codec_name', '').upper()
-            p = stream.get('profile', '')
-            ch = stream.get('channels', 0)
-
-            if c == 'TRUEHD':
-                c = 'Dolby Atmos' if p and 'atmos' in p.lower() else 'Dolby TrueHD'
-            elif c == 'DTS' and p == 'MA':
-                c = 'DTS-HD MA'
-            elif c == 'EAC3':
-                c = 'Dolby Digital+'
-            elif c == 'AC3':
-                c = 'Dolby Digital'
-            # Add more simplifications (AAC, OPUS, FLAC etc. if desired)
-
-            ls = 'Unknown'
-            if ch >= 8: ls = '7.1'
-            elif ch >= 6: ls = '5.1'
-            elif ch == 2: ls = '2.0'
-            elif ch == 1: ls = '1.0'
-            # Consider adding more specific layouts if channel_layout is reliable
-            elif ch > 0: ls = f"{ch}.0" # Fallback
-
-            if c and ls != 'Unknown': parts.append(f"{c} {ls}")
-            elif c: parts.append(c)
-
+            label = rules.codec_label(stream.get('codec_name', ''), stream.get('profile', ''), stream.get('channels', 0))
+            if label: parts.append(label)
         except Exception as e:
             logging.debug(f"  -> Fehler beim Formatieren des Audio-Titels: {e}")
             if orig_t: parts.append(orig_t) # Fallback
 
-    if RENAME_AUDIO_TRACKS and not is_comm and final_lang_tag != 'und':
-        ln_map = {'eng': 'English', 'deu': 'German', 'jpn': 'Japanese'} # Add more
-        ln = ln_map.get(final_lang_tag, final_lang_tag.upper())
+    if rules.rename_audio and not is_comm and final_lang_tag != 'und':
+        ln = rules.language_name(final_lang_tag)
 
         if parts:
             parts[-1] = f"{parts[-1]} ({ln})"
@@ -498,33 +1783,332 @@ def format_audio_title(stream, final_lang_tag):
             parts.append(ln)
 
     final_title = " ".join(parts).strip()
-    return final_title if final_title else (orig_t if not RENAME_AUDIO_TRACKS and orig_t else None)
-
-
-# --- (4) HAUPTVERARBEITUNG ---
-def process_file(cursor, file_path, file_type, stats):
+    return final_title if final_title else (orig_t if not rules.rename_audio and orig_t else None)
+
+
+# --- Remux-Engines ---
+# Beide Engines setzen denselben Plan um: plan['tracks'] (behaltene Audio-/Untertitelspuren mit
+# Sprache, Titel und Default-Flag), plan['attachments'] (behaltene Anhänge), plan['stream_types'] und
+# plan['attached_pics'] (Cover-Bilder, die ffprobe als Video-Stream meldet).
+class RemuxEngine:
+    name = None
+    binary = None
+    ok_returncodes = (0,)
+
+    def is_available(self):
+        return shutil.which(self.binary) is not None
+
+    def build_command(self, src, dst, plan, input_args=(), progress=False):
+        """Baut den Remux-Befehl; mit `progress` schreibt die Engine einen maschinenlesbaren Fortschritt auf stdout."""
+        raise NotImplementedError
+
+class FFmpegRemuxEngine(RemuxEngine):
+    name = 'ffmpeg'
+    binary = 'ffmpeg'
+
+    def build_command(self, src, dst, plan, input_args=(), progress=False):
+        maps = ['-map', '0:v?']; metadata = []
+        type_counters = {'audio': 0, 'subtitle': 0}
+        for track in plan['tracks']:
+            maps.extend(['-map', f"0:{track['index']}"])
+            prefix = f"s:{'a' if track['type'] == 'audio' else 's'}:{type_counters[track['type']]}"
+            type_counters[track['type']] += 1
+            metadata.extend([f'-metadata:{prefix}', f"language={track['lang']}"])
+            metadata.extend([f'-disposition:{prefix}', '+default' if track['default'] else '-default'])
+            if track['title']: metadata.extend([f'-metadata:{prefix}', f"title={track['title']}"])
+        for idx in plan['attachments']: maps.extend(['-map', f'0:{idx}'])
+        progress_args = ['-progress', 'pipe:1', '-nostats'] if progress else []
+        return ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error'] + progress_args + list(input_args) + ['-i', src] + \
+            maps + ['-c', 'copy'] + metadata + ['-f', 'matroska', dst]
+
+class MkvmergeRemuxEngine(RemuxEngine):
+    """
+    mkvmerge erhält Matroska-Features (Kapitel, Tags, Anhänge) vollständig und ist beim reinen Entfernen
+    von Spuren großer MKVs meist schneller als ffmpeg. Track-IDs sind die Position unter den Nicht-Anhang-Streams,
+    Anhang-IDs zählen separat ab 1 (Cover-Bilder sind für mkvmerge Anhänge, für ffprobe Video mit attached_pic) –
+    daher nur für MKV-Quellen verwendet.
+    """
+    name = 'mkvmerge'
+    binary = 'mkvmerge'
+    ok_returncodes = (0, 1)  # 1 = nur Warnungen, Ausgabe ist gültig
+
+    def build_command(self, src, dst, plan, input_args=(), progress=False):
+        track_ids = {}; attachment_ids = {}
+        covers = plan.get('attached_pics', ())
+        for idx, ct in sorted(plan['stream_types'].items()):
+            if ct == 'attachment' or idx in covers: attachment_ids[idx] = len(attachment_ids) + 1
+            else: track_ids[idx] = len(track_ids)
+        audio = [str(track_ids[t['index']]) for t in plan['tracks'] if t['type'] == 'audio']
+        subs = [str(track_ids[t['index']]) for t in plan['tracks'] if t['type'] == 'subtitle']
+        options = ['--audio-tracks', ','.join(audio)] if audio else ['--no-audio']
+        options += ['--subtitle-tracks', ','.join(subs)] if subs else ['--no-subtitles']
+        kept = sorted(set(plan['attachments']) | set(covers))  # Cover bleiben wie bei ffmpeg (-map 0:v?) immer erhalten
+        if kept: options += ['--attachments', ','.join(str(attachment_ids[i]) for i in kept)]
+        elif attachment_ids: options += ['--no-attachments']
+        for track in plan['tracks']:
+            tid = track_ids[track['index']]
+            options += ['--language', f"{tid}:{track['lang']}", '--default-track-flag', f"{tid}:{1 if track['default'] else 0}"]
+            if track['title']: options += ['--track-name', f"{tid}:{track['title']}"]
+        return ['mkvmerge', '--gui-mode' if progress else '--quiet', '-o', dst] + options + [src]
+
+REMUX_ENGINES = {'ffmpeg': FFmpegRemuxEngine(), 'mkvmerge': MkvmergeRemuxEngine()}
+
+def select_remux_engine(file_path, size_bytes):
+    """Wählt die Remux-Engine für eine Datei anhand von REMUX_ENGINE, Dateityp und Größe."""
+    mkvmerge = REMUX_ENGINES['mkvmerge']
+    is_mkv = file_path.lower().endswith('.mkv')
+    if REMUX_ENGINE == 'mkvmerge':
+        if is_mkv and mkvmerge.is_available(): return mkvmerge
+        logging.debug("mkvmerge nicht nutzbar (keine MKV-Quelle oder nicht installiert), nutze ffmpeg.")
+    elif REMUX_ENGINE == 'auto' and REMUX_MAX_MBPS <= 0:  # mkvmerge kennt kein -readrate: mit Bandbreiten-Limit immer ffmpeg
+        if is_mkv and size_bytes >= REMUX_MKVMERGE_MIN_MB * 1024 * 1024 and mkvmerge.is_available(): return mkvmerge
+    return REMUX_ENGINES['ffmpeg']
+
+# --- Remux-Fortschritt & Stall-Erkennung ---
+class RemuxStalled(subprocess.TimeoutExpired):
+    """Der Remux hat REMUX_STALL_SECONDS lang keine Bytes geschrieben (z.B. hängender NFS-Read)."""
+
+class RemuxAborted(Exception):
+    """Der Remux wurde wegen SIGTERM abgebrochen; die Datei bleibt unverändert und folgt im nächsten Lauf."""
+
+# Schlüssel aus `ffmpeg -progress`; alle anderen stdout-Zeilen (auch mkvmerge-Meldungen mit '=') sind Meldungen
+FFMPEG_PROGRESS_KEYS = {'frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms', 'out_time', 'dup_frames',
+                        'drop_frames', 'speed', 'progress'}
+
+def _format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m" if seconds >= 3600 else f"{seconds // 60}m{seconds % 60:02d}s"
+
+def run_monitored_remux(cmd, out_path, expected_bytes, duration_s, stats):
+    """
+    Führt einen Remux mit live ausgewertetem Fortschritt aus (ffmpeg -progress bzw. mkvmerge --gui-mode,
+    ergänzt um die Größe der Ausgabedatei).
+
+    Das Timeout passt sich an: Mindestens FFMPEG_TIMEOUT, mindestens die Zeit für `expected_bytes` bei
+    REMUX_MIN_MBPS und – sobald ein Durchsatz gemessen ist – genug Zeit für den Rest mit 50% Puffer.
+    Werden REMUX_STALL_SECONDS lang keine Bytes geschrieben, wird der Prozess beendet (RemuxStalled).
+    Bei SIGTERM wird der Prozess sofort beendet (RemuxAborted), statt bis zu Stunden auf das Ende zu warten.
+    Gibt ein CompletedProcess mit den gesammelten Fehlermeldungen als stderr zurück.
+    """
+    name = os.path.basename(out_path).split('.remux_tmp_')[0]
+    feed = {'bytes': 0, 'out_time': 0.0, 'percent': None}
+    messages = []
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='ignore')
+
+    def read_stdout():
+        for line in proc.stdout:
+            line = line.strip()
+            key, _, value = line.partition('=')
+            if key == 'total_size' and value.isdigit(): feed['bytes'] = int(value)
+            elif key == 'out_time_us' and value.isdigit(): feed['out_time'] = int(value) / 1e6
+            elif line.startswith('#GUI#progress'):
+                try: feed['percent'] = float(line.split()[-1].rstrip('%'))
+                except ValueError: pass
+            elif key in FFMPEG_PROGRESS_KEYS or key.startswith('stream_'): continue
+            elif line: messages.append(line)  # mkvmerge meldet Fehler auf stdout
+    def read_stderr():
+        for line in proc.stderr: messages.append(line.rstrip())
+    readers = [threading.Thread(target=read_stdout, daemon=True), threading.Thread(target=read_stderr, daemon=True)]
+    for t in readers: t.start()
+
+    start = time.monotonic(); last_change = start; last_log = start; written = 0
+    budget = max(FFMPEG_TIMEOUT, expected_bytes / (REMUX_MIN_MBPS * 1024 * 1024) if REMUX_MIN_MBPS > 0 else 0)
     try:
-        current_mtime = os.path.getmtime(file_path)
-    except FileNotFoundError:
-        logging.warning(f"Datei nicht gefunden während mtime-Check: {file_path}")
-        return
-
-    stats.files_checked += 1
-    skip, reason = should_skip_file(cursor, file_path, current_mtime)
-    if skip:
-        if reason == "Erfolg": stats.files_skipped_db += 1
-        logging.debug(f"🚫 Überspringe ({reason}): {os.path.basename(file_path)}")
-        return
-
-    media_info = get_media_info(file_path)
-    if not media_info:
-        increment_failure_count(cursor, file_path, current_mtime) # Pass valid mtime
-        stats.files_failed += 1
-        return
-
-    stats.files_processed += 1
-    logging.info(f"\n🎬 --- Prüfe: {os.path.basename(file_path)} ---")
+        while True:
+            try:
+                proc.wait(timeout=1); break
+            except subprocess.TimeoutExpired:
+                pass
+            if SHUTDOWN_REQUESTED.is_set(): raise RemuxAborted("Beenden angefordert (SIGTERM)")
+            now = time.monotonic(); elapsed = now - start
+            try: on_disk = os.path.getsize(out_path)
+            except OSError: on_disk = 0
+            current = max(feed['bytes'], on_disk)
+            if current > written: written = current; last_change = now
+            elif now - last_change >= REMUX_STALL_SECONDS:
+                stats.remux_stalls += 1
+                raise RemuxStalled(cmd, int(now - last_change))
+            rate = written / elapsed if elapsed > 0 else 0
+            if feed['percent'] is not None: percent = feed['percent']
+            elif duration_s > 0 and feed['out_time'] > 0: percent = min(100.0, feed['out_time'] / duration_s * 100)
+            else: percent = min(100.0, written / expected_bytes * 100) if expected_bytes else 0.0
+            # ETA bevorzugt aus dem Prozent-Fortschritt (Zeitbasis), sonst aus den noch erwarteten Bytes
+            if percent > 0: eta = elapsed * (100 - percent) / percent
+            else: eta = max(0, expected_bytes - written) / rate if rate > 0 else None
+            if eta is not None and elapsed >= 30: budget = max(budget, elapsed + eta * 1.5)
+            if elapsed > budget: raise subprocess.TimeoutExpired(cmd, int(budget))
+            if now - last_log >= REMUX_PROGRESS_LOG_SECONDS:
+                last_log = now
+                # Als eigenes Feld, damit LOG_FORMAT=json den Fortschritt jedes laufenden Remuxes maschinenlesbar liefert
+                progress = {'percent': round(percent, 1), 'mb_per_s': round(rate / (1024 * 1024), 1), 'eta_s': int(eta) if eta is not None else None}
+                logging.info(f"  ⏳ {name}: {percent:5.1f}% | {rate / (1024 * 1024):.1f} MB/s | ETA {_format_eta(eta) if eta is not None else '?'} (Limit {_format_eta(budget - elapsed)})",
+                             extra={'progress': progress})
+    except BaseException:
+        proc.kill(); proc.wait()
+        raise
+    finally:
+        for t in readers: t.join(timeout=5)
+        elapsed = time.monotonic() - start
+        stats.remux_seconds += elapsed
+        try: stats.remux_bytes_written += max(written, os.path.getsize(out_path))
+        except OSError: stats.remux_bytes_written += written
+    return subprocess.CompletedProcess(cmd, proc.returncode, '', '\n'.join(messages))
+
+
+# --- MP4: Metadaten direkt in den Atomen ändern (MP4_INPLACE_EDIT) ---
+# Sprache (mdhd), Default-Flag (tkhd "enabled", so liest es auch ffmpeg) und Titel (udta/name) einer Spur liegen in
+# der moov-Box, die nur wenige KB bis MB groß ist. Statt die ganze Datei nach MKV zu kopieren, wird nur moov neu
+# geschrieben: bei gleicher Größe an Ort und Stelle, sonst mit einer folgenden free-Box als Puffer oder am Dateiende.
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'udta'}
+MP4_HANDLER_TYPES = {b'soun': 'audio', b'vide': 'video', b'sbtl': 'subtitle', b'text': 'subtitle', b'subt': 'subtitle',
+                     b'subp': 'subtitle'}
+# MP4 speichert ISO 639-2/T, die Sprachcodes hier sind (wie bei Matroska üblich) überwiegend 639-2/B
+MP4_LANG_B_TO_T = {'alb': 'sqi', 'arm': 'hye', 'baq': 'eus', 'bur': 'mya', 'chi': 'zho', 'cze': 'ces', 'dut': 'nld',
+                   'fre': 'fra', 'geo': 'kat', 'ger': 'deu', 'gre': 'ell', 'ice': 'isl', 'mac': 'mkd', 'mao': 'mri',
+                   'may': 'msa', 'per': 'fas', 'rum': 'ron', 'slo': 'slk', 'tib': 'bod', 'wel': 'cym'}
+MP4_TKHD_ENABLED = 0x000001
+
+class Mp4EditUnsupported(Exception):
+    """Die Datei lässt sich nicht sicher in place ändern (Struktur, Platz, Spurzuordnung) – Remux als Rückfallebene."""
+
+def mp4_language_code(lang):
+    """Packt einen Sprachcode in das 16-Bit-Feld von mdhd (3 x 5 Bit, Zeichen - 0x60)."""
+    code = MP4_LANG_B_TO_T.get(lang, lang)
+    if len(code) != 3 or not all('a' <= c <= 'z' for c in code): raise Mp4EditUnsupported(f"Sprachcode '{lang}' passt nicht in mdhd")
+    return (ord(code[0]) - 0x60) << 10 | (ord(code[1]) - 0x60) << 5 | (ord(code[2]) - 0x60)
+
+def parse_mp4_boxes(data, start=0, end=None):
+    """Zerlegt `data[start:end]` in [typ, payload-oder-kinder, rest] – Container aus MP4_CONTAINER_BOXES rekursiv."""
+    end = len(data) if end is None else end
+    boxes = []; pos = start
+    while pos + 8 <= end:
+        size, btype = struct.unpack_from('>I4s', data, pos); header = 8
+        if size == 1: size = struct.unpack_from('>Q', data, pos + 8)[0]; header = 16
+        elif size == 0: size = end - pos
+        if size < header or pos + size > end: raise Mp4EditUnsupported(f"Ungültige Box '{btype.decode('latin-1')}' bei Offset {pos}")
+        body_start = pos + header; body_end = pos + size
+        if btype in MP4_CONTAINER_BOXES: boxes.append([btype, parse_mp4_boxes(data, body_start, body_end)])
+        else: boxes.append([btype, data[body_start:body_end]])
+        pos = body_end
+    if pos < end: boxes.append([None, data[pos:end]])  # Füllbytes (z.B. vier Nullbytes am Ende von udta) unverändert lassen
+    return boxes
+
+def serialize_mp4_boxes(boxes):
+    out = bytearray()
+    for btype, body in boxes:
+        if btype is None: out += body; continue
+        payload = serialize_mp4_boxes(body) if isinstance(body, list) else body
+        if len(payload) + 8 <= 0xFFFFFFFF: out += struct.pack('>I4s', len(payload) + 8, btype)
+        else: out += struct.pack('>I4sQ', 1, btype, len(payload) + 16)
+        out += payload
+    return bytes(out)
+
+def _mp4_child(boxes, btype):
+    return next((b for b in boxes if b[0] == btype), None)
+
+def read_mp4_top_level(f, file_size):
+    """(typ, offset, größe) aller Top-Level-Boxen, ohne den Inhalt (mdat) zu lesen."""
+    boxes = []; pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos); header = f.read(16)
+        size, btype = struct.unpack_from('>I4s', header)
+        if size == 1: size = struct.unpack_from('>Q', header, 8)[0]
+        elif size == 0: size = file_size - pos
+        if size < 8 or pos + size > file_size: raise Mp4EditUnsupported(f"Ungültige Top-Level-Box bei Offset {pos}")
+        boxes.append((btype, pos, size)); pos += size
+    return boxes
+
+def mp4_metadata_edits(plan):
+    """
+    Übersetzt die geplanten Metadaten-Aktionen (gleiches Format wie für mkvpropedit) in {Stream-Index: Änderungen}.
+    Default-Flags werden wie bei MKV nur entfernt, wenn der Spurtyp ein neues Default-Ziel hat.
+    """
+    has_default = {'audio': plan['default_audio_index'] != -1, 'subtitle': plan['default_subtitle_index'] != -1}
+    actions = plan['actions_mkvprop']; edits = defaultdict(dict)
+    for i in range(0, len(actions) - 3, 4):
+        idx = int(actions[i + 1].split(':')[1]) - 1
+        key, _, value = actions[i + 3].partition('=')
+        if key == 'language': edits[idx]['language'] = value
+        elif key == 'title': edits[idx]['title'] = value
+        elif key == 'flag-default' and (value == '1' or has_default.get(plan['stream_types'].get(idx))):
+            edits[idx]['enabled'] = value == '1'
+    return dict(edits)
+
+def apply_mp4_track_edits(moov, edits, stream_types):
+    """Ändert den geparsten moov-Baum; Spuren werden über die trak-Reihenfolge (= ffprobe-Index) zugeordnet."""
+    traks = [b[1] for b in moov if b[0] == b'trak']
+    if len(traks) != len(stream_types): raise Mp4EditUnsupported(f"{len(traks)} trak-Boxen, aber {len(stream_types)} Streams")
+    for idx, changes in edits.items():
+        trak = traks[idx]; mdia = _mp4_child(trak, b'mdia')
+        hdlr = _mp4_child(mdia[1], b'hdlr') if mdia else None
+        if not hdlr or len(hdlr[1]) < 12: raise Mp4EditUnsupported(f"Spur {idx} ohne hdlr")
+        if MP4_HANDLER_TYPES.get(hdlr[1][8:12]) != stream_types.get(idx):
+            raise Mp4EditUnsupported(f"Spur {idx}: Handler '{hdlr[1][8:12].decode('latin-1')}' passt nicht zu '{stream_types.get(idx)}'")
+        if 'language' in changes:
+            mdhd = _mp4_child(mdia[1], b'mdhd')
+            if not mdhd: raise Mp4EditUnsupported(f"Spur {idx} ohne mdhd")
+            offset = 32 if mdhd[1][0] == 1 else 20  # Version 1: 64-Bit-Zeitfelder
+            body = bytearray(mdhd[1]); struct.pack_into('>H', body, offset, mp4_language_code(changes['language'])); mdhd[1] = bytes(body)
+        if 'enabled' in changes:
+            tkhd = _mp4_child(trak, b'tkhd')
+            if not tkhd: raise Mp4EditUnsupported(f"Spur {idx} ohne tkhd")
+            flags = int.from_bytes(tkhd[1][1:4], 'big')
+            flags = flags | MP4_TKHD_ENABLED if changes['enabled'] else flags & ~MP4_TKHD_ENABLED
+            tkhd[1] = tkhd[1][:1] + flags.to_bytes(3, 'big') + tkhd[1][4:]
+        if 'title' in changes:
+            udta = _mp4_child(trak, b'udta')
+            if not udta: udta = [b'udta', []]; trak.append(udta)
+            name = _mp4_child(udta[1], b'name')
+            if name: name[1] = changes['title'].encode('utf-8')
+            else: udta[1].insert(0, [b'name', changes['title'].encode('utf-8')])  # vor eventuelle Füllbytes
+
+def edit_mp4_in_place(file_path, plan):
+    """
+    Schreibt die geplanten Metadaten-Änderungen direkt in die moov-Box. Gibt die Zahl der geschriebenen Bytes zurück.
+    Passt die neue moov-Box nicht an ihren Platz (auch nicht mit einer folgenden free-Box), wird Mp4EditUnsupported
+    geworfen und die Datei bleibt unverändert.
+    """
+    edits = mp4_metadata_edits(plan)
+    if not edits: return 0
+    with open(file_path, 'r+b') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        top = read_mp4_top_level(f, file_size)
+        moov_pos = next((i for i, b in enumerate(top) if b[0] == b'moov'), None)
+        if moov_pos is None: raise Mp4EditUnsupported("Keine moov-Box gefunden")
+        _, offset, old_size = top[moov_pos]
+        f.seek(offset); raw = f.read(old_size)
+        moov = parse_mp4_boxes(raw)[0][1]
+        apply_mp4_track_edits(moov, edits, plan['stream_types'])
+        new_moov = serialize_mp4_boxes([[b'moov', moov]])
+        following = top[moov_pos + 1:]
+        free_run = 0
+        for btype, _, size in following:
+            if btype not in (b'free', b'skip'): break
+            free_run += 1
+        room = old_size + sum(size for _, _, size in following[:free_run])
+        padding = room - len(new_moov)
+        if len(new_moov) == old_size or padding == 0 or padding >= 8:
+            # Passt an den bisherigen Platz (ggf. mit free-Box als Rest) – Mediendaten und Chunk-Offsets bleiben, wo sie sind
+            block = new_moov + (struct.pack('>I4s', padding, b'free') + bytes(padding - 8) if padding and len(new_moov) != old_size else b'')
+            write_at = offset
+        elif free_run == len(following) and raw[:4] != bytes(4):  # Größe 0 ("bis Dateiende") würde die neue moov verschlucken
+            # moov liegt am Dateiende: neue moov anhängen und erst danach die alte per 4-Byte-Schreibvorgang zu free machen,
+            # damit die Datei zu jedem Zeitpunkt genau eine gültige moov-Box hat
+            block = new_moov; write_at = file_size
+        else:
+            raise Mp4EditUnsupported(f"moov wächst um {len(new_moov) - old_size} Bytes, kein Platz vor den Mediendaten")
+        parse_mp4_boxes(block)  # Plausibilität der neuen Struktur vor dem Schreiben
+        f.seek(write_at); f.write(block); f.flush(); os.fsync(f.fileno())
+        if write_at != offset:
+            f.seek(offset + 4); f.write(b'free'); f.flush(); os.fsync(f.fileno())
+    return len(block)
 
+# --- (4) HAUPTVERARBEITUNG ---
+def build_file_plan(file_path, media_info, stats):
+    """
+    Ermittelt aus der ffprobe-Ausgabe den SOLL-Zustand einer Datei (inkl. Whisper für 'und'-Audio), ohne sie zu ändern.
+    Gibt (plan, entfernte Stream-Indizes, Dauer in s) zurück; Zähler für geplante Änderungen landen in `stats`.
+    """
     streams = media_info.get('streams', [])
     dur = 0
     d_str = None # Initialize d_str
@@ -535,15 +2119,39 @@ def process_file(cursor, file_path, file_type, stats):
         logging.warning(f"Konnte Dauer '{d_str}' für {os.path.basename(file_path)} nicht parsen: {e}")
         dur = 0
 
+    is_mp4 = file_path.lower().endswith('.mp4')
+    mp4_convert = is_mp4 and not MP4_INPLACE_EDIT  # Ohne MP4_INPLACE_EDIT wird jede MP4 zu MKV konvertiert
     plan = {
-        'needs_remux': file_path.lower().endswith('.mp4'),  # MP4s müssen zu MKV konvertiert werden
+        'needs_remux': mp4_convert,
+        'inplace_mp4': is_mp4 and MP4_INPLACE_EDIT,  # Metadaten-Änderungen direkt in den MP4-Atomen statt mkvpropedit
         'actions_mkvprop': [],
-        'maps_ffmpeg': ['-map', '0:v?'],
-        'metadata_ffmpeg': [],
+        'tracks': [],        # Behaltene Audio-/Untertitelspuren (SOLL-Zustand) für die Remux-Engine
+        'attachments': [],   # Behaltene Anhänge (Fonts, Cover)
+        'stream_types': {s['index']: s.get('codec_type') for s in streams},
+        'attached_pics': [s['index'] for s in streams if s.get('disposition', {}).get('attached_pic')],
         'dry_run_log': []
     }
     streams_to_keep = []
     streams_to_remove = []
+    rules = rules_for_path(file_path)
+
+    # --- Spracherkennung: alle 'und'-Audiospuren gemeinsam (ein ffmpeg-Lauf für alle Proben, ein Erkennungs-Batch) ---
+    detected = {}
+    und_audio = [s['index'] for s in streams if s.get('codec_type') == 'audio' and not is_commentary(s, rules)
+                 and normalize_lang_code(s.get('tags', {}).get('language', 'und')) == 'und']
+    detector = language_detector() if und_audio else None
+    if detector: # Erkennung, wenn ein Backend (API oder lokal) verfügbar ist
+        if dur >= 180:
+            logging.info(f"  🔍 Analysiere Spur(en) {', '.join(f'#{i}' for i in und_audio)} (Audio, und, {detector.name})...")
+            pts = [dur * p - (15 if p == 0.9 else 0) for p in [0.3, 0.6, 0.9]]
+            pts = [max(0, p) for p in pts]
+            for i, st in enumerate(pts):
+                if st > dur - 30:
+                    pts[i] = max(0, dur - 30)
+                    logging.debug(f"  \t Startzeit für Probe {i+1} angepasst auf {pts[i]:.2f}s.")
+            detected = detector.detect_tracks(file_path, und_audio, pts)
+        else:
+            logging.debug(f"  -> Spur(en) {und_audio} (und) in kurzer Datei (Dauer: {dur:.1f}s). Keine Analyse.")
 
     # --- Erste Schleife: Streams analysieren, Whisper, Keep/Remove ---
     for stream in streams:
@@ -551,158 +2159,62 @@ def process_file(cursor, file_path, file_type, stats):
         ct = stream.get('codec_type')
         original_lang_tag = normalize_lang_code(stream.get('tags', {}).get('language', 'und'))
         final_lt = original_lang_tag
-        is_comm = is_commentary(stream)
+        is_comm = is_commentary(stream, rules)
         keep = True
 
-        run_whisper = (ct == 'audio' and final_lt == 'und' and not is_comm and
-                   WHISPER_API_URL) # Führe Whisper aus, wenn es und ist und die API da ist
-        if run_whisper:
-            if dur >= 180:
-                logging.info(f"  🔍 Analysiere Spur #{idx} (Audio, und)..."); langs=[]
-                pts = [dur * p - (15 if p == 0.9 else 0) for p in [0.3, 0.6, 0.9]]
-                pts = [max(0, p) for p in pts]
-
-                for i, st in enumerate(pts):
-                    if st > dur - 30:
-                        st = max(0, dur - 30)
-                        logging.debug(f"  \t Startzeit für Probe {i+1} angepasst auf {st:.2f}s.")
-
-                    tmp_p = None
-                    try:
-                        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp:
-                            tmp_p = tmp.name
-                        cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-i', file_path,
-                            '-ss', str(st), '-t', '30', '-map', f'0:{idx}', '-vn',
-                            '-c:a', 'libmp3lame', '-q:a', '5', tmp_p]
-                        logging.debug(f"Running ffmpeg for Whisper sample {i+1}: {' '.join(cmd)}")
-                        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=FFMPEG_SAMPLE_TIMEOUT)
-
-                        lc_raw = detect_language_with_whisper(tmp_p)
-                        lc = normalize_lang_code(lc_raw) if lc_raw else 'und'
-                        logging.info(f"  \t Probe {i+1}/3: '{lc_raw}' (-> '{lc}') erkannt."); langs.append(lc)
-
-                    except subprocess.TimeoutExpired:
-                        logging.warning(f"  \t Probe {i+1}/3: Timeout bei ffmpeg Extraktion.")
-                    except subprocess.CalledProcessError as sub_e:
-                        stderr_output = sub_e.stderr.decode('utf-8', errors='ignore').strip() if sub_e.stderr else "N/A"
-                        logging.warning(f"  \t Probe {i+1}/3: Fehler bei ffmpeg Extraktion. STDERR: {stderr_output}")
-                    except Exception as e:
-                        logging.warning(f"  \t Probe {i+1}/3: Unerwarteter Fehler. {e}")
-                    finally:
-                        if tmp_p and os.path.exists(tmp_p):
-                            try: os.remove(tmp_p); logging.debug(f"Temp Whisper file gelöscht: {tmp_p}")
-                            except OSError as rm_e: logging.warning(f"Konnte Temp Whisper file nicht löschen: {tmp_p} - {rm_e}")
-
-                if langs:
-                    cnts = Counter(langs); mc, c = cnts.most_common(1)[0]
-                    if c >= 2:
-                        final_lt = mc
-                        logging.info(f"  -> Spur {idx}: Mehrheit -> '{final_lt}'.")
-                        stats.audio_tagged += 1; stats.lang_counts[final_lt] += 1
-                    else:
-                        logging.info(f"  -> Spur {idx}: Keine Mehrheit ({cnts}). Bleibt 'und'.")
-            else:
-                logging.debug(f"  -> Spur {idx} (und) in kurzer Datei (Dauer: {dur:.1f}s). Keine Analyse.")
-
-        remove_condition = False
-        stream_type_label = str(ct).upper() if ct else 'Unknown'
-        keep_list_for_log = set()
-
-        if ct == 'audio':
-            remove_condition = REMOVE_AUDIO and not is_comm and final_lt not in KEEP_AUDIO_LANGS
-            keep_list_for_log = KEEP_AUDIO_LANGS
-        elif ct == 'subtitle':
-            remove_condition = REMOVE_SUBTITLES and final_lt not in KEEP_SUBTITLE_LANGS
-            keep_list_for_log = KEEP_SUBTITLE_LANGS
-        elif ct == 'attachment':
-            # MIME Type des Anhangs prüfen (ffprobe liefert dies oft in tags)
-            mimetype = stream.get('tags', {}).get('mimetype', '').lower()
-            
-            # Neue Logik: Prüfe, ob es eine Schriftart ist
-            is_font = mimetype.startswith('font/') or mimetype.endswith('/truetype') or mimetype.endswith('/opentype')
-            
-            if is_font:
-                # WENN es eine Schriftart ist: Prüfe die neue Variable REMOVE_FONTS
-                remove_condition = REMOVE_FONTS
-                stream_type_label = 'Font'
-                keep_list_for_log = set() 
-            else:
-                # WENN es ein anderes Attachment ist (z.B. Cover, Bild): Prüfe REMOVE_ATTACHMENTS
-                remove_condition = REMOVE_ATTACHMENTS
-                stream_type_label = 'Attachment'
-                keep_list_for_log = set()
-        elif ct != 'video': # Keep video by default, also keep unknown types
+        if idx in detected: # Ergebnis der gemeinsamen Erkennung für 'und'-Audio
+            langs = []
+            for i, lc_raw in enumerate(detected[idx]):
+                if lc_raw is None: continue  # Probe nicht extrahierbar (bereits geloggt)
+                lc = normalize_lang_code(lc_raw) if lc_raw else 'und'
+                logging.info(f"  \t Spur {idx}, Probe {i+1}/{len(detected[idx])}: '{lc_raw}' (-> '{lc}') erkannt."); langs.append(lc)
+
+            if langs:
+                cnts = Counter(langs); mc, c = cnts.most_common(1)[0]
+                if c >= 2:
+                    final_lt = mc
+                    logging.info(f"  -> Spur {idx}: Mehrheit -> '{final_lt}'.")
+                    stats.audio_tagged += 1; stats.lang_counts[final_lt] += 1
+                else:
+                    logging.info(f"  -> Spur {idx}: Keine Mehrheit ({cnts}). Bleibt 'und'.")
+
+        # Entscheidung über die vorkompilierten Regel-Tabellen
+        mimetype = stream.get('tags', {}).get('mimetype', '').lower() if ct == 'attachment' else ''
+        remove_condition = rules.removes(ct, final_lt, is_comm, mimetype)
+        if ct == 'attachment': stream_type_label = 'Font' if is_font_mimetype(mimetype) else 'Attachment'
+        else: stream_type_label = str(ct).upper() if ct else 'Unknown'
+        if ct not in ('audio', 'subtitle', 'attachment', 'video'): # Keep video by default, also keep unknown types
             logging.debug(f"Unbekannter Stream-Typ '{ct}' bei Index {idx} wird beibehalten.")
 
-        logging.debug(f"  DEBUG: Check Keep Stream {idx} ({ct}). Final Lang: '{final_lt}'. Keep List ({stream_type_label}): {keep_list_for_log}. Is Comm: {is_comm}. Remove: {remove_condition}")
+        logging.debug(f"  DEBUG: Check Keep Stream {idx} ({ct}). Final Lang: '{final_lt}'. Keep List ({stream_type_label}): {rules.keep_langs.get(ct) or set()}. Is Comm: {is_comm}. Remove: {remove_condition}")
 
         if RUN_CLEANUP and remove_condition:
             keep = False
-            plan['needs_remux'] = True
             if ct == 'audio': stats.audio_removed += 1; plan['dry_run_log'].append(f"⛔ Würde Spur {idx} (Audio, {final_lt}) ENTFERNEN.")
             elif ct == 'subtitle': stats.subs_removed += 1; plan['dry_run_log'].append(f"⛔ Würde Spur {idx} (Sub, {final_lt}) ENTFERNEN.")
-            elif ct == 'attachment': stats.attachments_removed += 1; plan['dry_run_log'].append(f"⛔ Würde Spur {idx} (Attachment) ENTFERNEN.")
+            elif ct == 'attachment': stats.attachments_removed += 1; plan['dry_run_log'].append(f"⛔ Würde Spur {idx} ({stream_type_label}) ENTFERNEN.")
 
-        if keep: streams_to_keep.append({'stream':stream,'final_lang':final_lt})
-        else:
-             streams_to_remove.append(idx); plan['needs_remux']=True
-            
-             if ct == 'attachment':
-                 if 'Font' in stream_type_label: # Wenn es eine Schriftart war
-                      stats.attachments_removed += 1 # Zähle es unter Attachments
-                      plan['dry_run_log'].append(f"⛔ Würde Spur {idx} (Font) ENTFERNEN.")
-                 else: # Wenn es ein anderes Attachment war
-                      stats.attachments_removed += 1
-                      plan['dry_run_log'].append(f"⛔ Würde Spur {idx} (Attachment) ENTFERNEN.")
+        if keep: streams_to_keep.append({'stream': stream, 'final_lang': final_lt, 'original_lang': original_lang_tag, 'is_commentary': is_comm})
+        else: streams_to_remove.append(idx); plan['needs_remux'] = True
     # --- Ende Erste Schleife ---
 
 # --- Zweite Schleife: Aktionen planen ---
-    audio_tracks_kept = []
-    subtitle_tracks_kept = []
-    has_audio_default_candidate = False
-    has_subtitle_default_candidate = False
-
-    # First pass to build lists and check for default candidates (uses correct 'final_lang' key)
+    # Behaltene Spuren je Typ; Default-Ziel ist die erste passende Nicht-Kommentar-Spur (SOLL-Zustand)
+    kept_by_type = {'audio': [], 'subtitle': []}
+    default_index = {'audio': -1, 'subtitle': -1}
     for item in streams_to_keep:
-        s = item['stream']; idx = s['index']; ct = s.get('codec_type'); fl = item['final_lang']
-        is_comm = is_commentary(s)
-
-        # track_info speichert den originalen Status
-        track_info = {'original_index': idx, 'final_lang': fl, 'is_commentary': is_comm, 'stream': s}
-
-        if ct == 'audio':
-            audio_tracks_kept.append(track_info)
-            if DEFAULT_AUDIO_LANG and fl == DEFAULT_AUDIO_LANG and not is_comm:
-                has_audio_default_candidate = True
-        elif ct == 'subtitle':
-            subtitle_tracks_kept.append(track_info)
-            if DEFAULT_SUBTITLE_LANG and fl == DEFAULT_SUBTITLE_LANG:
-                has_subtitle_default_candidate = True
-
-    final_audio_default_original_idx = -1
-    final_subtitle_default_original_idx = -1
-    
-    # ----------------------------------------------------------------------
-    # Bestimme, welcher Index tatsächlich das DEFAULT-Ziel ist (SOLL-Zustand)
-    # ----------------------------------------------------------------------
-
-    # Determine actual default track index (audio)
-    if has_audio_default_candidate:
-        for track in audio_tracks_kept:
-            if track['final_lang'] == DEFAULT_AUDIO_LANG and not track['is_commentary']:
-                final_audio_default_original_idx = track['original_index']
-                stats.default_audio_set += 1 
-                break
-        # Wenn kein geeigneter Kandidat gefunden wurde, bleibt der Default-Status bei -1
-
-    # Determine actual default track index (subtitle)
-    if has_subtitle_default_candidate:
-        for track in subtitle_tracks_kept:
-             if track['final_lang'] == DEFAULT_SUBTITLE_LANG:
-                 final_subtitle_default_original_idx = track['original_index']
-                 stats.default_sub_set += 1 
-                 break
-        # Wenn kein geeigneter Kandidat gefunden wurde, bleibt der Default-Status bei -1
+        s = item['stream']; ct = s.get('codec_type')
+        if ct not in kept_by_type: continue
+        fl = item['final_lang']; is_comm = item['is_commentary']
+        kept_by_type[ct].append({'original_index': s['index'], 'final_lang': fl, 'is_commentary': is_comm, 'stream': s})
+        default_lang = rules.default_langs[ct]
+        if default_index[ct] == -1 and default_lang and fl == default_lang and not (is_comm and ct == 'audio'):
+            default_index[ct] = s['index']
+    audio_tracks_kept, subtitle_tracks_kept = kept_by_type['audio'], kept_by_type['subtitle']
+    final_audio_default_original_idx = default_index['audio']
+    final_subtitle_default_original_idx = default_index['subtitle']
+    if final_audio_default_original_idx != -1: stats.default_audio_set += 1
+    if final_subtitle_default_original_idx != -1: stats.default_sub_set += 1
 
     # Reset mkvpropedit actions before rebuilding (optional, aber sicher)
     plan['actions_mkvprop'] = [] 
@@ -710,15 +2222,12 @@ def process_file(cursor, file_path, file_type, stats):
     # ----------------------------------------------------------------------
     # Hauptschleife zur Generierung der Aktionen (Ist vs. Soll)
     # ----------------------------------------------------------------------
-    new_audio_idx = 0
-    new_subtitle_idx = 0
-    
     for item in streams_to_keep:
         s = item['stream']
         idx = s['index'] # 0-basierter Index (Original)
         ct = s.get('codec_type')
         fl = item['final_lang']
-        ol = normalize_lang_code(s.get('tags', {}).get('language', 'und'))
+        ol = item['original_lang']
         mid = idx + 1 # 1-basierter Index für mkvpropedit
 
         is_audio = ct == 'audio'
@@ -739,22 +2248,22 @@ def process_file(cursor, file_path, file_type, stats):
         if fl != ol:
             plan['actions_mkvprop'].extend(['--edit', f'track:{mid}', '--set', f'language={fl}'])
             plan['dry_run_log'].append(f"🏷️ Würde Spur {idx} ({ct}) auf '{fl}' taggen.")
-            if file_path.lower().endswith('.mp4'): plan['needs_remux'] = True
+            if mp4_convert: plan['needs_remux'] = True
 
         # Plan Audio Title Change (intelligente Entscheidung: mkvpropedit vs Remux)
         nt = None
         if is_audio:
-            nt = format_audio_title(s, fl)
+            nt = format_audio_title(s, fl, rules, item['is_commentary'])
             ot = s.get('tags', {}).get('title')
-            if RENAME_AUDIO_TRACKS and nt and nt != ot:
+            if rules.rename_audio and nt and nt != ot:
                 # Nur Remux wenn STRUKTURELLE Änderungen nötig sind
-                if streams_to_remove or file_path.lower().endswith('.mp4'):
+                if streams_to_remove or mp4_convert:
                     plan['needs_remux'] = True
                     plan['dry_run_log'].append(f"✏️ Würde Spur {idx} (Audio) umbenennen zu: '{nt}' [via Remux].")
                 else:
-                    # Effiziente Metadaten-Änderung mit mkvpropedit
+                    # Effiziente Metadaten-Änderung mit mkvpropedit bzw. direkt in udta/name der MP4
                     plan['actions_mkvprop'].extend(['--edit', f'track:{mid}', '--set', f'title={nt}'])
-                    plan['dry_run_log'].append(f"✏️ Würde Spur {idx} (Audio) umbenennen zu: '{nt}' [via mkvpropedit].")
+                    plan['dry_run_log'].append(f"✏️ Würde Spur {idx} (Audio) umbenennen zu: '{nt}' [via {'MP4 in place' if is_mp4 else 'mkvpropedit'}].")
                 stats.audio_renamed += 1
 
         # Plan Default Flag Change (NUR wenn sich der Zustand ändert!)
@@ -770,30 +2279,129 @@ def process_file(cursor, file_path, file_type, stats):
             plan['dry_run_log'].append(f"❌ Würde DEFAULT-Flag von Spur {idx} ({ct}, {fl}) entfernen (nicht mehr nötig).")
 
 
-        # Plan FFmpeg mappings and metadata
+        # Plan Remux-Spuren (engine-neutral); Default-Flag basiert auf dem SOLL-Zustand (is_default_target)
         if is_audio or is_subtitle:
-             plan['maps_ffmpeg'].extend(['-map', f'0:{idx}'])
-             stream_type_char = 'a' if is_audio else 's'
-             new_idx = new_audio_idx if is_audio else new_subtitle_idx
-             prefix = f's:{stream_type_char}:{new_idx}'
-             
-             # Disposition für FFmpeg basiert auf dem SOLL-Zustand (is_default_target)
-             dispos = '+default' if is_default_target else '-default'
-             
-             plan['metadata_ffmpeg'].extend([f'-metadata:{prefix}', f'language={fl}'])
-             plan['metadata_ffmpeg'].extend([f'-disposition:{prefix}', dispos]) 
-             if is_audio and RENAME_AUDIO_TRACKS and nt:
-                 plan['metadata_ffmpeg'].extend([f'-metadata:{prefix}', f'title={nt}'])
-
-             if is_audio: new_audio_idx += 1
-             else: new_subtitle_idx += 1
-
-    # Correct ffmpeg dispositions are now implicitly handled by setting only one '+default' above
+             plan['tracks'].append({'index': idx, 'type': ct, 'lang': fl, 'default': is_default_target,
+                                    'title': nt if is_audio and rules.rename_audio and nt else None})
+        elif ct == 'attachment':
+             plan['attachments'].append(idx)
+
+    # Für die Ausführung (mkvpropedit-Default-Bereinigung) benötigte Zwischenergebnisse
+    plan['audio_kept'] = audio_tracks_kept; plan['subtitles_kept'] = subtitle_tracks_kept
+    plan['default_audio_index'] = final_audio_default_original_idx
+    plan['default_subtitle_index'] = final_subtitle_default_original_idx
+    return plan, streams_to_remove, dur
+
+def plan_needs_changes(plan):
+    return plan['needs_remux'] or any('--set' in a for a in plan['actions_mkvprop'])
+
+def effective_mkvprop_actions(plan):
+    """
+    Filtert plan['actions_mkvprop'] (Vierergruppen --edit/track:N/--set/key=val) auf die wirksamen Änderungen:
+    Sprache und flag-default=1 immer, flag-default=0 nur, wenn der Spurtyp ein neues Default bekommt.
+    Leere Liste = mkvpropedit ist nicht nötig.
+    """
+    actions = plan['actions_mkvprop']
+    audio_tracks_kept, subtitle_tracks_kept = plan['audio_kept'], plan['subtitles_kept']
+    has_lang_change = any('language=' in actions[i] for i in range(3, len(actions), 4))
+    has_default_set_to_1 = any('flag-default=1' in actions[i] for i in range(3, len(actions), 4))
+
+    # Determine if clearing default=0 is necessary
+    needs_clear_audio = plan['default_audio_index'] != -1 and \
+        any(
+            'flag-default=0' in actions[i] and f'track:{t["original_index"]+1}' == actions[i-2]
+            for t in audio_tracks_kept
+            for i in range(3, len(actions), 4)
+        )
+    needs_clear_sub = plan['default_subtitle_index'] != -1 and \
+        any(
+            'flag-default=0' in actions[i] and f'track:{t["original_index"]+1}' == actions[i-2]
+            for t in subtitle_tracks_kept
+            for i in range(3, len(actions), 4)
+        )
+    # Only proceed if there's a language change, a default=1 set, or a necessary default=0 clear
+    if not (has_lang_change or has_default_set_to_1 or needs_clear_audio or needs_clear_sub): return []
+
+    final_mkvprop_actions = []
+    # Iterate through actions in chunks of 4
+    for i in range(0, len(actions), 4):
+        try:
+            edit_cmd, track_id_str, set_cmd, key_val_str = actions[i], actions[i+1], actions[i+2], actions[i+3]
+            # Include language changes and explicit setting to 1
+            if 'language=' in key_val_str or 'flag-default=1' in key_val_str:
+                final_mkvprop_actions.extend([edit_cmd, track_id_str, set_cmd, key_val_str])
+            # Include setting to 0 only if necessary
+            elif 'flag-default=0' in key_val_str:
+                track_idx = int(track_id_str.split(':')[1]) - 1
+                is_audio_track = any(t['original_index'] == track_idx for t in audio_tracks_kept)
+                is_sub_track = any(t['original_index'] == track_idx for t in subtitle_tracks_kept)
+                if (is_audio_track and needs_clear_audio) or (is_sub_track and needs_clear_sub):
+                    final_mkvprop_actions.extend([edit_cmd, track_id_str, set_cmd, key_val_str])
+        except IndexError:
+            logging.warning(f"Fehler beim Verarbeiten der mkvpropedit Aktionen bei Index {i}. Überspringe diesen Teil.")
+            break
+    return final_mkvprop_actions
+
+def log_planned_actions(file_path, plan):
+    """Loggt die geplanten Aktionen und die gewählte Methode (Trockenlauf und `plan`-Kommando)."""
+    for line in plan['dry_run_log']: logging.info(f"  -> {line}")
+    effective_mkvprop_actions = [a for a in plan['actions_mkvprop'] if 'language=' in a or 'flag-default=1' in a] # Only show effective sets
+    if plan['inplace_mp4'] and not plan['needs_remux']:
+        edits = mp4_metadata_edits(plan)
+        if edits:
+            logging.info(f"  -> Aktion: Schnelle Änderung (MP4 in place, {len(edits)} Spur(en), kein Remux).")
+        else:
+            logging.info("  -> Keine Änderungen (nur Default-Flags entfernt?). Markiere als verarbeitet im Dry Run.")
+        return
+    if plan['needs_remux']:
+        engine = select_remux_engine(file_path, os.path.getsize(file_path) if os.path.exists(file_path) else 0)
+        logging.info(f"  -> Aktion: Vollständiger Remux ({engine.name}).")
+        cmd_approx = engine.build_command('...', '...', plan)
+        logging.debug(f"     {engine.name} Command (approx): {' '.join(cmd_approx)}")
+    elif effective_mkvprop_actions:
+        logging.info(f"  -> Aktion: Schnelle Änderung (mkvpropedit).")
+        cmd_approx = ['mkvpropedit', '"..."'] + effective_mkvprop_actions
+        logging.debug(f"     Mkvpropedit Command (approx): {' '.join(cmd_approx)}")
+    else:
+        # This can happen if only flag-default=0 was needed
+        logging.info("  -> Keine Änderungen (nur Default-Flags entfernt?). Markiere als verarbeitet im Dry Run.")
+
+def process_file(cursor, file_path, file_type, stats):
+    try:
+        current_mtime = os.path.getmtime(file_path)
+    except FileNotFoundError:
+        logging.warning(f"Datei nicht gefunden während mtime-Check: {file_path}")
+        return
+
+    stats.files_checked += 1
+    skip, reason = should_skip_file(cursor, file_path, current_mtime)
+    if skip:
+        if reason == "Erfolg": stats.files_skipped_db += 1
+        elif reason == "Backoff": stats.files_skipped_backoff += 1
+        logging.debug(f"🚫 Überspringe ({reason}): {os.path.basename(file_path)}")
+        return
+
+    if ARR_PREFILTER and arr_prefilter_is_clean(file_path, file_type):
+        stats.files_prefiltered += 1
+        logging.debug(f"✔️ Laut {file_type.capitalize()}-mediaInfo keine Änderung nötig, kein ffprobe: {os.path.basename(file_path)}")
+        return  # Nur für diesen Lauf: Die mediaInfo ist kein vollständiger Nachweis, daher kein Eintrag als verarbeitet
+
+    media_info = get_media_info(file_path)
+    if not media_info:
+        increment_failure_count(cursor, file_path, current_mtime, classify_failure(filepath=file_path)) # Pass valid mtime
+        stats.files_failed += 1
+        return
+
+    stats.files_processed += 1
+    logging.info(f"\n🎬 --- Prüfe: {os.path.basename(file_path)} ---")
+
+    streams = media_info.get('streams', [])
+    plan, streams_to_remove, dur = build_file_plan(file_path, media_info, stats)
 
     # --- Entscheidung und Ausführung (Optimiert für Effizienz) ---
     # Remux nur bei strukturellen Änderungen (Streams entfernen, MP4->MKV)
     # Metadaten-Änderungen (Titel, Sprache, Flags) nutzen mkvpropedit
-    mod = plan['needs_remux'] or any('--set' in a for a in plan['actions_mkvprop'])
+    mod = plan_needs_changes(plan)
 
     if not mod:
         logging.debug(f"Keine relevanten Aktionen für {os.path.basename(file_path)} nötig.")
@@ -805,37 +2413,53 @@ def process_file(cursor, file_path, file_type, stats):
     # --- DRY RUN ---
     if DRY_RUN:
         logging.info("!!! [DRY RUN] Modus: Zeige geplante Aktionen. !!!")
-        for line in plan['dry_run_log']: logging.info(f"  -> {line}")
-        effective_mkvprop_actions = [a for a in plan['actions_mkvprop'] if 'language=' in a or 'flag-default=1' in a] # Only show effective sets
-        if plan['needs_remux']:
-            logging.info(f"  -> Aktion: Vollständiger Remux (ffmpeg).")
-            cmd_approx = ['ffmpeg', '-i', '...',] + plan['maps_ffmpeg'] + ['-c', 'copy'] + plan['metadata_ffmpeg'] + ['...']
-            logging.debug(f"     FFmpeg Command (approx): {' '.join(cmd_approx)}")
-        elif effective_mkvprop_actions:
-            logging.info(f"  -> Aktion: Schnelle Änderung (mkvpropedit).")
-            cmd_approx = ['mkvpropedit', '"..."'] + effective_mkvprop_actions
-            logging.debug(f"     Mkvpropedit Command (approx): {' '.join(cmd_approx)}")
-        else:
-            # This can happen if only flag-default=0 was needed
-            logging.info("  -> Keine Änderungen (nur Default-Flags entfernt?). Markiere als verarbeitet im Dry Run.")
+        log_planned_actions(file_path, plan)
         return
 
     # --- ECHTER LAUF ---
-    failed = False; new_p = None; sb = 0; tmp_p = None
+    failed = False; failure_class = 'permanent'; deferred = False; aborted = False; new_p = None; sb = 0; tmp_p = None; scratch_p = None; scratch_reserved = 0
     try:
+        if plan['inplace_mp4'] and not plan['needs_remux']:
+            try:
+                if os.path.exists(file_path): sb = os.path.getsize(file_path)
+                with pipeline_stage('edit'):
+                    written = edit_mp4_in_place(file_path, plan)
+            except Mp4EditUnsupported as unsupported_e:
+                logging.warning(f"  -> MP4 lässt sich nicht in place ändern ({unsupported_e}) – Fallback: Konvertierung nach MKV.")
+                plan['needs_remux'] = True
+            else:
+                if not written:
+                    logging.debug("  -> Keine effektiven MP4-Änderungen geplant (nur flag-default=0 ohne Notwendigkeit?).")
+                    mark_file_as_processed(cursor, file_path, current_mtime); return
+                # Ein Remux hätte die Datei komplett gelesen und neu geschrieben
+                stats.files_edited_mp4 += 1; stats.mp4_io_avoided += max(0, 2 * sb - written); new_p = file_path
+                logging.info(f"  -> ✅ SUCCESS: MP4-Metadaten in place geändert ({format_bytes(written)} geschrieben statt {format_bytes(sb)} kopiert).")
         if plan['needs_remux']:
-            logging.info(f"  -> ⚙️ Führe Remux (ffmpeg) durch...")
             if os.path.exists(file_path): sb = os.path.getsize(file_path)
+            engine = select_remux_engine(file_path, sb)
+            logging.info(f"  -> ⚙️ Führe Remux ({engine.name}) durch...")
             base, ext = os.path.splitext(file_path)
             is_mp4 = ext.lower() == '.mp4'
             out_p = f"{base}.mkv" if is_mp4 else file_path
             tmp_p = f"{out_p}.remux_tmp_{os.getpid()}_{int(time.time())}"
-            cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-i', file_path] + \
-                plan['maps_ffmpeg'] + ['-c', 'copy'] + plan['metadata_ffmpeg'] + \
-                ['-f', 'matroska', tmp_p]
-            logging.debug(f"Executing FFmpeg: {' '.join(cmd)}")
-            r = subprocess.run(cmd, check=False, capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=FFMPEG_TIMEOUT)
-            if r.returncode != 0: raise subprocess.CalledProcessError(r.returncode, cmd, r.stdout, r.stderr)
+            with pipeline_stage('remux', device=get_device_key(file_path)):
+                # Platz erst im Remux-Slot prüfen, damit die Prüfung zum tatsächlichen Schreibzeitpunkt passt
+                estimate = estimate_remux_output_size(sb, streams, streams_to_remove, dur)
+                scratch_dir = reserve_remux_staging(out_p, estimate)
+                if scratch_dir:
+                    scratch_reserved = estimate
+                    scratch_p = os.path.join(scratch_dir, os.path.basename(tmp_p))
+                # Bandbreiten-Limit über -readrate gibt es nur bei ffmpeg; ionice gilt für beide Engines
+                input_args = remux_readrate_args(sb, dur) if engine.name == 'ffmpeg' else []
+                cmd = io_priority_prefix() + engine.build_command(file_path, scratch_p or tmp_p, plan, input_args, progress=True)
+                logging.debug(f"Executing {engine.name}: {' '.join(cmd)}")
+                r = run_monitored_remux(cmd, scratch_p or tmp_p, estimate, dur, stats)
+                stats.remux_bytes_read += sb
+                if r.returncode not in engine.ok_returncodes: raise subprocess.CalledProcessError(r.returncode, cmd, r.stdout, r.stderr)
+                if scratch_p:
+                    # Zurück aufs Ziel-Volume kopieren (noch im Remux-Slot des Geräts); der finale Tausch bleibt ein atomares rename()
+                    logging.debug(f"Kopiere Scratch-Ergebnis {scratch_p} nach {tmp_p}")
+                    copy_scratch_result(scratch_p, tmp_p, stats); scratch_p = None
 
             if is_mp4:
                 logging.debug(f"MP4 Remux: Verschiebe {tmp_p} nach {out_p}, lösche Original {file_path}")
@@ -848,91 +2472,60 @@ def process_file(cursor, file_path, file_type, stats):
                 os.rename(tmp_p, file_path); new_p = file_path
 
             tmp_p_success_path = tmp_p; tmp_p = None # Set tmp_p to None on success
-            stats.files_remuxed_ffmpeg += 1
+            if engine.name == 'mkvmerge': stats.files_remuxed_mkvmerge += 1
+            else: stats.files_remuxed_ffmpeg += 1
             if sb > 0 and new_p and os.path.exists(new_p):
                 try: sa = os.path.getsize(new_p); stats.bytes_saved += (sb - sa)
                 except OSError as e: logging.warning(f"Konnte Dateigröße nach Remux nicht lesen: {new_p} - {e}")
             logging.info(f"  -> ✅ SUCCESS: Remux abgeschlossen (von {tmp_p_success_path}).")
         # --- Execute mkvpropedit if NO remux needed but changes planned ---
-        elif any('--set' in action for action in plan['actions_mkvprop']): # Check if any '--set' exists
-            # Determine if effective changes are planned (language or setting default=1)
-            has_lang_change = any('language=' in plan['actions_mkvprop'][i] for i in range(3, len(plan['actions_mkvprop']), 4))
-            has_default_set_to_1 = any('flag-default=1' in plan['actions_mkvprop'][i] for i in range(3, len(plan['actions_mkvprop']), 4))
-
-            # Determine if clearing default=0 is necessary
-            needs_clear_audio = final_audio_default_original_idx != -1 and \
-                any(
-                    'flag-default=0' in plan['actions_mkvprop'][i] and f'track:{t["original_index"]+1}' == plan['actions_mkvprop'][i-2]
-                    for t in audio_tracks_kept
-                    for i in range(3, len(plan['actions_mkvprop']), 4)
-                )
-            needs_clear_sub = final_subtitle_default_original_idx != -1 and \
-                any(
-                    'flag-default=0' in plan['actions_mkvprop'][i] and f'track:{t["original_index"]+1}' == plan['actions_mkvprop'][i-2]
-                    for t in subtitle_tracks_kept
-                    for i in range(3, len(plan['actions_mkvprop']), 4)
-                )
-
-            # Only proceed if there's a language change, a default=1 set, or a necessary default=0 clear
-            if has_lang_change or has_default_set_to_1 or needs_clear_audio or needs_clear_sub:
+        elif not plan['inplace_mp4'] and any('--set' in action for action in plan['actions_mkvprop']): # Check if any '--set' exists
+            final_mkvprop_actions = effective_mkvprop_actions(plan)
+            if final_mkvprop_actions:
                 logging.info(f"  -> ⚡ Führe mkvpropedit durch...")
-                # Build the final command list carefully
-                final_mkvprop_actions = []
-                # Iterate through actions in chunks of 4
-                for i in range(0, len(plan['actions_mkvprop']), 4):
-                    try:
-                        edit_cmd = plan['actions_mkvprop'][i]
-                        track_id_str = plan['actions_mkvprop'][i+1]
-                        set_cmd = plan['actions_mkvprop'][i+2]
-                        key_val_str = plan['actions_mkvprop'][i+3]
-
-                        # Include language changes
-                        if 'language=' in key_val_str:
-                            final_mkvprop_actions.extend([edit_cmd, track_id_str, set_cmd, key_val_str])
-                        # Include explicit setting to 1
-                        elif 'flag-default=1' in key_val_str:
-                            final_mkvprop_actions.extend([edit_cmd, track_id_str, set_cmd, key_val_str])
-                        # Include setting to 0 only if necessary
-                        elif 'flag-default=0' in key_val_str:
-                            track_idx = int(track_id_str.split(':')[1]) - 1
-                            is_audio_track = any(t['original_index'] == track_idx for t in audio_tracks_kept)
-                            is_sub_track = any(t['original_index'] == track_idx for t in subtitle_tracks_kept)
-                            if (is_audio_track and needs_clear_audio) or (is_sub_track and needs_clear_sub):
-                                final_mkvprop_actions.extend([edit_cmd, track_id_str, set_cmd, key_val_str])
-                    except IndexError:
-                        logging.warning(f"Fehler beim Verarbeiten der mkvpropedit Aktionen bei Index {i}. Überspringe diesen Teil.")
-                        break
-
-                if final_mkvprop_actions:
-                    cmd = ['mkvpropedit', file_path] + final_mkvprop_actions
-                    logging.debug(f"Executing mkvpropedit: {' '.join(cmd)}")
+                cmd = ['mkvpropedit', file_path] + final_mkvprop_actions
+                logging.debug(f"Executing mkvpropedit: {' '.join(cmd)}")
+                with pipeline_stage('edit'):
                     r = subprocess.run(cmd, check=False, capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=MKVPROPEDIT_TIMEOUT)
-                    if r.returncode != 0: raise subprocess.CalledProcessError(r.returncode, cmd, r.stdout, r.stderr)
-                    stats.files_edited_mkvprop += 1; new_p = file_path
-                    logging.info(f"  -> ✅ SUCCESS: mkvpropedit abgeschlossen.")
-                else:
-                    logging.debug("  -> Keine effektiven mkvpropedit Aktionen nach Filterung nötig (nur unnötige flag-default=0?).")
-                    mark_file_as_processed(cursor, file_path, current_mtime); return
+                if r.returncode != 0: raise subprocess.CalledProcessError(r.returncode, cmd, r.stdout, r.stderr)
+                stats.files_edited_mkvprop += 1; new_p = file_path
+                logging.info(f"  -> ✅ SUCCESS: mkvpropedit abgeschlossen.")
             else:
                 logging.debug("  -> Keine effektiven mkvpropedit Aktionen geplant (nur flag-default=0 ohne Notwendigkeit?).")
                 mark_file_as_processed(cursor, file_path, current_mtime); return
 
     # --- Error Handling & Finally Block (Identical to previous version) ---
+    except RemuxDeferred as defer_e:
+        deferred = True; logging.warning(f"  -> ⏸️ Remux zurückgestellt für {os.path.basename(file_path)}: {defer_e}")
+    except RemuxAborted as abort_e:
+        aborted = True; logging.warning(f"  -> 🛑 Remux abgebrochen für {os.path.basename(file_path)}: {abort_e}")
+    except RemuxStalled as stall_e:
+        failed = True; failure_class = 'transient'; logging.error(f"  -> ❌ FEHLER: Remux ohne Fortschritt seit {stall_e.timeout}s – abgebrochen.")
     except subprocess.TimeoutExpired as time_e:
-        failed = True; command_str = " ".join(time_e.cmd) if hasattr(time_e, 'cmd') and time_e.cmd else "Unbekannt"; logging.error(f"  -> ❌ FEHLER: Subprocess Timeout ({time_e.timeout}s) bei Befehl: {command_str}")
+        failed = True; failure_class = 'transient'; command_str = " ".join(time_e.cmd) if hasattr(time_e, 'cmd') and time_e.cmd else "Unbekannt"; logging.error(f"  -> ❌ FEHLER: Subprocess Timeout ({time_e.timeout}s) bei Befehl: {command_str}")
     except subprocess.CalledProcessError as e:
-        failed = True; command_str = " ".join(e.cmd) if hasattr(e, 'cmd') and e.cmd else "Unbekannt"; stderr_output = e.stderr.strip() if hasattr(e, 'stderr') and e.stderr else "Kein STDERR Output."; logging.error(f"  -> ❌ FEHLER: Subprocess fehlgeschlagen (Code {e.returncode}) bei Befehl: {command_str}"); logging.error(f"  -> STDERR: {stderr_output}")
+        failed = True; failure_class = classify_failure(e, file_path); command_str = " ".join(e.cmd) if hasattr(e, 'cmd') and e.cmd else "Unbekannt"; stderr_output = e.stderr.strip() if hasattr(e, 'stderr') and e.stderr else "Kein STDERR Output."; logging.error(f"  -> ❌ FEHLER: Subprocess fehlgeschlagen (Code {e.returncode}) bei Befehl: {command_str}"); logging.error(f"  -> STDERR: {stderr_output}")
     except Exception as e:
-        failed = True; logging.error(f"  -> ❌ ALLGEMEINER FEHLER bei Dateiänderung: {e}", exc_info=True)
+        failed = True; failure_class = classify_failure(e, file_path); logging.error(f"  -> ❌ ALLGEMEINER FEHLER bei Dateiänderung: {e}", exc_info=True)
     finally:
         if tmp_p and os.path.exists(tmp_p):
             logging.warning(f"Versuche fehlgeschlagene/übrige temporäre Remux-Datei zu löschen: {tmp_p}")
             try: os.remove(tmp_p); logging.info(f"Temporäre Remux-Datei gelöscht: {tmp_p}")
             except OSError as rm_e: logging.error(f"Konnte temporäre Remux-Datei nach Fehler nicht löschen: {tmp_p} - {rm_e}")
+        if scratch_p and os.path.exists(scratch_p):
+            try: os.remove(scratch_p); logging.info(f"Temporäre Scratch-Datei gelöscht: {scratch_p}")
+            except OSError as rm_e: logging.error(f"Konnte temporäre Scratch-Datei nicht löschen: {scratch_p} - {rm_e}")
+        if scratch_reserved: release_remux_staging(scratch_reserved)
+
+    if aborted: return  # Unverändert, unmarkiert und ohne Fehlerzählung – der nächste Lauf macht weiter
+    if deferred:
+        # Weder Erfolg noch Fehler: Datei bleibt unmarkiert und wird im nächsten Lauf erneut versucht
+        stats.files_deferred_space += 1
+        return
 
     # --- Ergebnisverarbeitung (Identical to previous version) ---
     if failed:
-        increment_failure_count(cursor, file_path, current_mtime)
+        increment_failure_count(cursor, file_path, current_mtime, failure_class)
         stats.files_failed += 1
     else:
         final_path = new_p if new_p else file_path
@@ -947,11 +2540,11 @@ def process_file(cursor, file_path, file_type, stats):
                 mark_file_as_processed(cursor, final_path, final_mtime)
             except FileNotFoundError:
                 logging.error(f"  -> ❌ DB-FEHLER: Konnte mtime von finalem Pfad '{final_path}' nach erfolgreicher Operation nicht lesen.")
-                increment_failure_count(cursor, file_path, current_mtime)
+                increment_failure_count(cursor, file_path, current_mtime, 'transient')
                 stats.files_failed += 1
             except Exception as e_mtime:
                 logging.error(f"  -> ❌ FEHLER beim Holen der finalen mtime oder DB-Cleanup für '{final_path}': {e_mtime}")
-                increment_failure_count(cursor, file_path, current_mtime)
+                increment_failure_count(cursor, file_path, current_mtime, classify_failure(e_mtime, final_path))
                 stats.files_failed += 1
         else:
             logging.debug("Keine Modifikation durchgeführt (final check), markiere Original als verarbeitet.")
@@ -973,14 +2566,26 @@ def log_scan_report(stats):
     logging.info("\n\n" + "="*50); logging.info("📊 Language Fixer Scan-Bericht 📊"); logging.info("="*50)
     logging.info("\n--- Statistik (Dieser Lauf) ---"); logging.info(f"  ⏱️ Dauer:              {duration_str}")
     logging.info(f"  📁 Verzeichnisse:      {stats.dirs_scanned}"); logging.info(f"  📄 Dateien geprüft:    {stats.files_checked}")
+    if stats.files_skipped_backoff: logging.info(f"  ⏳ Übersprungen (Backoff): {stats.files_skipped_backoff}")
     logging.info(f"  ⏭️ Übersprungen (DB):  {stats.files_skipped_db}"); logging.info(f"  ⚙️ Verarbeitet:        {stats.files_processed}")
     logging.info(f"  ❌ Fehlgeschlagen:     {stats.files_failed}"); lang_str = ", ".join([f"{l}: {c}" for l, c in sorted(stats.lang_counts.items())]) if stats.lang_counts else "Keine"
     logging.info(f"  🎤 Audio getaggt:      {stats.audio_tagged} ({lang_str})"); logging.info(f"  ✏️ Audio umbenannt:    {stats.audio_renamed}")
     logging.info(f"  🗑️ Audio entfernt:     {stats.audio_removed}"); logging.info(f"  🗑️ Subs entfernt:      {stats.subs_removed}")
     logging.info(f"  🗑️ Attach. entfernt:   {stats.attachments_removed}"); logging.info(f"  🚀 Remux (ffmpeg):     {stats.files_remuxed_ffmpeg}")
+    logging.info(f"  🚀 Remux (mkvmerge):   {stats.files_remuxed_mkvmerge}")
     logging.info(f"  ⚡ Edit (mkvpropedit): {stats.files_edited_mkvprop}"); logging.info(f"  🔄 MP4->MKV:           {stats.files_converted_mp4}")
+    if MP4_INPLACE_EDIT: logging.info(f"  ⚡ Edit (MP4 in place): {stats.files_edited_mp4} ({format_bytes(stats.mp4_io_avoided)} I/O gegenüber Remux vermieden)")
     logging.info(f"  ⭐ Default Audio:      {stats.default_audio_set}"); logging.info(f"  ⭐ Default Sub:        {stats.default_sub_set}")
     logging.info(f"  💾 Gesparter Speicher: {format_bytes(stats.bytes_saved)}")
+    if stats.remux_seconds > 0:
+        logging.info(f"  📈 Remux-Durchsatz:    {format_bytes(stats.remux_bytes_written)} in {int(stats.remux_seconds)}s ({stats.remux_bytes_written / (1024 * 1024) / stats.remux_seconds:.1f} MB/s, {stats.remux_stalls} Stalls)")
+    if stats.scratch_bytes_copied: logging.info(f"  📦 Scratch zurückkopiert: {format_bytes(stats.scratch_bytes_copied)}")
+    if ARR_PREFILTER: logging.info(f"  ✔️ Vorgefiltert (Arr): {stats.files_prefiltered}")
+    if stats.files_deferred_budget: logging.info(f"  ⏱️ Zurückgestellt (Zeitbudget): {stats.files_deferred_budget}")
+    if stats.files_deferred_space: logging.info(f"  ⏸️ Zurückgestellt (Platz): {stats.files_deferred_space}")
+    db_line = database_summary()
+    if db_line: logging.info(f"  🗄️ Datenbank:          {db_line}, bereinigt: {stats.db_rows_pruned} Einträge / {stats.db_dirs_pruned} Ordner")
+    if DroppingQueueHandler.dropped: logging.warning(f"  📉 Log-Meldungen verworfen (Queue voll): {DroppingQueueHandler.dropped}")
     try:
         with sqlite3.connect(DB_PATH) as conn:
             cursor = conn.cursor()
@@ -994,6 +2599,18 @@ def log_scan_report(stats):
     except sqlite3.Error as e: logging.warning(f"Fehler beim Laden der Gesamt-Statistik: {e}")
     logging.info("\n" + "="*50 + "\n")
 
+def database_summary():
+    """Größe der DB (inkl. WAL) und Anzahl der Einträge für den Scan-Bericht; None bei Fehlern."""
+    try:
+        size = sum(os.path.getsize(p) for p in (DB_PATH, DB_PATH + '-wal') if os.path.exists(p))
+        with sqlite3.connect(DB_PATH) as conn:
+            dirs = conn.execute("SELECT COUNT(*) FROM directories").fetchone()[0]
+            files = conn.execute("SELECT (SELECT COUNT(*) FROM processed_files) + (SELECT COUNT(*) FROM failed_files)").fetchone()[0]
+        return f"{format_bytes(size)} ({files} Einträge in {dirs} Ordnern)"
+    except (OSError, sqlite3.Error) as e:
+        logging.debug(f"DB-Größe nicht ermittelbar: {e}")
+        return None
+
 def trigger_arr_scan(url, key, paths, arr_type):
     if not url or not key: logging.debug(f"{arr_type} URL oder API Key nicht konfiguriert."); return
     if not paths: logging.info(f"Keine {arr_type}-Dateien geändert, kein Scan nötig."); return
@@ -1025,62 +2642,501 @@ def trigger_arr_scan(url, key, paths, arr_type):
     except Exception as e_arr: logging.error(f"Unerwarteter Fehler in trigger_arr_scan für {arr_type}: {e_arr}", exc_info=True)
     paths.clear()
 
+# --- Inkrementeller Scan über die Arr-History ---
+# Ereignisse, nach denen eine Datei neu oder verändert ist (Import, Upgrade, Umbenennung)
+ARR_HISTORY_EVENTS = {'downloadFolderImported', 'seriesFolderImported', 'movieFolderImported', 'episodeFileRenamed', 'movieFileRenamed'}
+
+def _parse_arr_date(value):
+    try: return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError: return None
+
+def fetch_arr_imports(url, key, since, arr_type):
+    """
+    Holt alle Import-, Upgrade- und Umbenennungs-Ereignisse seit `since` (ISO-Zeitstempel) aus /api/v3/history/since.
+    Gibt (Pfade, neuester Zeitstempel) zurück oder None, wenn die API nicht erreichbar ist.
+    """
+    api_url = f"{url.rstrip('/')}/api/v3/history/since"
+    try:
+        r = requests.get(api_url, params={'date': since}, headers={'X-Api-Key': key}, timeout=60)
+        r.raise_for_status(); records = r.json()
+    except requests.RequestException as e:
+        logging.warning(f"Fehler beim Abrufen der {arr_type}-History ({api_url}): {e}")
+        return None
+    except ValueError:
+        logging.warning(f"{arr_type}-History hat ungültiges JSON zurückgegeben.")
+        return None
+    paths = set(); newest = since; newest_dt = _parse_arr_date(since)
+    for rec in records:
+        if rec.get('eventType') not in ARR_HISTORY_EVENTS: continue
+        data = rec.get('data') or {}
+        path = data.get('importedPath') or data.get('path')
+        if path: paths.add(path)
+        rec_dt = _parse_arr_date(rec.get('date', ''))
+        if rec_dt and (newest_dt is None or rec_dt > newest_dt): newest, newest_dt = rec['date'], rec_dt
+    logging.debug(f"{arr_type}-History: {len(records)} Einträge seit {since}, {len(paths)} relevante Dateien.")
+    return paths, newest
+
+def find_scan_type(path):
+    """Ordnet einen Pfad dem Scan-Typ (sonarr/radarr) des konfigurierten Roots zu, unter dem er liegt."""
+    for atype, roots in SCAN_PATHS.items():
+        for root in roots:
+            root = root.rstrip('/\\')
+            if path.startswith(root + os.sep): return atype
+    return None
+
+def collect_incremental_jobs(cursor):
+    """
+    Ermittelt die Dateien für einen inkrementellen Lauf aus der Sonarr/Radarr-History seit dem gespeicherten
+    High-Water-Mark, plus Dateien mit offenen Fehlversuchen.
+
+    Gibt (jobs, neue_marks) zurück. None bedeutet: vollständiger Scan nötig (erster Lauf, Abgleich fällig
+    oder eine History-API nicht erreichbar). Die Marks speichert run_scan erst nach dem Lauf.
+    """
+    last_full = get_sync_state(cursor, 'last_full_scan')
+    if not last_full or time.time() - float(last_full) >= FULL_SCAN_INTERVAL_HOURS * 3600:
+        logging.info("🔁 Vollständiger Abgleich fällig (erster Lauf oder FULL_SCAN_INTERVAL_HOURS erreicht).")
+        return None
+    arrs = [("sonarr", "Sonarr", SONARR_URL, SONARR_API_KEY), ("radarr", "Radarr", RADARR_URL, RADARR_API_KEY)]
+    configured = [a for a in arrs if a[2] and a[3] and SCAN_PATHS.get(a[0])]
+    if not configured:
+        logging.warning("⚠️ SCAN_MODE=incremental, aber weder Sonarr noch Radarr konfiguriert. Führe vollständigen Scan durch.")
+        return None
+    paths = set(); marks = {}
+    for atype, label, url, key in configured:
+        since = get_sync_state(cursor, f'{atype}_history')
+        if not since:
+            logging.info(f"Kein History-Stand für {label} gespeichert, führe vollständigen Scan durch.")
+            return None
+        result = fetch_arr_imports(url, key, since, label)
+        if result is None: return None
+        arr_paths, marks[f'{atype}_history'] = result
+        paths.update(arr_paths)
+    try:
+        cursor.execute('''SELECT d.path, f.name FROM failed_files f JOIN directories d ON d.id = f.dir_id
+                          WHERE f.fail_count < CASE WHEN f.error_class = 'transient' THEN ? ELSE ? END
+                            AND COALESCE(f.next_eligible, 0) <= ?''',
+                       (MAX_TRANSIENT_FAILURES, MAX_FAILURES, time.time()))
+        paths.update(os.path.join(d, n) for d, n in cursor.fetchall())
+    except sqlite3.Error as e:
+        logging.warning(f"DB Fehler (Fehlversuche laden): {e}")
+
+    jobs = []; outside = 0
+    for path in sorted(paths):
+        atype = find_scan_type(path)
+        if not atype: outside += 1; continue
+        if path.lower().endswith(('.mkv', '.mp4')) and os.path.exists(path): jobs.append((path, atype))
+    if outside: logging.info(f"   {outside} Pfade aus der History liegen außerhalb der SCAN_PATHS und werden ignoriert.")
+    logging.info(f"Δ Inkrementeller Scan: {len(jobs)} Dateien aus der Arr-History/Fehlerliste.")
+    return jobs, marks
+
+# --- Vorfilter über die mediaInfo von Sonarr/Radarr ---
+class ArrMediaInfoIndex:
+    """
+    Lädt die mediaInfo aller Dateien einer Serie bzw. eines Films gesammelt (episodefile?seriesId= bzw.
+    moviefile?movieId=) über eine gepoolte Session und cached sie für den Rest des Laufs. HTTP-Abrufe laufen außerhalb
+    des Locks; pro Schlüssel lädt nur ein Thread, die anderen warten auf dessen Event.
+    """
+    def __init__(self, arr_type, url, key):
+        self.arr_type = arr_type
+        self.api_base = f"{url.rstrip('/')}/api/v3"
+        self.item_endpoint, self.file_endpoint, self.id_param = \
+            ('series', 'episodefile', 'seriesId') if arr_type == 'sonarr' else ('movie', 'moviefile', 'movieId')
+        self.session = requests.Session(); self.session.headers['X-Api-Key'] = key
+        self.lock = threading.Lock()
+        self.item_paths = None  # [(pfad, id)], längste Pfade zuerst
+        self.loaded_items = set(); self.media_info = {}
+        self.in_flight = {}  # 'items' bzw. item_id -> Event des ladenden Threads
+
+    def _get(self, endpoint, **params):
+        r = self.session.get(f"{self.api_base}/{endpoint}", params=params, timeout=60)
+        r.raise_for_status()
+        return r.json()
+
+    def _load_once(self, key, loaded, fetch, publish):
+        """Führt fetch() für `key` höchstens einmal gleichzeitig aus und übernimmt das Ergebnis unter dem Lock."""
+        with self.lock:
+            if loaded(): return
+            event = self.in_flight.get(key); owner = event is None
+            if owner: event = self.in_flight[key] = threading.Event()
+        if not owner: event.wait(); return  # Schlägt der Abruf des anderen Threads fehl, bleibt der Eintrag leer
+        try:
+            result = fetch()
+            with self.lock: publish(result)
+        finally:
+            with self.lock: del self.in_flight[key]
+            event.set()
+
+    def lookup(self, file_path):
+        """Gibt die mediaInfo für `file_path` zurück oder None (unbekannt oder API-Fehler)."""
+        def publish_items(items):
+            self.item_paths = sorted(((i['path'].rstrip('/\\'), i['id']) for i in items if i.get('path') and i.get('id')),
+                                     key=lambda x: len(x[0]), reverse=True)
+        def publish_files(files):
+            for f in files:
+                if f.get('path') and f.get('mediaInfo'): self.media_info[f['path']] = f['mediaInfo']
+            self.loaded_items.add(item_id)
+        try:
+            self._load_once('items', lambda: self.item_paths is not None, lambda: self._get(self.item_endpoint), publish_items)
+            item_id = next((iid for ipath, iid in self.item_paths or () if file_path.startswith(ipath + os.sep)), None)
+            if item_id is None: return None
+            self._load_once(item_id, lambda: item_id in self.loaded_items,
+                            lambda: self._get(self.file_endpoint, **{self.id_param: item_id}), publish_files)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logging.debug(f"{self.arr_type.capitalize()} mediaInfo nicht verfügbar für {os.path.basename(file_path)}: {e}")
+            return None
+        with self.lock: return self.media_info.get(file_path)
+
+ARR_MEDIA_INDEXES = {}
+
+def reset_arr_media_indexes():
+    """Legt pro Lauf frische mediaInfo-Caches an (Dateien können sich zwischen Läufen ändern)."""
+    ARR_MEDIA_INDEXES.clear()
+    if SONARR_URL and SONARR_API_KEY: ARR_MEDIA_INDEXES['sonarr'] = ArrMediaInfoIndex('sonarr', SONARR_URL, SONARR_API_KEY)
+    if RADARR_URL and RADARR_API_KEY: ARR_MEDIA_INDEXES['radarr'] = ArrMediaInfoIndex('radarr', RADARR_URL, RADARR_API_KEY)
+
+def parse_arr_languages(raw):
+    """Wandelt "English / Japanese" oder "eng/jpn" in normalisierte Codes um; None bei unbekannten Namen."""
+    if not raw: return []
+    langs = []
+    for part in re.split(r'[/,]', str(raw)):
+        part = part.strip().lower()
+        if not part: continue
+        code = LANGUAGE_NAME_MAP.get(part) or normalize_lang_code(part)
+        if len(code) != 3: return None
+        langs.append(code)
+    return langs
+
+def arr_prefilter_blocker(rules):
+    """
+    Regel, wegen der der Vorfilter nie eine Datei überspringen kann, sonst None: Jede Datei hat Audio, und deren
+    Titel und Default-Flags stehen nicht in der mediaInfo; Anhänge fehlen dort ganz.
+    """
+    if rules.rename_audio: return 'RENAME_AUDIO_TRACKS'
+    if rules.default_audio: return 'DEFAULT_AUDIO_LANG'
+    if RUN_CLEANUP and (rules.remove_attachments or rules.remove_fonts): return 'REMOVE_ATTACHMENTS/REMOVE_FONTS'
+    return None
+
+def arr_prefilter_is_clean(file_path, file_type):
+    """
+    Prüft die Sprach-Regeln gegen die mediaInfo des Arrs. True heißt: Die Datei braucht sicher keine Änderung
+    (kein Entfernen, kein Whisper) und wird in diesem Lauf ohne ffprobe übersprungen – aber nicht als verarbeitet
+    markiert. Alles Unklare (keine mediaInfo, unbekannte Sprachen, MP4) geht den normalen Weg über ffprobe.
+    Titel und Default-Flags kennt die mediaInfo nicht: Eine Default-Untertitelsprache blockiert nur Dateien mit Untertiteln.
+    """
+    index = ARR_MEDIA_INDEXES.get(file_type)
+    if not index or (file_path.lower().endswith('.mp4') and not MP4_INPLACE_EDIT): return False
+    rules = rules_for_path(file_path)
+    if arr_prefilter_blocker(rules): return False
+    info = index.lookup(file_path)
+    if not info: return False
+    audio = parse_arr_languages(info.get('audioLanguages'))
+    subs = parse_arr_languages(info.get('subtitles'))
+    if audio is None or subs is None: return False
+    if subs and rules.default_subtitle: return False  # Default-Flags der Untertitel fehlen in der mediaInfo
+    stream_count = info.get('audioStreamCount')
+    if not audio or (isinstance(stream_count, int) and stream_count > len(audio)): audio = audio + ['und']  # Spuren ohne Sprachangabe
+    if DETECTOR_BACKEND and 'und' in audio: return False
+    if RUN_CLEANUP and any(rules.removes('audio', l) for l in audio): return False
+    if RUN_CLEANUP and any(rules.removes('subtitle', l) for l in subs): return False
+    return True
+
 
 # --- (6) HAUPTSCHLEIFE ---
-def run_scan(cursor, conn=None):
-    logging.info("🔭 Starte Bibliotheks-Scan...")
-    stats = ScanStats()
-    if DRY_RUN: logging.info("!!! TROCKENLAUF-MODUS AKTIV !!!")
-    
-    # Batch-Commit Konfiguration
-    files_since_last_commit = 0
-    
+def group_scan_roots_by_device():
+    """Gruppiert alle SCAN_PATHS nach dem Gerät, auf dem sie liegen: {device_key: [(typ, pfad), ...]}."""
+    lanes = {}
     for atype, paths in SCAN_PATHS.items():
         for spath in paths:
             if not os.path.exists(spath): logging.warning(f"WARN: Pfad nicht gefunden: {spath}"); continue
-            logging.info(f"Ermittle ({atype.upper()}) in: {spath}...")
-            try: items = [d for d in os.listdir(spath) if os.path.isdir(os.path.join(spath, d)) and not d.startswith('.')]; logging.info(f"{len(items)} Elemente gefunden.")
-            except Exception as e: logging.warning(f"WARN: Kann Verzeichnis {spath} nicht lesen: {e}"); continue
-            items.sort()
-            for i, item in enumerate(items):
-                item_path = os.path.join(spath, item)
-                logging.info(f"\n--- 📁 Scanne ({i+1}/{len(items)}) {item} ---")
-                stats.dirs_scanned += 1
-                try:
-                    for root, _, files in os.walk(item_path):
-                        files.sort()
-                        for f in files:
-                            if f.lower().endswith(('.mkv', '.mp4')):
-                                full_path = os.path.join(root, f)
-                                try: 
-                                    process_file(cursor, full_path, atype, stats)
-                                    files_since_last_commit += 1
-                                    
-                                    # Batch-Commit: Alle N Dateien committen
-                                    if conn and files_since_last_commit >= BATCH_COMMIT_SIZE:
-                                        logging.debug(f"💾 Batch-Commit nach {files_since_last_commit} Dateien...")
-                                        conn.commit()
-                                        files_since_last_commit = 0
-                                        
-                                except Exception as proc_e:
-                                    logging.error(f"!! Unerwarteter Fehler bei Verarbeitung von {f}: {proc_e}", exc_info=True)
-                                    try: # Try to get mtime for failure count even after error
-                                        mtime = os.path.getmtime(full_path) if os.path.exists(full_path) else time.time()
-                                        increment_failure_count(cursor, full_path, mtime)
-                                    except Exception as mtime_e:
-                                        logging.error(f"Konnte mtime nicht lesen für Fehlerzählung von {f}: {mtime_e}")
-                                    stats.files_failed += 1
-                except Exception as walk_e: logging.error(f"Fehler beim Durchlaufen von {item_path}: {walk_e}")
-    
+            lanes.setdefault(get_device_key(spath), []).append((atype, spath))
+    for device, roots in lanes.items():
+        logging.info(f"💽 Gerät {device} ({find_mount_point(roots[0][1])}): {', '.join(r for _, r in roots)}")
+    return lanes
+
+def group_jobs_by_device(jobs):
+    """Verteilt eine feste Jobliste [(pfad, typ), ...] auf Geräte-Spuren wie bei group_scan_roots_by_device()."""
+    lanes = {}
+    for full_path, atype in jobs: lanes.setdefault(get_device_key(full_path), []).append((full_path, atype))
+    return lanes
+
+class WalkRecord:
+    """Was der Verzeichnis-Walk eines Laufs tatsächlich gesehen hat – Grundlage für prune_stale_entries()."""
+    def __init__(self):
+        self.seen = {}         # Verzeichnis -> {Mediendateien}, für jedes besuchte Verzeichnis
+        self.complete = set()  # Ordner unter einem Scan-Root, die ohne Lesefehler komplett durchlaufen wurden
+        self.roots = {}        # Scan-Root -> {Ordnernamen} laut os.listdir
+    def covers(self, path):
+        """True, wenn `path` in einem vollständig bekannten Teilbaum liegt (gesehen oder nachweislich verschwunden)."""
+        for root, items in self.roots.items():
+            if not path.startswith(root + os.sep): continue
+            top = path[len(root) + 1:].split(os.sep, 1)[0]
+            if top not in items: return not top.startswith('.')  # Ordner gelöscht/umbenannt; versteckte werden nie gescannt
+            return os.path.join(root, top) in self.complete
+        return False
+
+def iter_scan_jobs(stats, roots, walk=None):
+    """
+    Durchläuft die angegebenen (Typ, Pfad)-Roots und liefert (Pfad, Typ) für jede .mkv/.mp4-Datei.
+    Mit `walk` wird zusätzlich festgehalten, welche Ordner und Dateien es gibt (für die DB-Bereinigung).
+    """
+    for atype, spath in roots:
+        logging.info(f"Ermittle ({atype.upper()}) in: {spath}...")
+        try: items = [d for d in os.listdir(spath) if os.path.isdir(os.path.join(spath, d)) and not d.startswith('.')]; logging.info(f"{len(items)} Elemente gefunden.")
+        except Exception as e: logging.warning(f"WARN: Kann Verzeichnis {spath} nicht lesen: {e}"); continue
+        items.sort()
+        if walk is not None: walk.roots[spath.rstrip(os.sep)] = set(items)
+        for i, item in enumerate(items):
+            item_path = os.path.join(spath, item)
+            logging.info(f"\n--- 📁 Scanne ({i+1}/{len(items)}) {item} ---")
+            stats.dirs_scanned += 1
+            walk_errors = []
+            try:
+                for root, _, files in os.walk(item_path, onerror=walk_errors.append):
+                    files.sort()
+                    media = [f for f in files if f.lower().endswith(('.mkv', '.mp4'))]
+                    if walk is not None: walk.seen[root] = set(media)
+                    for f in media:
+                        yield os.path.join(root, f), atype
+                if walk_errors: logging.warning(f"WARN: Lesefehler in {item_path}: {walk_errors[0]}")
+                elif walk is not None: walk.complete.add(os.path.join(spath.rstrip(os.sep), item))
+            except Exception as walk_e: logging.error(f"Fehler beim Durchlaufen von {item_path}: {walk_e}")
+
+def feed_jobs(jobs, out, stop):
+    """Thread-Seite von run_pipeline: treibt einen Job-Generator (Verzeichnis-Walk) und reicht die Jobs über `out` weiter."""
+    try:
+        for job in jobs:
+            while not stop.is_set():
+                try: out.put(job, timeout=1); break
+                except queue.Full: continue
+            if stop.is_set(): return
+    except Exception as e: logging.error(f"Fehler beim Verzeichnis-Walk: {e}", exc_info=True)
+    if not stop.is_set(): out.put(None)
+
+def likely_needs_remux(full_path):
+    """Grobe Kostenklasse ohne ffprobe: MP4 wird immer konvertiert, MKV nur bei aktivem Entfernen von Spuren/Anhängen."""
+    if full_path.lower().endswith('.mp4') and not MP4_INPLACE_EDIT: return True
+    rules = rules_for_path(full_path)
+    return RUN_CLEANUP and (rules.remove_audio or rules.remove_subtitles or rules.remove_attachments or rules.remove_fonts)
+
+def estimate_job_seconds(size, stats):
+    """Geschätzte Remux-Dauer: gemessener Durchsatz dieses Laufs, sonst REMUX_MIN_MBPS als vorsichtige Annahme."""
+    if stats.remux_seconds > 0 and stats.remux_bytes_written > 0: bps = stats.remux_bytes_written / stats.remux_seconds
+    else: bps = max(1.0, REMUX_MIN_MBPS) * 1024 * 1024
+    return size / bps
+
+def prioritize_jobs(jobs):
+    """
+    Sortiert (Pfad, Typ)-Jobs nach Wert und Kosten: neue Importe (jünger als PRIORITY_RECENT_HOURS) zuerst,
+    dann reine Metadaten-Fixes vor wahrscheinlichen Remuxes, innerhalb davon kleine vor großen Dateien.
+    """
+    recent_cutoff = time.time() - PRIORITY_RECENT_HOURS * 3600
+    keyed = []
+    for full_path, atype in jobs:
+        try: st = os.stat(full_path); size, mtime = st.st_size, st.st_mtime
+        except OSError: size, mtime = 0, 0
+        keyed.append(((mtime < recent_cutoff, likely_needs_remux(full_path), size, -mtime), (full_path, atype)))
+    keyed.sort(key=lambda k: k[0])
+    return [job for _, job in keyed]
+
+def file_action(stats):
+    """Fasst das Ergebnis einer Datei (ScanStats nur dieser Datei) für Log-Auswertungen zusammen."""
+    if stats.files_failed: return 'failed'
+    if stats.files_remuxed_ffmpeg or stats.files_remuxed_mkvmerge or stats.files_converted_mp4: return 'remux'
+    if stats.files_edited_mkvprop or stats.files_edited_mp4: return 'edit'
+    if stats.files_deferred_space: return 'deferred'
+    if stats.files_prefiltered: return 'prefiltered'
+    if stats.files_skipped_backoff: return 'backoff'
+    return 'unchanged' if stats.files_processed else 'skipped'
+
+def process_file_job(cursor, full_path, atype, stats):
+    """Worker-Einstieg: Fängt unerwartete Fehler ab, damit eine Datei nicht den ganzen Lauf beendet."""
+    start = time.monotonic()
+    FILE_STATS.current = stats
+    try:
+        with log_context(file=full_path):
+            try:
+                process_file(cursor, full_path, atype, stats)
+            except Exception as proc_e:
+                logging.error(f"!! Unerwarteter Fehler bei Verarbeitung von {os.path.basename(full_path)}: {proc_e}", exc_info=True)
+                try: # Try to get mtime for failure count even after error
+                    mtime = os.path.getmtime(full_path) if os.path.exists(full_path) else time.time()
+                    increment_failure_count(cursor, full_path, mtime, classify_failure(proc_e, full_path))
+                except Exception as mtime_e:
+                    logging.error(f"Konnte mtime nicht lesen für Fehlerzählung von {os.path.basename(full_path)}: {mtime_e}")
+                stats.files_failed += 1
+            # Eine strukturierte Abschlusszeile pro Datei (action, duration_ms); nur echte Änderungen/Fehler auf INFO
+            action = file_action(stats); duration_ms = int((time.monotonic() - start) * 1000)
+            level = logging.INFO if action in ('remux', 'edit', 'failed') else logging.DEBUG
+            logging.log(level, f"⏱️ {os.path.basename(full_path)}: {action} in {duration_ms / 1000:.1f}s",
+                        extra={'action': action, 'duration_ms': duration_ms})
+            if action != 'skipped':  # Bereits verarbeitete Dateien stehen nur als Zähler im Lauf
+                stats.file_results.append((full_path, action, duration_ms, stats.remux_bytes_read, stats.remux_bytes_written))
+    finally:
+        FILE_STATS.current = None  # Kein Zähler-Objekt für den nächsten Job auf diesem Thread
+
+FIRST_FILE_LOGGED = False
+
+async def run_pipeline(lanes, stats, cursor, conn=None, deadline=None):
+    """
+    Verarbeitet die Dateien aus `lanes` ({device_key: jobs}) nebenläufig.
+
+    Jedes Gerät bekommt eine eigene Spur mit bis zu MAX_PARALLEL_FILES Dateien in Worker-Threads,
+    so dass unabhängige Platten parallel arbeiten und ein ausgelastetes Array die anderen nicht blockiert.
+    Innerhalb von process_file begrenzt pipeline_stage() zusätzlich jede Ressource (probe, detect, remux, edit).
+    Statistik-Zusammenführung und Batch-Commits passieren nur im Event-Loop.
+    Ohne `conn` (kein Thread-sicherer Zugriff möglich) wird sequentiell mit `cursor` gearbeitet.
+    Ab `deadline` (time.monotonic()) werden keine neuen Dateien mehr begonnen; laufende werden sauber beendet.
+    Wahrscheinliche Remuxes, deren geschätzte Dauer nicht mehr ins Budget passt, werden vorher schon zurückgestellt –
+    außer der ersten Datei mit echter Arbeit; laut DB bereits verarbeitete Dateien belasten das Budget nicht.
+    SIGHUP wird zwischen zwei Dateien umgesetzt: Neue Dateien warten, bis alle laufenden fertig sind.
+    Nach SIGTERM werden keine neuen Dateien mehr begonnen (laufende Remuxe brechen selbst ab).
+    Gibt True zurück, wenn Dateien wegen Zeitbudget oder Beenden liegen geblieben sind.
+    """
+    loop = asyncio.get_running_loop()
+    parallel = max(1, MAX_PARALLEL_FILES) if conn else 1
+    files_since_last_commit = 0
+    budget_hit = False
+    in_flight = 0; idle = asyncio.Event(); idle.set()
+    work_started = False  # Erste Datei mit echter Arbeit in diesem Lauf begonnen
+
+    async def apply_pending_reload():
+        if not RELOAD_REQUESTED.is_set(): return
+        while in_flight: await idle.wait()
+        if RELOAD_REQUESTED.is_set(): reload_config()
+
+    def budget_estimate(full_path):
+        """Worker-Thread: geschätzte Sekunden für die Datei, None wenn process_file sie laut DB ohnehin überspringt."""
+        try: st = os.stat(full_path)
+        except OSError: return 0
+        if should_skip_file(LockedCursor(conn) if conn else cursor, full_path, st.st_mtime)[0]: return None
+        return estimate_job_seconds(st.st_size, stats) if likely_needs_remux(full_path) else 0
+
+    async def over_budget(executor, full_path):
+        nonlocal budget_hit, work_started
+        if deadline is None: return False
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            estimate = await loop.run_in_executor(executor, budget_estimate, full_path)
+            # Bereits verarbeitete Dateien kosten nichts und zählen nicht als zurückgestellt;
+            # die erste Datei eines Laufs startet immer, sonst käme eine Datei größer als das Budget nie dran
+            if estimate is None: return False
+            if not work_started or remaining - estimate > 0: work_started = True; return False
+        if not budget_hit: logging.info("⏱️ Zeitbudget erschöpft – weitere Dateien folgen im nächsten Lauf.")
+        budget_hit = True
+        stats.files_deferred_budget += 1
+        logging.debug(f"Zurückgestellt (Zeitbudget): {os.path.basename(full_path)}")
+        return True
+
+    async def run_job(executor, slots, full_path, atype):
+        nonlocal files_since_last_commit, in_flight
+        global FIRST_FILE_LOGGED
+        if not FIRST_FILE_LOGGED:
+            FIRST_FILE_LOGGED = True
+            logging.info(f"⏱️ Erste Datei {time.monotonic() - PROCESS_START:.1f}s nach Prozessstart: {os.path.basename(full_path)}")
+        file_stats = ScanStats()
+        worker_cursor = LockedCursor(conn) if conn else cursor
+        try:
+            await loop.run_in_executor(executor, process_file_job, worker_cursor, full_path, atype, file_stats)
+        finally:
+            stats.merge(file_stats)
+            slots.release()
+            in_flight -= 1
+            if not in_flight: idle.set()
+        files_since_last_commit += 1
+        # Batch-Commit: Alle N Dateien committen
+        if conn and files_since_last_commit >= BATCH_COMMIT_SIZE:
+            logging.debug(f"💾 Batch-Commit nach {files_since_last_commit} Dateien...")
+            with DB_LOCK: conn.commit()
+            files_since_last_commit = 0
+
+    async def lane_jobs(jobs):
+        """
+        Listen werden direkt durchlaufen. Generatoren (Verzeichnis-Walk) laufen in einem eigenen Thread,
+        damit os.listdir/os.walk auf einem langsamen Gerät weder den Event-Loop noch die anderen Spuren blockiert.
+        """
+        if isinstance(jobs, list):
+            for job in jobs: yield job
+            return
+        jobs_queue = queue.Queue(maxsize=parallel * 4); stop = threading.Event()
+        threading.Thread(target=feed_jobs, args=(jobs, jobs_queue, stop), name="langfixer-walk", daemon=True).start()
+        try:
+            while (job := await loop.run_in_executor(None, jobs_queue.get)) is not None: yield job
+        finally: stop.set()
+
+    async def run_lane(executor, jobs):
+        nonlocal budget_hit, in_flight
+        slots = asyncio.Semaphore(parallel)
+        pending = set()
+        lane = lane_jobs(jobs)
+        try:
+            async for full_path, atype in lane:
+                await slots.acquire()
+                if SHUTDOWN_REQUESTED.is_set():
+                    slots.release(); budget_hit = True; break
+                await apply_pending_reload()
+                if await over_budget(executor, full_path): slots.release(); continue
+                in_flight += 1; idle.clear()
+                task = asyncio.create_task(run_job(executor, slots, full_path, atype))
+                pending.add(task); task.add_done_callback(pending.discard)
+        finally: await lane.aclose()
+        if pending: await asyncio.gather(*pending)
+
+    lane_count = len(lanes) if conn else 1
+    with ThreadPoolExecutor(max_workers=parallel * max(1, lane_count), thread_name_prefix="langfixer") as executor:
+        if conn:
+            await asyncio.gather(*(run_lane(executor, jobs) for jobs in lanes.values()))
+        else:
+            for jobs in lanes.values(): await run_lane(executor, jobs)
+
     # Final commit für verbleibende Änderungen
     if conn and files_since_last_commit > 0:
         logging.debug(f"💾 Final-Commit für verbleibende {files_since_last_commit} Dateien...")
-        conn.commit()
-    
+        with DB_LOCK: conn.commit()
+    return budget_hit
+
+def run_scan(cursor, conn=None):
+    logging.info("🔭 Starte Bibliotheks-Scan...")
+    stats = ScanStats()
+    if DRY_RUN: logging.info("!!! TROCKENLAUF-MODUS AKTIV !!!")
+    else: cleanup_scratch_dir()
+    if ARR_PREFILTER: reset_arr_media_indexes()
+    DIR_IDS.clear()
+    caches_before = cache_counters()
+    walk = None
+    incremental = collect_incremental_jobs(cursor) if SCAN_MODE == 'incremental' else None
+    if incremental is not None:
+        jobs, marks = incremental
+        lanes = group_jobs_by_device(jobs)
+    else:
+        # Auch im Full-Modus wird ein Stand gespeichert, damit ein späterer Wechsel auf incremental direkt greift
+        scan_start_iso = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'); marks = {}
+        walk = WalkRecord()
+        # Jede Spur walkt in ihrem eigenen Thread und zählt daher in eigene Statistik (nach dem Lauf zusammengeführt)
+        device_roots = group_scan_roots_by_device()
+        walk_stats = {device: ScanStats() for device in device_roots}
+        lanes = {device: iter_scan_jobs(walk_stats[device], roots, walk) for device, roots in device_roots.items()}
+    if SCAN_ORDER == 'priority' and not SHUTDOWN_REQUESTED.is_set():
+        # Walk und stat() aller Kandidaten pro Gerät parallel, damit ein langsames NAS die anderen nicht aufhält
+        with ThreadPoolExecutor(max_workers=max(1, len(lanes)), thread_name_prefix="langfixer-walk") as walkers:
+            lanes = dict(zip(lanes, walkers.map(prioritize_jobs, lanes.values())))
+        logging.info(f"📋 {sum(len(j) for j in lanes.values())} Kandidaten nach Priorität sortiert.")
+    deadline = compute_run_deadline()
+    budget_hit = asyncio.run(run_pipeline(lanes, stats, cursor, conn, deadline))
+    if walk is not None:
+        for device_stats in walk_stats.values(): stats.merge(device_stats)
+        prune_stale_entries(cursor, walk, stats)
+    # Im Trockenlauf wird nichts als verarbeitet markiert – dann dürfen auch die History-Marks nicht vorrücken.
+    # Bei erschöpftem Zeitbudget oder SIGTERM ebenso nicht: Der nächste Lauf holt die liegengebliebenen Dateien nach.
+    if not DRY_RUN and not budget_hit:
+        if incremental is None:
+            marks = {f'{atype}_history': scan_start_iso for atype in ('sonarr', 'radarr')}
+            set_sync_state(cursor, 'last_full_scan', time.time())
+        for key, value in marks.items(): set_sync_state(cursor, key, value)
+    record_run(cursor, stats, 'scan', 'full' if incremental is None else 'incremental', caches_before, interrupted=budget_hit)
     logging.info("✅ Bibliotheks-Scan abgeschlossen.")
     return stats
 
-def main_loop():
+def main_loop(once=False):
     setup_logging()
     
     # Show detailed configuration summary with 30-second display
@@ -1090,30 +3146,29 @@ def main_loop():
     logging.info(f"🚀 {__app_name__} v{__version__} gestartet. DRY_RUN={DRY_RUN}")
     
     # Check for updates in background (non-blocking)
-    try:
-        newer_version = check_for_updates()
-        if newer_version:
-            logging.info(f"🔔 UPDATE VERFÜGBAR: v{newer_version} → Nutze 'docker compose pull && docker compose up -d' für Update")
-    except Exception as e:
-        logging.debug(f"Update-Check fehlgeschlagen: {e}")
+    start_update_check()
 
-    try:
-        SCAN_PATHS["sonarr"] = [p.strip() for p in SONARR_PATHS_RAW.split(',') if p.strip()]
-        SCAN_PATHS["radarr"] = [p.strip() for p in RADARR_PATHS_RAW.split(',') if p.strip()]
-        logging.info(f"   Sonarr Pfade: {SCAN_PATHS.get('sonarr', 'Keine')}")
-        logging.info(f"   Radarr Pfade: {SCAN_PATHS.get('radarr', 'Keine')}")
-        if not SCAN_PATHS.get("sonarr") and not SCAN_PATHS.get("radarr"): logging.warning("⚠️ Keine Scan-Pfade konfiguriert!")
-    except Exception as e: logging.critical(f"💥 KRITISCH: Pfad-Parsing Fehler: {e}", exc_info=True); sys.exit(1)
+    logging.info(f"   Sonarr Pfade: {SCAN_PATHS.get('sonarr', 'Keine')}")
+    logging.info(f"   Radarr Pfade: {SCAN_PATHS.get('radarr', 'Keine')}")
+    if not SCAN_PATHS.get("sonarr") and not SCAN_PATHS.get("radarr"): logging.warning("⚠️ Keine Scan-Pfade konfiguriert!")
 
     validate_config()
     init_db()
-
-    while True:
+    install_signal_handlers()
+    detector = language_detector()
+    if detector and 'und' not in KEEP_AUDIO_LANGS: detector.warm()  # Modell lädt parallel zum ersten Scan
+
+    while not SHUTDOWN_REQUESTED.is_set():
+        if RELOAD_REQUESTED.is_set(): reload_config()
+        wait = seconds_until_window()
+        if wait > 0:
+            logging.info(f"🌙 Außerhalb des Wartungsfensters {RUN_WINDOW_RAW.strip()} – warte {wait/3600:.1f} Stunden.")
+            interruptible_sleep(wait); continue
         conn = None; current_stats = None
         try:
             logging.debug("Öffne DB-Verbindung für den Scan-Lauf...")
-            conn = sqlite3.connect(DB_PATH, timeout=30); cursor = conn.cursor()
-            current_stats = run_scan(cursor, conn)  # Pass connection for batch commits
+            conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False); cursor = conn.cursor()
+            current_stats = run_scan(cursor, conn)  # Pass connection for batch commits & worker cursors
             logging.info("Speichere finale Datenbankänderungen (Commit)..."); conn.commit()
             logging.info("Datenbankänderungen gespeichert.")
         except sqlite3.OperationalError as db_lock_err: logging.error(f"❌ DB FEHLER: Datenbank ist gesperrt! Überspringe. Fehler: {db_lock_err}"); conn.rollback() if conn else None
@@ -1129,8 +3184,169 @@ def main_loop():
             trigger_arr_scan(RADARR_URL, RADARR_API_KEY, MODIFIED_RADARR_PATHS, "Radarr")
         else: logging.warning("Scan-Lauf wurde vorzeitig beendet oder Stats konnten nicht ermittelt werden.")
 
+        if SHUTDOWN_REQUESTED.is_set() or once: break
         logging.info(f"🕒 Nächster Scan geplant in {RUN_INTERVAL_SECONDS/3600:.1f} Stunden.")
-        time.sleep(RUN_INTERVAL_SECONDS)
+        interruptible_sleep(RUN_INTERVAL_SECONDS)
+
+    if SHUTDOWN_REQUESTED.is_set():
+        logging.info("👋 Beendet (SIGTERM/SIGINT) – Datenbank ist gespeichert, temporäre Dateien sind entfernt.")
+
+
+# --- (7) KOMMANDOZEILE ---
+def collect_cli_jobs(paths, forced_type=None):
+    """Löst Dateien und Ordner in (Pfad, Typ)-Jobs auf; der Typ kommt aus den SCAN_PATHS oder --type."""
+    jobs = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            files = [os.path.join(root, f) for root, _, names in os.walk(path) for f in sorted(names)]
+        elif os.path.isfile(path): files = [path]
+        else: logging.warning(f"WARN: Pfad nicht gefunden: {path}"); continue
+        for f in files:
+            if not f.lower().endswith(('.mkv', '.mp4')): continue
+            atype = forced_type or find_scan_type(f)
+            if not atype: logging.warning(f"WARN: {f} liegt in keinem SONARR_PATHS/RADARR_PATHS – mit --type angeben."); continue
+            jobs.append((f, atype))
+    return jobs
+
+def arr_hook_paths():
+    """
+    Liefert (Pfade, Typ) aus den Umgebungsvariablen eines Sonarr/Radarr-"Custom Script"-Aufrufs
+    (sonarr_episodefile_paths bzw. radarr_moviefile_path), sonst ([], None).
+    """
+    sonarr = os.getenv("sonarr_episodefile_paths") or os.getenv("sonarr_episodefile_path")
+    if sonarr: return [p for p in sonarr.split('|') if p], 'sonarr'
+    radarr = os.getenv("radarr_moviefile_path")
+    if radarr: return [radarr], 'radarr'
+    return [], None
+
+def cmd_scan(args):
+    main_loop(once=args.once)
+    return 0
+
+def cmd_process(args):
+    """Verarbeitet genau die angegebenen Dateien/Ordner (z.B. als Post-Import-Hook) und beendet sich."""
+    if (os.getenv("sonarr_eventtype") or os.getenv("radarr_eventtype")) == "Test":
+        logging.info("Arr-Testaufruf erkannt, nichts zu tun."); return 0
+    paths, hook_type = (args.paths, None) if args.paths else arr_hook_paths()
+    if not paths:
+        logging.error("❌ Keine Pfade angegeben (und keine sonarr_/radarr_-Umgebungsvariablen gefunden)."); return 2
+    validate_config()
+    init_db()
+    install_signal_handlers()
+    jobs = collect_cli_jobs(paths, args.type or hook_type)
+    if not jobs: logging.info("Keine .mkv/.mp4-Dateien gefunden."); return 0
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False); cursor = conn.cursor()
+    try:
+        if args.force:
+            forget_files(cursor, [p for p, _ in jobs])
+        stats = ScanStats(); caches_before = cache_counters()
+        if not DRY_RUN: cleanup_scratch_dir()
+        interrupted = asyncio.run(run_pipeline(group_jobs_by_device(jobs), stats, cursor, conn))
+        record_run(cursor, stats, 'process', hook_type or 'cli', caches_before, interrupted=interrupted)
+        conn.commit()
+    finally:
+        conn.close()
+    if not DRY_RUN: update_cumulative_stats(stats)
+    log_scan_report(stats)
+    trigger_arr_scan(SONARR_URL, SONARR_API_KEY, MODIFIED_SONARR_PATHS, "Sonarr")
+    trigger_arr_scan(RADARR_URL, RADARR_API_KEY, MODIFIED_RADARR_PATHS, "Radarr")
+    return 1 if stats.files_failed else 0
+
+def cmd_probe(args):
+    """Zeigt die Streams einer Datei so, wie language-fixer sie sieht (Sprache normalisiert)."""
+    media_info = get_media_info(args.path)
+    if not media_info: return 1
+    if args.json:
+        print(json.dumps(media_info, indent=2, ensure_ascii=False)); return 0
+    fmt = media_info.get('format', {})
+    print(f"{args.path}\n  Dauer: {fmt.get('duration', '?')}s, Größe: {format_bytes(int(fmt.get('size', 0) or 0))}")
+    for st in media_info.get('streams', []):
+        tags = st.get('tags', {}); disp = st.get('disposition', {})
+        flags = ''.join(f for f, k in (('D', 'default'), ('F', 'forced'), ('C', 'comment')) if disp.get(k))
+        print(f"  #{st.get('index'):<3} {st.get('codec_type', '?'):<10} {st.get('codec_name', '?'):<10} "
+              f"{normalize_lang_code(tags.get('language', 'und')):<4} {flags:<3} {tags.get('title', '')}")
+    return 0
+
+def cmd_plan(args):
+    """Zeigt für jede Datei die geplanten Aktionen, ohne etwas zu ändern oder die DB zu berühren."""
+    rc = 0
+    for path in args.paths:
+        media_info = get_media_info(path)
+        if not media_info: rc = 1; continue
+        logging.info(f"\n🎬 --- Plan: {os.path.basename(path)} ---")
+        plan, _, _ = build_file_plan(path, media_info, ScanStats())
+        if plan_needs_changes(plan): log_planned_actions(path, plan)
+        else: logging.info("  -> Keine Änderungen nötig.")
+    return rc
+
+def cmd_export(args):
+    """Gibt die Lauf-Historie (oder mit --files die Datei-Zeilen) als CSV/JSON-Zeitreihe aus."""
+    since = (datetime.now(timezone.utc) - timedelta(days=args.days)).strftime('%Y-%m-%dT%H:%M:%SZ') if args.days else None
+    try:
+        with closing(sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)) as conn:
+            rows = (load_file_history if args.files else load_run_history)(conn.cursor(), since)
+    except sqlite3.Error as e:
+        logging.error(f"❌ Lauf-Historie nicht lesbar ({DB_PATH}): {e}"); return 1
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(rows, out, indent=2, ensure_ascii=False); out.write('\n')
+        else:
+            # CSV bleibt flach: verschachtelte Details/Konfiguration gibt es nur im JSON
+            fields = [k for k in (rows[0] if rows else FILE_EXPORT_FIELDS if args.files else RUN_EXPORT_FIELDS) if k not in ('details', 'config')]
+            writer = csv.DictWriter(out, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader(); writer.writerows(rows)
+    finally:
+        if out is not sys.stdout: out.close()
+    if args.output: logging.info(f"📤 {len(rows)} Zeilen nach {args.output} exportiert.")
+    return 0
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="language_fixer.py", description=f"{__app_name__} v{__version__}")
+    parser.set_defaults(func=cmd_scan, once=False)
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='KEY=VALUE',
+                        help="Überschreibt eine Einstellung (wie Umgebungsvariable/CONFIG_FILE), mehrfach möglich")
+    dry = parser.add_mutually_exclusive_group()
+    dry.add_argument('--dry-run', dest='dry_run', action='store_const', const='true', help="DRY_RUN=true erzwingen")
+    dry.add_argument('--apply', dest='dry_run', action='store_const', const='false', help="DRY_RUN=false erzwingen")
+    sub = parser.add_subparsers(dest='command')
+    p_scan = sub.add_parser('scan', help="Bibliothek periodisch scannen (Standard ohne Kommando)")
+    p_scan.add_argument('--once', action='store_true', help="Nur einen Scan ausführen und beenden (z.B. für cron)")
+    p_scan.set_defaults(func=cmd_scan)
+    p_proc = sub.add_parser('process', help="Nur die angegebenen Dateien/Ordner verarbeiten (ohne Pfade: Sonarr/Radarr Custom-Script-Variablen)")
+    p_proc.add_argument('paths', nargs='*')
+    p_proc.add_argument('--type', choices=('sonarr', 'radarr'), help="Typ für Pfade außerhalb der SCAN_PATHS")
+    p_proc.add_argument('--force', action='store_true', help="DB-Status (verarbeitet/fehlgeschlagen) der Dateien ignorieren")
+    p_proc.set_defaults(func=cmd_process)
+    p_probe = sub.add_parser('probe', help="Streams einer Datei anzeigen")
+    p_probe.add_argument('path')
+    p_probe.add_argument('--json', action='store_true', help="Rohe ffprobe-Ausgabe")
+    p_probe.set_defaults(func=cmd_probe)
+    p_plan = sub.add_parser('plan', help="Geplante Aktionen anzeigen, ohne etwas zu ändern")
+    p_plan.add_argument('paths', nargs='+')
+    p_plan.set_defaults(func=cmd_plan)
+    p_export = sub.add_parser('export', help="Lauf-Historie als Zeitreihe (CSV/JSON) ausgeben")
+    p_export.add_argument('--format', choices=('csv', 'json'), default='csv')
+    p_export.add_argument('--files', action='store_true', help="Eine Zeile pro bearbeiteter Datei statt pro Lauf")
+    p_export.add_argument('--days', type=int, default=0, help="Nur Läufe der letzten N Tage (0 = alle)")
+    p_export.add_argument('--output', '-o', help="Zieldatei (Standard: stdout)")
+    p_export.set_defaults(func=cmd_export)
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    # CLI-Overrides landen in der Umgebung, damit load_config() (und ein späteres SIGHUP) sie wie Env-Werte behandelt
+    for item in args.overrides:
+        key, sep, value = item.partition('=')
+        if not sep: build_arg_parser().error(f"--set erwartet KEY=VALUE, nicht '{item}'")
+        CLI_OVERRIDES[key.strip()] = value
+    if args.dry_run: CLI_OVERRIDES['DRY_RUN'] = args.dry_run
+    if CLI_OVERRIDES:
+        os.environ.update(CLI_OVERRIDES); _BASE_ENV.update(CLI_OVERRIDES)
+        load_config()
+    if args.command not in (None, 'scan'): setup_logging()
+    return args.func(args)
 
 if __name__=="__main__":
-    main_loop()
+    sys.exit(main())